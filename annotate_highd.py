@@ -16,21 +16,100 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
-from dataobjects import HighDDataset
-from dataobjects.enums import HighDDatasetID
-from processing import automaticannotationhighd
+import argparse
+import sys
 
+from dataobjects.dataset import Dataset
+from dataobjects.enums import HighDDatasetID, CacheFormat
+from processing.automaticannotationhighd import DETECTORS
+from processing.batchannotation import annotate_recordings
 
-if __name__ == '__main__':
+"""
+Runs the automatic annotation detectors on HighD recordings and writes all annotations to a single csv file, indexed on recording and vehicle. The recordings
+are processed in parallel, see processing/batchannotation.py for more details.
+
+Examples (run from the main travia folder):
+    python annotate_highd.py
+    python annotate_highd.py -d DATASET_01 DATASET_02 --detectors lane_change complete_overtake
+    python annotate_highd.py -o overtakes.csv -t timing.csv --detectors complete_overtake
+"""
 
-    for dataset_id in HighDDatasetID:
 
-        data = HighDDataset.load(dataset_id)
+def get_arguments():
+    parser = argparse.ArgumentParser(description='Automatically annotate events in HighD recordings')
+    parser.add_argument(
+        "-d",
+        "--datasets",
+        type=str,
+        nargs="+",
+        help="The dataset ids of the recordings to annotate, by default all recordings are annotated",
+        required=False,
+    )
+    parser.add_argument(
+        "--detectors",
+        type=str,
+        nargs="+",
+        choices=list(DETECTORS.keys()),
+        default=list(DETECTORS.keys()),
+        help="The detectors to run, by default all detectors are used",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="highd_annotations.csv",
+        help="Path to the csv file to write the annotations to",
+    )
+    parser.add_argument(
+        "-t",
+        "--timing",
+        type=str,
+        help="Path to a csv file to write the time needed per recording and detector to",
+        required=False,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="The number of recordings to annotate in parallel, by default this is based on the number of cpu cores and the available memory",
+        required=False,
+    )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        type=str,
+        choices=["pickle", "columnar"],
+        help="The preferred cache format to load recordings from, one of pickle, columnar",
+        required=False,
+    )
+    parser.add_argument(
+        "-s",
+        "--save",
+        action="store_true",
+        help="Also add the annotations to the recordings and save them, such that they are shown in the visualisation",
+    )
+    arguments = parser.parse_args()
 
-        automaticannotationhighd.detect_all_cars_stuck_behind_a_truck(data)
-        automaticannotationhighd.detect_all_lane_changes(data)
-        automaticannotationhighd.detect_all_significant_decelerations(data)
-        automaticannotationhighd.detect_all_complete_overtakes(data)
+    if arguments.cache == 'columnar':
+        Dataset.cache_format = CacheFormat.COLUMNAR
+    elif arguments.cache == 'pickle':
+        Dataset.cache_format = CacheFormat.PICKLE
+
+    if arguments.datasets:
+        try:
+            dataset_ids = [HighDDatasetID[dataset] for dataset in arguments.datasets]
+        except KeyError as error:
+            parser.error('%s is not a valid HighD dataset id' % error)
+    else:
+        dataset_ids = list(HighDDatasetID)
+    return dataset_ids, arguments
+
+
+if __name__ == '__main__':
+    dataset_ids, arguments = get_arguments()
+    timing = annotate_recordings(dataset_ids, arguments.detectors, arguments.output, timing_path=arguments.timing, number_of_workers=arguments.jobs,
+                                 save_annotations=arguments.save)
 
-        data.save()
-        print(str(dataset_id) + ' is done.')
+    # when annotating all recordings, missing data is expected and no reason to fail
+    if any(row['status'] == 'failed' or (row['status'] == 'missing data' and arguments.datasets) for row in timing):
+        sys.exit(1)
@@ -0,0 +1,78 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.syntheticdata import create_highd_dataset
+from dataobjects import HighDDataset
+from dataobjects.enums import HighDDatasetID
+from processing import automaticannotationhighd
+from processing.detectorengine import DetectorEngine
+
+"""
+Measures the run time of the automatic HighD annotation detectors on a full recording, first with every detector in a separate pass and then with all
+detectors in a single pass of the DetectorEngine. By default a synthetic recording of the size of a real HighD recording
+(about 1M rows of track data) is used, use --dataset to run the detectors on a real recording from the data folder instead.
+
+Run from the main travia folder with: python -m benchmarks.automaticannotation
+"""
+
+DETECTORS = [automaticannotationhighd.detect_all_cars_stuck_behind_a_truck,
+             automaticannotationhighd.detect_all_lane_changes,
+             automaticannotationhighd.detect_all_significant_decelerations,
+             automaticannotationhighd.detect_all_complete_overtakes]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset', type=int, default=None, help='the number of a HighD recording to use instead of synthetic data')
+    arguments = parser.parse_args()
+
+    if arguments.dataset is None:
+        dataset = create_highd_dataset()
+    else:
+        dataset = HighDDataset.load(HighDDatasetID(arguments.dataset))
+    dataset.annotation_data = []
+
+    print('%d vehicles, %d rows' % (len(dataset.track_meta_data), len(dataset.track_data)))
+
+    total_duration = 0.
+    for detector in DETECTORS:
+        number_of_annotations = len(dataset.annotation_data)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            detector(dataset)
+        duration = time.perf_counter() - start
+        total_duration += duration
+
+        print('    %-40s %7.3f s, %5d annotations' % (detector.__name__, duration, len(dataset.annotation_data) - number_of_annotations))
+    print('    %-40s %7.3f s' % ('total', total_duration))
+
+    engine = DetectorEngine([detector() for detector in automaticannotationhighd.DETECTORS.values()])
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        annotations = engine.run(dataset)
+    duration = time.perf_counter() - start
+
+    print('All detectors in a single pass:')
+    for detector_name, detector_duration in engine.timing.items():
+        print('    %-40s %7.3f s' % (detector_name, detector_duration))
+    print('    %-40s %7.3f s, %5d annotations' % ('total', duration, len(annotations)))
@@ -0,0 +1,96 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from processing.columnarcache import save_columnar_cache, load_columnar_cache
+from processing.encryptiontools import save_encrypted_pickle, load_encrypted_pickle
+
+"""
+Compares the time needed to open a dataset from the encrypted pickle cache and from the columnar cache. Every load is done in a new python process, such that
+the measured time includes the complete cold start of the loading code (the files themselves can still be in the page cache of the operating system).
+
+Run from the main travia folder with: python -m benchmarks.cacheloading
+"""
+
+LOADERS = {'pickle': load_encrypted_pickle,
+           'columnar': load_columnar_cache,
+           'columnar (encrypted)': load_columnar_cache,
+           'columnar (memory map)': lambda path: load_columnar_cache(path, memory_map=True)}
+
+
+def _get_peak_memory_in_mb():
+    # the peak resident set size of this process, this is only available on linux. ru_maxrss can not be used because it is inherited from the parent process
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return float('nan')
+
+
+def _load_and_report(cache_format, path):
+    start = time.perf_counter()
+    dataset = LOADERS[cache_format](path)
+    duration = time.perf_counter() - start
+    print('%f %f %d' % (duration, _get_peak_memory_in_mb(), len(dataset.track_data)))
+
+
+def run_benchmark(repetitions):
+    from benchmarks.syntheticdata import create_highd_dataset
+
+    dataset = create_highd_dataset()
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = {'pickle': os.path.join(folder, 'dataset.pkl'),
+                 'columnar': os.path.join(folder, 'dataset_cache'),
+                 'columnar (encrypted)': os.path.join(folder, 'dataset_encrypted_cache'),
+                 'columnar (memory map)': os.path.join(folder, 'dataset_cache')}
+
+        save_encrypted_pickle(paths['pickle'], dataset)
+        save_columnar_cache(paths['columnar'], dataset)
+        save_columnar_cache(paths['columnar (encrypted)'], dataset, encrypt=True)
+
+        print('Loading a dataset with %d rows of track data, %d repetitions' % (len(dataset.track_data), repetitions))
+        for cache_format, path in paths.items():
+            durations = []
+            for _ in range(repetitions):
+                output = subprocess.run([sys.executable, '-m', 'benchmarks.cacheloading', '--load', cache_format, path], capture_output=True, text=True,
+                                        check=True).stdout
+                duration, peak_memory_in_mb, _ = output.split()
+                durations.append(float(duration))
+            print('%-22s best: %7.3f s, peak memory: %7.1f MB' % (cache_format, min(durations), float(peak_memory_in_mb)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--load', nargs=2, metavar=('FORMAT', 'PATH'), help='used internally to load a single cache in a new process')
+    arguments = parser.parse_args()
+
+    if arguments.load:
+        _load_and_report(*arguments.load)
+    else:
+        run_benchmark(arguments.repetitions)
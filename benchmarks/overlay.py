@@ -0,0 +1,71 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from processing.examplecost import cost_function, cost_grid
+
+"""
+Compares the time needed to compute the example cost overlay for a HighD map with the grid evaluation and with one call to cost_function per pixel, as was
+done before. The per pixel evaluation is slow, so it is only done for a sample of the pixels and its duration is extrapolated. Before, the per pixel
+evaluation was distributed over 10 processes, but pickling the inputs for every pixel made this hardly faster than a single process.
+
+Run from the main travia folder with: python -m benchmarks.overlay
+"""
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--map-width', type=float, default=420., help='the width of the map in meters')
+    parser.add_argument('--map-height', type=float, default=36., help='the height of the map in meters')
+    parser.add_argument('--number-of-vehicles', type=int, default=60)
+    parser.add_argument('--sample-size', type=int, default=20000, help='the number of pixels evaluated with cost_function')
+    arguments = parser.parse_args()
+
+    pixels_per_meter = 5
+    pixel_width = round(arguments.map_width * pixels_per_meter)
+    pixel_height = round(arguments.map_height * pixels_per_meter)
+
+    rng = np.random.default_rng(0)
+    lane_centers = [10.5, 14.5, 22.5, 26.5]
+    vehicle_positions = np.column_stack([rng.uniform(0., arguments.map_width, arguments.number_of_vehicles),
+                                         rng.choice(lane_centers, arguments.number_of_vehicles)])
+
+    x_coordinates = np.arange(pixel_width) / pixels_per_meter
+    y_coordinates = np.arange(pixel_height) / pixels_per_meter
+
+    start = time.perf_counter()
+    costs = cost_grid(x_coordinates, y_coordinates, vehicle_positions, lane_centers)
+    grid_duration = time.perf_counter() - start
+
+    sampled_pixels = rng.choice(pixel_width * pixel_height, arguments.sample_size, replace=False)
+    maximum_difference = 0.
+
+    start = time.perf_counter()
+    for pixel in sampled_pixels:
+        row, column = divmod(pixel, pixel_width)
+        cost = cost_function(np.array([x_coordinates[column], y_coordinates[row]]), vehicle_positions, lane_centers)
+        maximum_difference = max(maximum_difference, abs(cost - costs[row, column]))
+    per_pixel_duration = (time.perf_counter() - start) * pixel_width * pixel_height / arguments.sample_size
+
+    print('%d x %d pixels, %d vehicles' % (pixel_width, pixel_height, arguments.number_of_vehicles))
+    print('    grid:      %8.3f s' % grid_duration)
+    print('    per pixel: %8.3f s (extrapolated from %d pixels)' % (per_pixel_duration, arguments.sample_size))
+    print('    maximum difference: %.1e' % maximum_difference)
@@ -0,0 +1,116 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from pyproj import CRS, Transformer
+
+from benchmarks.syntheticdata import write_pneuma_csv
+from dataobjects import PNeumaDataset
+from processing.progressreporter import ProgressReporter
+
+"""
+Compares the block wise pNeuma csv parser with the line by line parser that was used before, on a synthetic file with the size of a pNeuma drone file. Both
+the duration and the peak memory use (as measured by tracemalloc) are reported, the peak memory is compared to the size of the resulting track data. The old
+parser transforms the coordinates one row at a time, which is slow, so by default it only parses the first part of the file and its duration is extrapolated.
+
+Run from the main travia folder with: python -m benchmarks.pneumaparsing
+"""
+
+
+def parse_line_by_line(file_path, maximum_number_of_lines):
+    vehicles = []
+    tracks = []
+
+    crs_web_mercator = CRS.from_epsg(3857)
+    crs_gps = CRS.from_epsg(4326)
+    coordinate_transformer = Transformer.from_crs(crs_gps, crs_web_mercator)
+
+    with open(file_path, 'r') as file:
+        for index, line in enumerate(file):
+            if index > maximum_number_of_lines:
+                break
+            elif not index:
+                as_list = line.replace('\n', '').split(';')
+                header_list = [header.strip() for header in as_list[4::]]
+                vehicle_header = [header.strip() for header in as_list[0:4]]
+            else:
+                as_list = line.replace('\n', '').split(';')
+                vehicle = [int(as_list[0]), str(as_list[1]), float(as_list[2]), float(as_list[3])]
+                vehicles.append(vehicle)
+
+                x_list = []
+                y_list = []
+                time_data_only = np.array([float(value) for value in as_list[4:-1]])
+                time_data_only.resize(int(len(time_data_only) / 6), 6)
+
+                for row in time_data_only:
+                    x, y = coordinate_transformer.transform(row[0], row[1])
+                    x_list.append(x)
+                    y_list.append(y)
+
+                tracks_df = pd.DataFrame(time_data_only, columns=header_list)
+                tracks_df['vehicle_id'] = pd.Series([vehicle[0]] * len(time_data_only))
+                tracks_df['global_x'] = pd.Series(x_list)
+                tracks_df['global_y'] = pd.Series(y_list)
+                tracks.append(tracks_df)
+
+    return pd.DataFrame(vehicles, columns=vehicle_header), pd.concat(tracks, axis=0, join='outer', ignore_index=True)
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, peak / 2 ** 20
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number-of-vehicles', type=int, default=1000, help='the number of vehicles in the synthetic file')
+    parser.add_argument('--line-by-line-sample-size', type=int, default=100, help='the number of vehicles that are parsed with the old parser')
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        file_path = os.path.join(folder, 'pneuma.csv')
+        write_pneuma_csv(file_path, number_of_vehicles=arguments.number_of_vehicles)
+        print('synthetic pNeuma file: %.0f MB' % (os.path.getsize(file_path) / 2 ** 20))
+
+        (vehicles, tracks), block_duration, block_peak = measure(PNeumaDataset._parse_pneuma_csv, file_path, ProgressReporter())
+        (old_vehicles, old_tracks), line_duration, line_peak = measure(parse_line_by_line, file_path, arguments.line_by_line_sample_size)
+
+    frame_size = tracks.memory_usage(deep=True).sum() / 2 ** 20
+    sample_fraction = len(old_tracks) / len(tracks)
+
+    pd.testing.assert_frame_equal(old_vehicles, vehicles.iloc[0:len(old_vehicles)])
+    pd.testing.assert_frame_equal(old_tracks, tracks.iloc[0:len(old_tracks)], check_exact=True)
+
+    print('%d vehicles, %d rows, track data frame: %.0f MB' % (len(vehicles), len(tracks), frame_size))
+    print('    block wise:   %6.1f s, peak memory %6.0f MB' % (block_duration, block_peak))
+    print('    line by line: %6.1f s (extrapolated from %d vehicles)' % (line_duration / sample_fraction, len(old_vehicles)))
+    print('    speedup:      %6.1f x' % (line_duration / sample_fraction / block_duration))
+    print('    the results of both parsers are equal for the sampled vehicles')
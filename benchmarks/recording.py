@@ -0,0 +1,93 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PyQt5 import QtGui
+
+from visualisation.videorecorder import VideoRecorder
+
+"""
+Compares the time that recording a frame blocks the GUI thread when the frames are encoded synchronously, as was done before, and when they are handed to
+the writer thread of a VideoRecorder. The frames are map sized QImages with some noise, so the encoder has to do real work. The frame rate is set so high
+that the timer would never wait, this shows how long the GUI thread is blocked per frame and how many frames are dropped when the encoder is the bottleneck.
+
+Run from the main travia folder with: python -m benchmarks.recording
+"""
+
+
+def _create_images(width, height, number_of_images):
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(number_of_images):
+        pixels = rng.integers(0, 256, (height, width), dtype=np.uint32) * 0x010101 | 0xFF000000
+        images.append(QtGui.QImage(pixels.tobytes(), width, height, QtGui.QImage.Format_ARGB32_Premultiplied).copy())
+    return images
+
+
+def _record_synchronously(file_path, images, frame_rate):
+    width, height = images[0].width(), images[0].height()
+    video_writer = cv2.VideoWriter(file_path, cv2.VideoWriter.fourcc(*'MJPG'), frame_rate, (width, height))
+    for image in images:
+        bits = image.bits()
+        bits.setsize(height * width * 4)
+        image_array = np.frombuffer(bits, np.uint8).reshape((height, width, 4))
+        video_writer.write(cv2.cvtColor(image_array, cv2.COLOR_RGBA2RGB))
+    video_writer.release()
+
+
+def _record_threaded(file_path, images, frame_rate, render_time):
+    recorder = VideoRecorder(file_path, frame_rate, (images[0].width(), images[0].height()))
+    blocked_time = 0.
+    for image in images:
+        # simulate rendering the next frame, the writer thread can encode in the meantime
+        time.sleep(render_time)
+        start = time.perf_counter()
+        recorder.add_frame(image)
+        blocked_time += time.perf_counter() - start
+    recorder.stop()
+    return blocked_time, recorder
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=2100, help='the width of the frames in pixels')
+    parser.add_argument('--height', type=int, default=180, help='the height of the frames in pixels')
+    parser.add_argument('--number-of-frames', type=int, default=100)
+    parser.add_argument('--frame-rate', type=float, default=25.)
+    parser.add_argument('--render-time', type=float, default=0.01, help='the simulated time needed to render a frame on the GUI thread in seconds')
+    arguments = parser.parse_args()
+
+    images = _create_images(arguments.width, arguments.height, arguments.number_of_frames)
+
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        _record_synchronously(os.path.join(folder, 'synchronous.avi'), images, arguments.frame_rate)
+        synchronous_duration = time.perf_counter() - start
+
+        blocked_time, recorder = _record_threaded(os.path.join(folder, 'threaded.avi'), images, arguments.frame_rate, arguments.render_time)
+
+    print('%d frames of %d x %d pixels' % (arguments.number_of_frames, arguments.width, arguments.height))
+    print('    synchronous: %8.2f ms per frame on the GUI thread' % (1e3 * synchronous_duration / arguments.number_of_frames))
+    print('    threaded:    %8.2f ms per frame on the GUI thread, %d frames dropped' % (1e3 * blocked_time / arguments.number_of_frames,
+                                                                                      recorder.number_of_dropped_frames))
@@ -0,0 +1,82 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import time
+
+import numpy as np
+import pykalman
+
+from benchmarks.syntheticdata import create_ngsim_track_data, create_pneuma_track_data
+from processing.kalmansmoothing import _create_ngsim_jobs, _create_pneuma_jobs, _smooth_all_tracks, _f
+
+"""
+Compares the vectorized unscented Kalman smoother with the pykalman implementation that was used before, on synthetic data with the size of the NGSim
+US-101 recordings and of a pNeuma drone file. pykalman is slow, so by default it only smooths a random sample of the vehicles and its time for all vehicles
+is extrapolated. Both smoothers run in a single process.
+
+Run from the main travia folder with: python -m benchmarks.smoothing
+"""
+
+
+def smooth_track_with_pykalman(job):
+    measured_data, initial_state_mean, wheelbase, dt, observed_states, transition_covariance = job
+
+    ukf = pykalman.AdditiveUnscentedKalmanFilter(lambda s: _f(s, wheelbase, dt), lambda s: s[observed_states], n_dim_state=6,
+                                                 n_dim_obs=sum(observed_states), transition_covariance=np.eye(6) * transition_covariance,
+                                                 initial_state_mean=initial_state_mean)
+    return ukf.smooth(measured_data)[0][:, 0:4]
+
+
+def run_benchmark(name, jobs, pykalman_sample_size, rng):
+    number_of_rows = sum(len(job[0]) for job in jobs)
+    print('%s: %d vehicles, %d rows' % (name, len(jobs), number_of_rows))
+
+    start = time.perf_counter()
+    results = _smooth_all_tracks(jobs, number_of_workers=1, progress_callback=None)
+    vectorized_duration = time.perf_counter() - start
+
+    sample = rng.choice(len(jobs), min(pykalman_sample_size, len(jobs)), replace=False)
+    sampled_rows = sum(len(jobs[index][0]) for index in sample)
+    maximum_difference = np.zeros(4)
+
+    start = time.perf_counter()
+    for index in sample:
+        reference = smooth_track_with_pykalman(jobs[index])
+        maximum_difference = np.maximum(maximum_difference, np.abs(reference - results[index]).max(axis=0))
+    pykalman_duration = (time.perf_counter() - start) * number_of_rows / sampled_rows
+
+    print('    vectorized: %8.1f s' % vectorized_duration)
+    print('    pykalman:   %8.1f s (extrapolated from %d vehicles)' % (pykalman_duration, len(sample)))
+    print('    speedup:    %8.1f x' % (pykalman_duration / vectorized_duration))
+    print('    maximum difference in x, y, heading, velocity: %s' % np.array2string(maximum_difference, precision=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pykalman-sample-size', type=int, default=50, help='the number of vehicles that are smoothed with pykalman')
+    arguments = parser.parse_args()
+
+    random_generator = np.random.default_rng(0)
+
+    _, _, ngsim_jobs = _create_ngsim_jobs(create_ngsim_track_data())
+    run_benchmark('NGSim US-101 (synthetic)', ngsim_jobs, arguments.pykalman_sample_size, random_generator)
+
+    vehicles, tracks = create_pneuma_track_data()
+    _, _, pneuma_jobs = _create_pneuma_jobs(vehicles, tracks, 0.04)
+    run_benchmark('pNeuma (synthetic)', pneuma_jobs, arguments.pykalman_sample_size, random_generator)
@@ -0,0 +1,208 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataobjects import HighDDataset
+from dataobjects.enums import HighDDatasetID
+
+"""
+Synthetic datasets with the same structure as the data of the supported sources. These are used in benchmarks, such that their timing can be reproduced
+without a copy of the (licensed) data. The sizes default to those of a typical recording.
+"""
+
+
+def create_highd_dataset(number_of_vehicles=1500, number_of_frames=22500, seed=0):
+    """
+    Creates a HighDDataset with straight trajectories, a few lane changes and vehicles following each other. The default size results in roughly 1M rows of
+    track data, similar to a real HighD recording.
+    """
+    rng = np.random.default_rng(seed)
+
+    dataset = HighDDataset(HighDDatasetID.DATASET_01)
+    dataset.recording_id = 1
+    dataset.frame_rate = 25
+    dataset.duration = number_of_frames / dataset.frame_rate
+    dataset.start_time = datetime.datetime(2017, 1, 1, 8, 0)
+    dataset.upper_lane_markings = [8.5, 12.5, 16.5]
+    dataset.lower_lane_markings = [21.0, 25.0, 29.0]
+    dataset.num_vehicles = number_of_vehicles
+
+    track_meta_data = []
+    track_data = []
+
+    for vehicle_id in range(1, number_of_vehicles + 1):
+        length = int(rng.integers(300, 1000))
+        first_frame = int(rng.integers(1, number_of_frames - length))
+        frames = np.arange(first_frame, first_frame + length)
+
+        driving_direction = int(rng.integers(1, 3))
+        vehicle_class = 'Truck' if rng.random() < 0.2 else 'Car'
+        direction_sign = -1. if driving_direction == 1 else 1.
+
+        lanes = np.full(length, 2 if driving_direction == 1 else 5)
+        number_of_lane_changes = int(rng.integers(0, 3))
+        for lane_change in range(number_of_lane_changes):
+            lane_change_index = int(rng.integers(50, length - 50))
+            lanes[lane_change_index:] += (1 if lane_change == 0 else -1) * (1 if driving_direction == 1 else -1)
+
+        y_velocity = rng.normal(0., 0.05, length)
+        for lane_change_index in np.nonzero(np.diff(lanes))[0]:
+            y_velocity[max(0, lane_change_index - 40):lane_change_index + 40] += 0.8
+
+        preceding_id = np.zeros(length, dtype=int)
+        for start in range(0, length, 200):
+            preceding_id[start:start + 150] = rng.integers(0, number_of_vehicles + 1)
+
+        x_velocity = direction_sign * rng.uniform(20., 40.)
+        track_data.append(pd.DataFrame({'frame': frames,
+                                        'id': vehicle_id,
+                                        'x': 200. + direction_sign * (frames - first_frame) * abs(x_velocity) / dataset.frame_rate,
+                                        'y': lanes * 4. - 1.,
+                                        'width': 4.5,
+                                        'height': 1.8,
+                                        'xVelocity': x_velocity,
+                                        'yVelocity': y_velocity,
+                                        'xAcceleration': rng.normal(0., 0.3, length),
+                                        'yAcceleration': 0.,
+                                        'frontSightDistance': 100.,
+                                        'backSightDistance': 100.,
+                                        'dhw': 30.,
+                                        'thw': 1.2,
+                                        'ttc': 0.,
+                                        'precedingXVelocity': x_velocity,
+                                        'precedingId': preceding_id,
+                                        'followingId': 0,
+                                        'leftPrecedingId': 0,
+                                        'leftAlongsideId': 0,
+                                        'leftFollowingId': 0,
+                                        'rightPrecedingId': 0,
+                                        'rightAlongsideId': 0,
+                                        'rightFollowingId': 0,
+                                        'laneId': lanes}))
+
+        track_meta_data.append({'id': vehicle_id,
+                                'width': 4.5 if vehicle_class == 'Car' else 16.,
+                                'height': 1.8 if vehicle_class == 'Car' else 2.5,
+                                'initialFrame': first_frame,
+                                'finalFrame': first_frame + length - 1,
+                                'numFrames': length,
+                                'class': vehicle_class,
+                                'drivingDirection': driving_direction,
+                                'traveledDistance': 400.,
+                                'minXVelocity': abs(x_velocity),
+                                'maxXVelocity': abs(x_velocity),
+                                'meanXVelocity': abs(x_velocity),
+                                'minDHW': 30.,
+                                'minTHW': 1.2,
+                                'minTTC': 0.,
+                                'numLaneChanges': number_of_lane_changes})
+
+    dataset.track_meta_data = pd.DataFrame(track_meta_data).set_index('id')
+    dataset.track_data = pd.concat(track_data, ignore_index=True)
+    return dataset
+
+
+def _create_noisy_trajectory(rng, number_of_frames, dt, speed):
+    """
+    Returns the x, y position, speed and acceleration of a vehicle that drives a gently curving road, with measurement noise added.
+    """
+    heading = rng.uniform(-np.pi, np.pi) + np.cumsum(rng.normal(0., 0.002, number_of_frames))
+    speeds = np.clip(speed + np.cumsum(rng.normal(0., 0.02, number_of_frames)), 0.5, None)
+
+    x = rng.uniform(0., 500.) + np.cumsum(np.cos(heading) * speeds * dt)
+    y = rng.uniform(0., 500.) + np.cumsum(np.sin(heading) * speeds * dt)
+    acceleration = np.gradient(speeds, dt)
+
+    return x + rng.normal(0., 0.1, number_of_frames), y + rng.normal(0., 0.1, number_of_frames), speeds, acceleration
+
+
+def create_ngsim_track_data(number_of_vehicles=2200, mean_track_length=550, seed=0):
+    """
+    Creates track data with the columns used to smooth NGSim data. The default size is similar to the US-101 recordings (about 1.2M rows at 10 Hz).
+    """
+    rng = np.random.default_rng(seed)
+    tracks = []
+
+    for vehicle_id in range(1, number_of_vehicles + 1):
+        number_of_frames = int(np.clip(rng.normal(mean_track_length, mean_track_length / 4), 10, None))
+        x, y, speeds, acceleration = _create_noisy_trajectory(rng, number_of_frames, 0.1, rng.uniform(5., 25.))
+        first_frame = int(rng.integers(1, 9000))
+
+        tracks.append(pd.DataFrame({'Vehicle_ID': vehicle_id,
+                                    'Frame_ID': np.arange(first_frame, first_frame + number_of_frames),
+                                    'Global_X': x,
+                                    'Global_Y': y,
+                                    'v_Vel': speeds,
+                                    'v_Acc': acceleration,
+                                    'v_Length': rng.uniform(3.5, 6.)}))
+    return pd.concat(tracks, ignore_index=True)
+
+
+def create_pneuma_track_data(number_of_vehicles=1000, mean_track_length=1200, seed=0):
+    """
+    Creates the vehicle and track data frames that are used to smooth pNeuma data. The default size is similar to a single pNeuma drone file (about 1.2M
+    rows at 25 Hz).
+    """
+    rng = np.random.default_rng(seed)
+    vehicle_types = ['Car', 'Taxi', 'Motorcycle', 'Bus', 'Medium Vehicle', 'Heavy Vehicle']
+    tracks = []
+
+    for vehicle_id in range(1, number_of_vehicles + 1):
+        number_of_frames = int(np.clip(rng.normal(mean_track_length, mean_track_length / 4), 10, None))
+        x, y, speeds, _ = _create_noisy_trajectory(rng, number_of_frames, 0.04, rng.uniform(2., 15.))
+        first_time = 0.04 * int(rng.integers(0, 20000))
+
+        tracks.append(pd.DataFrame({'time': first_time + 0.04 * np.arange(number_of_frames),
+                                    'vehicle_id': vehicle_id,
+                                    'global_x': x,
+                                    'global_y': y,
+                                    'speed': speeds}))
+
+    vehicles = pd.DataFrame({'track_id': np.arange(1, number_of_vehicles + 1),
+                             'type': rng.choice(vehicle_types, number_of_vehicles)})
+    return vehicles, pd.concat(tracks, ignore_index=True)
+
+
+def write_pneuma_csv(file_path, number_of_vehicles=1000, mean_track_length=1200, seed=0):
+    """
+    Writes a csv file in the pNeuma format: one line per vehicle with the vehicle data followed by the latitude, longitude, speed, longitudinal and lateral
+    acceleration and time of every time step. The default size is similar to a single pNeuma drone file.
+    """
+    rng = np.random.default_rng(seed)
+    vehicle_types = ['Car', 'Taxi', 'Motorcycle', 'Bus', 'Medium Vehicle', 'Heavy Vehicle']
+
+    with open(file_path, 'w') as file:
+        file.write('track_id; type; traveled_d; avg_speed; lat; lon; speed; lon_acc; lat_acc; time\n')
+
+        for vehicle_id in range(1, number_of_vehicles + 1):
+            number_of_frames = int(np.clip(rng.normal(mean_track_length, mean_track_length / 4), 10, None))
+            x, y, speeds, acceleration = _create_noisy_trajectory(rng, number_of_frames, 0.04, rng.uniform(2., 15.))
+            first_time = 0.04 * int(rng.integers(0, 20000))
+
+            # convert the positions in meters to coordinates around the center of Athens
+            latitude = 37.98 + y / 111000.
+            longitude = 23.73 + x / 88000.
+            rows = np.column_stack([latitude, longitude, speeds * 3.6, acceleration, rng.normal(0., 0.1, number_of_frames),
+                                    first_time + 0.04 * np.arange(number_of_frames)])
+
+            track = '; '.join('%.6f; %.6f; %.4f; %.4f; %.4f; %.6f' % tuple(row) for row in rows)
+            file.write('%d; %s; %.2f; %.6f; %s; \n' % (vehicle_id, rng.choice(vehicle_types), speeds.sum() * 0.04, speeds.mean() * 3.6, track))
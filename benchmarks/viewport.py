@@ -0,0 +1,117 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from PyQt5 import QtWidgets, QtGui
+
+from benchmarks.syntheticdata import create_highd_dataset
+from dataobjects.enums import ViewportType
+from gui import OffscreenRenderer, WorldView
+from gui.worldview import enable_software_opengl
+from visualize import DATASET_ID_TYPES, create_visualisation_master, load_dataset
+
+"""
+Compares the time needed to show a frame in the WorldView with the raster and the OpenGL viewport, at different zoom levels. Every frame, the vehicles are
+moved to the next frame and the viewport is repainted. For the OpenGL viewport the time includes waiting until the OpenGL commands are finished.
+
+By default a synthetic HighD recording is shown on a large synthetic map, use --source and --dataset to use a dataset for which the data is available. A
+display is needed for the OpenGL viewport, use --software-opengl to render with Mesa llvmpipe on a machine without a GPU.
+
+Run from the main travia folder with: python -m benchmarks.viewport
+"""
+
+ZOOM_LEVELS = [0., 0.5, 0.9]
+
+
+def _write_synthetic_map(folder, dataset_id, width, height):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (height, width), dtype=np.uint32) * 0x010101 | 0xFF000000
+    image = QtGui.QImage(pixels.tobytes(), width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+
+    map_folder = os.path.join(folder, 'data', dataset_id.map_sub_folder)
+    os.makedirs(map_folder, exist_ok=True)
+    image.save(os.path.join(map_folder, dataset_id.map_image_name + '.png'))
+
+
+def _time_frames(renderer, viewport_type, zoom_level, number_of_frames):
+    view = renderer.view
+    view.zoom_level = zoom_level
+    view.update_zoom()
+
+    first_frame, last_frame = renderer.visualisation_master.frame_range
+    step = renderer.visualisation_master.default_frame_step
+    frame_numbers = range(first_frame, min(last_frame, first_frame + number_of_frames * step), step)
+
+    start = time.perf_counter()
+    for frame_number in frame_numbers:
+        renderer.visualisation_master.go_to_frame(frame_number)
+        view.viewport().repaint()
+        if viewport_type is ViewportType.OPENGL:
+            view.viewport().makeCurrent()
+            view.viewport().context().functions().glFinish()
+            view.viewport().doneCurrent()
+    return (time.perf_counter() - start) / len(frame_numbers)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--source', type=str, choices=['highd', 'ngsim', 'pneuma', 'exid'], help='the data source of a dataset to use')
+    parser.add_argument('-d', '--dataset', type=str, help='the id of a dataset to use, by default a synthetic HighD recording is used')
+    parser.add_argument('--map-size', type=int, nargs=2, default=[8000, 700], metavar=('WIDTH', 'HEIGHT'), help='the size of the synthetic map in pixels')
+    parser.add_argument('--view-size', type=int, nargs=2, default=[1280, 720], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--number-of-frames', type=int, default=200)
+    parser.add_argument('--software-opengl', action='store_true', help='use a software OpenGL implementation')
+    arguments = parser.parse_args()
+
+    if arguments.software_opengl:
+        enable_software_opengl()
+    app = QtWidgets.QApplication([])
+
+    # the working directory is restored before the temporary folder is removed
+    previous_working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        try:
+            if arguments.dataset:
+                data = load_dataset(DATASET_ID_TYPES[arguments.source][arguments.dataset])
+            else:
+                # the map is loaded from the data folder relative to the working directory
+                data = create_highd_dataset(number_of_vehicles=300, number_of_frames=2000)
+                _write_synthetic_map(folder, data.dataset_id, *arguments.map_size)
+                os.chdir(folder)
+
+            print('%s, %d frames per measurement, view of %d x %d pixels' % (data.dataset_id, arguments.number_of_frames, *arguments.view_size))
+            for viewport_type in ViewportType:
+                WorldView.viewport_type = viewport_type
+                renderer = OffscreenRenderer(data)
+                renderer.register_visualisation_master(create_visualisation_master(data, renderer))
+                renderer.view.resize(*arguments.view_size)
+                renderer.view.show()
+                app.processEvents()
+
+                for zoom_level in ZOOM_LEVELS:
+                    frame_time = _time_frames(renderer, viewport_type, zoom_level, arguments.number_of_frames)
+                    print('    %-7s zoom level %.1f: %8.2f ms per frame' % (viewport_type, zoom_level, 1e3 * frame_time))
+
+                renderer.view.close()
+        finally:
+            os.chdir(previous_working_directory)
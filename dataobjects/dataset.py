@@ -20,14 +20,64 @@ import abc
 import enum
 import os
 
+from processing.columnarcache import columnar_cache_exists, save_columnar_cache, load_columnar_cache
+from processing.encryptiontools import save_encrypted_pickle, load_encrypted_pickle
 from .annotation import Annotation
-from .enums import AnnotationType
+from .enums import AnnotationType, CacheFormat
 
 
 class Dataset(abc.ABC):
     annotation_data: list
     dataset_id: enum.Enum
 
+    # The format used to save datasets. Both formats can always be loaded, if both exist the one selected here is preferred.
+    cache_format = CacheFormat.PICKLE
+    encrypt_columnar_cache = False
+
+    # If True, the numeric columns of a columnar cache are memory mapped instead of read. Only the data that is used is then loaded from disk.
+    memory_map_cache = False
+
+    @staticmethod
+    def _get_cache_paths(dataset_id):
+        file_location = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name)
+        return {CacheFormat.PICKLE: file_location + '.pkl',
+                CacheFormat.COLUMNAR: file_location + '_cache'}
+
+    @staticmethod
+    def cache_exists(dataset_id, cache_format=None):
+        """
+        Checks if a cache exists for the dataset, in the given format or in any format if cache_format is None.
+        """
+        cache_paths = Dataset._get_cache_paths(dataset_id)
+        pickle_exists = cache_format in [None, CacheFormat.PICKLE] and os.path.isfile(cache_paths[CacheFormat.PICKLE])
+        columnar_exists = cache_format in [None, CacheFormat.COLUMNAR] and columnar_cache_exists(cache_paths[CacheFormat.COLUMNAR])
+        return pickle_exists or columnar_exists
+
+    @staticmethod
+    def _load_from_cache(dataset_id):
+        """
+        Loads a dataset from the pickle or columnar cache, returns None if no cache exists. A columnar cache in an old format is skipped.
+        """
+        cache_paths = Dataset._get_cache_paths(dataset_id)
+        preferred_format_first = sorted(CacheFormat, key=lambda cache_format: cache_format is not Dataset.cache_format)
+
+        for cache_format in preferred_format_first:
+            if cache_format is CacheFormat.COLUMNAR and columnar_cache_exists(cache_paths[cache_format]):
+                dataset = load_columnar_cache(cache_paths[cache_format], memory_map=Dataset.memory_map_cache)
+                if dataset is not None:
+                    return dataset
+            elif cache_format is CacheFormat.PICKLE and os.path.isfile(cache_paths[cache_format]):
+                return load_encrypted_pickle(cache_paths[cache_format])
+        return None
+
+    def _save_to_cache(self):
+        cache_path = Dataset._get_cache_paths(self.dataset_id)[Dataset.cache_format]
+
+        if Dataset.cache_format is CacheFormat.COLUMNAR:
+            save_columnar_cache(cache_path, self, encrypt=Dataset.encrypt_columnar_cache)
+        else:
+            save_encrypted_pickle(cache_path, self)
+
     def _save_annotations_to_csv(self):
         file_name = os.path.join('data', self.dataset_id.data_sub_folder, self.dataset_id.data_file_name + '_annotations.csv')
         with open(file_name, 'w') as f:
@@ -5,3 +5,5 @@ from .pneumadatasetid import PNeumaDatasetID
 from .exiddatasetid import ExiDDatasetID
 from .datasource import DataSource
 from .annotationtype import AnnotationType
+from .cacheformat import CacheFormat
+from .viewporttype import ViewportType
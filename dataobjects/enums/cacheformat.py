@@ -0,0 +1,28 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import enum
+
+
+class CacheFormat(enum.Enum):
+    PICKLE = 0
+    COLUMNAR = 1
+
+    def __str__(self):
+        return {CacheFormat.PICKLE: 'Encrypted pickle',
+                CacheFormat.COLUMNAR: 'Columnar', }[self]
@@ -16,7 +16,6 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
-from PyQt5 import QtGui
 import enum
 
 
@@ -47,6 +46,9 @@ class VehicleType(enum.Enum):
 
     @property
     def gui_color(self):
+        # imported here so the data objects can be used without PyQt (e.g. when preprocessing data on a server)
+        from PyQt5 import QtGui
+
         return {VehicleType.CAR: QtGui.QColor(0x945e00),
                 VehicleType.TRUCK: QtGui.QColor(0x009479),
                 VehicleType.MOTOR_CYCLE: QtGui.QColor(0x8f007e),
@@ -23,7 +23,6 @@ import numpy as np
 import pandas as pd
 
 from dataobjects.enums import ExiDDatasetID
-from processing.encryptiontools import save_encrypted_pickle, load_encrypted_pickle
 from .dataset import Dataset
 
 
@@ -52,14 +51,13 @@ class ExiDDataset(Dataset):
         self.annotation_data = []
 
     def save(self):
-        file_path = os.path.join('data', self.dataset_id.data_sub_folder, self.dataset_id.data_file_name + '.pkl')
-        save_encrypted_pickle(file_path, self)
+        self._save_to_cache()
 
     @staticmethod
     def load(dataset_id: ExiDDatasetID):
-        file_location = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name)
-        if os.path.isfile(file_location + '.pkl'):
-            return load_encrypted_pickle(file_location + '.pkl')
+        dataset = Dataset._load_from_cache(dataset_id)
+        if dataset is not None:
+            return dataset
         else:
             dataset = ExiDDataset.read_exid_csv(dataset_id)
             dataset.save()
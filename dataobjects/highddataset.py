@@ -22,7 +22,6 @@ import os
 import pandas as pd
 
 from dataobjects.enums import HighDDatasetID
-from processing.encryptiontools import save_encrypted_pickle, load_encrypted_pickle
 from .dataset import Dataset
 
 
@@ -52,21 +51,23 @@ class HighDDataset(Dataset):
         self.annotation_data = []
 
     def save(self):
-        file_path = os.path.join('data', self.dataset_id.data_sub_folder, self.dataset_id.data_file_name + '.pkl')
-        save_encrypted_pickle(file_path, self)
+        self._save_to_cache()
 
     @staticmethod
     def load(dataset_id: HighDDatasetID):
-        file_location = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name)
-        if os.path.isfile(file_location + '.pkl'):
-            return load_encrypted_pickle(file_location + '.pkl')
+        dataset = Dataset._load_from_cache(dataset_id)
+        if dataset is not None:
+            return dataset
         else:
             dataset = HighDDataset.read_highd_csv(dataset_id)
             dataset.save()
             return dataset
 
     @staticmethod
-    def read_highd_csv(dataset_id: HighDDatasetID):
+    def read_highd_csv(dataset_id: HighDDatasetID, track_data_columns=None):
+        """
+        Reads a HighD recording from the csv files. If track_data_columns is provided, only these columns of the track data are read.
+        """
         dataset = HighDDataset(dataset_id)
 
         with open(os.path.join('data', dataset_id.path_to_change_log)) as f:
@@ -117,31 +118,32 @@ class HighDDataset(Dataset):
         dataset.track_meta_data = dataset.track_meta_data.set_index('id')
 
         path_to_track_data = os.path.join('data', dataset_id.data_sub_folder, dataset_id.track_data_file_name + '.csv')
-        track_data = pd.read_csv(path_to_track_data)
-        dataset.track_data = track_data.astype({"frame": int,
-                                                "id": int,
-                                                "x": float,
-                                                "y": float,
-                                                "width": float,
-                                                "height": float,
-                                                "xVelocity": float,
-                                                "yVelocity": float,
-                                                "xAcceleration": float,
-                                                "yAcceleration": float,
-                                                "frontSightDistance": float,
-                                                "backSightDistance": float,
-                                                "dhw": float,
-                                                "thw": float,
-                                                "ttc": float,
-                                                "precedingXVelocity": float,
-                                                "precedingId": int,
-                                                "followingId": int,
-                                                "leftPrecedingId": int,
-                                                "leftAlongsideId": int,
-                                                "leftFollowingId": int,
-                                                "rightPrecedingId": int,
-                                                "rightAlongsideId": int,
-                                                "rightFollowingId": int,
-                                                "laneId": int})
+        track_data = pd.read_csv(path_to_track_data, usecols=track_data_columns)
+        track_data_types = {"frame": int,
+                            "id": int,
+                            "x": float,
+                            "y": float,
+                            "width": float,
+                            "height": float,
+                            "xVelocity": float,
+                            "yVelocity": float,
+                            "xAcceleration": float,
+                            "yAcceleration": float,
+                            "frontSightDistance": float,
+                            "backSightDistance": float,
+                            "dhw": float,
+                            "thw": float,
+                            "ttc": float,
+                            "precedingXVelocity": float,
+                            "precedingId": int,
+                            "followingId": int,
+                            "leftPrecedingId": int,
+                            "leftAlongsideId": int,
+                            "leftFollowingId": int,
+                            "rightPrecedingId": int,
+                            "rightAlongsideId": int,
+                            "rightFollowingId": int,
+                            "laneId": int}
+        dataset.track_data = track_data.astype({column: data_type for column, data_type in track_data_types.items() if column in track_data.columns})
         dataset.load_annotations_from_csv()
         return dataset
@@ -22,8 +22,8 @@ from pyproj import CRS, Transformer
 
 from processing.NGSIMsplitting import split_peachtree_data, split_lankershim_data
 from processing.kalmansmoothing import smooth_ngsim_data
+from processing.progressreporter import ProgressReporter
 from dataobjects.enums import NGSimDatasetID
-from processing.encryptiontools import load_encrypted_pickle, save_encrypted_pickle
 
 from .dataset import Dataset
 
@@ -38,36 +38,43 @@ class NGSimDataset(Dataset):
 
     def save(self):
         self._save_annotations_to_csv()
-        file_path = os.path.join('data', self.dataset_id.data_sub_folder, self.dataset_id.data_file_name + '.pkl')
-        save_encrypted_pickle(file_path, self)
+        self._save_to_cache()
 
     @staticmethod
-    def load(dataset_id: NGSimDatasetID):
-        file_location = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name)
-        if os.path.isfile(file_location + '.pkl'):
-            return load_encrypted_pickle(file_location + '.pkl')
-        elif os.path.isfile(file_location + '.csv'):
-            dataset = NGSimDataset.read_ngsim_csv(dataset_id)
+    def load(dataset_id: NGSimDatasetID, progress_reporter=None):
+        dataset = Dataset._load_from_cache(dataset_id)
+        if dataset is not None:
+            return dataset
+        else:
+            dataset = NGSimDataset.read_ngsim_data(dataset_id, progress_reporter)
             dataset.save()
             return dataset
+
+    @staticmethod
+    def read_ngsim_data(dataset_id: NGSimDatasetID, progress_reporter=None):
+        """
+        Reads a dataset from its csv file. For the Peachtree and Lankershim datasets, the csv file is first split off from the file with all data if needed.
+        """
+        file_location = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name)
+        if os.path.isfile(file_location + '.csv'):
+            return NGSimDataset.read_ngsim_csv(dataset_id, progress_reporter)
         elif dataset_id in [NGSimDatasetID.PEACHTREE_0400_0415, NGSimDatasetID.PEACHTREE_1245_0100]:
             if os.path.isfile(os.path.join('data', dataset_id.data_sub_folder, 'NGSIM_Peachtree_Vehicle_Trajectories.csv')):
                 split_peachtree_data()
-                dataset = NGSimDataset.read_ngsim_csv(dataset_id)
-                dataset.save()
-                return dataset
+                return NGSimDataset.read_ngsim_csv(dataset_id, progress_reporter)
         elif dataset_id in [NGSimDatasetID.LANKERSHIM_0828_0845, NGSimDatasetID.LANKERSHIM_0845_0900]:
             if os.path.isfile(os.path.join('data', dataset_id.data_sub_folder, 'NGSIM__Lankershim_Vehicle_Trajectories.csv')):
                 split_lankershim_data()
-                dataset = NGSimDataset.read_ngsim_csv(dataset_id)
-                dataset.save()
-                return dataset
+                return NGSimDataset.read_ngsim_csv(dataset_id, progress_reporter)
 
         raise FileNotFoundError('The data file containing the data for ' + str(dataset_id) + ' could not be found at ./data/' + dataset_id.data_sub_folder +
                                 ' . Please read the documentation to find out where to find the data and where to put it.')
 
     @staticmethod
-    def read_ngsim_csv(dataset_id: NGSimDatasetID):
+    def read_ngsim_csv(dataset_id: NGSimDatasetID, progress_reporter=None):
+        if progress_reporter is None:
+            progress_reporter = ProgressReporter()
+
         METERS_PER_US_SURVEY_FOOT = 0.3048006096
 
         path_to_csv = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name + '.csv')
@@ -117,7 +124,9 @@ class NGSimDataset(Dataset):
 
         data_in_m['Global_lat'], data_in_m['Global_lon'] = coordinate_transformer.transform(data_in_m.Global_X.to_list(), data_in_m.Global_Y.to_list())
 
-        track_data = smooth_ngsim_data(data_in_m)
+        progress_reporter.start('Smoothing trajectories and calculating headings', data_in_m['Vehicle_ID'].nunique())
+        track_data = smooth_ngsim_data(data_in_m, progress_callback=progress_reporter.update)
+        progress_reporter.finish()
 
         dataset = NGSimDataset(track_data, dataset_id)
         dataset.load_annotations_from_csv()
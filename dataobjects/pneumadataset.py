@@ -19,17 +19,39 @@ along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 import datetime
 import time
 import os
-from PyQt5 import QtWidgets
 
 import numpy as np
 import pandas as pd
 from pyproj import CRS, Transformer
 
 from dataobjects.enums import PNeumaDatasetID
-from processing.encryptiontools import save_encrypted_pickle, load_encrypted_pickle
 from processing.kalmansmoothing import smooth_pneuma_data
+from processing.progressreporter import ProgressReporter
 from .dataset import Dataset
 
+PNEUMA_READ_BLOCK_SIZE = 4 * 2 ** 20
+
+
+class _GrowableArray:
+    def __init__(self, initial_capacity, dtype):
+        """
+        A one dimensional array that values can be appended to. The capacity grows by 50% when it is full, at the end the array is shrunk to its final size.
+        """
+        self._values = np.empty(max(initial_capacity, 1), dtype=dtype)
+        self._size = 0
+
+    def append(self, values):
+        new_size = self._size + len(values)
+        if new_size > len(self._values):
+            self._values.resize(max(new_size, int(len(self._values) * 1.5)), refcheck=False)
+
+        self._values[self._size:new_size] = values
+        self._size = new_size
+
+    def to_array(self):
+        self._values.resize(self._size, refcheck=False)
+        return self._values
+
 
 class PNeumaDataset(Dataset):
     def __init__(self, vehicles, track_data, dt: datetime.timedelta, dataset_id):
@@ -48,73 +70,113 @@ class PNeumaDataset(Dataset):
 
     def save(self):
         self._save_annotations_to_csv()
-        file_path = os.path.join('data', self.dataset_id.data_sub_folder, self.dataset_id.data_file_name + '.pkl')
-        save_encrypted_pickle(file_path, self)
+        self._save_to_cache()
 
     @staticmethod
-    def load(dataset_id: PNeumaDatasetID):
-        file_location = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name)
-        if os.path.isfile(file_location + '.pkl'):
-            return load_encrypted_pickle(file_location + '.pkl')
+    def load(dataset_id: PNeumaDatasetID, progress_reporter=None):
+        dataset = Dataset._load_from_cache(dataset_id)
+        if dataset is not None:
+            return dataset
         else:
-            dataset = PNeumaDataset.read_pneuma_csv(dataset_id)
+            dataset = PNeumaDataset.read_pneuma_csv(dataset_id, progress_reporter)
             dataset.save()
             return dataset
 
     @staticmethod
-    def read_pneuma_csv(dataset_id: PNeumaDatasetID):
-        vehicles = []
-        tracks = []
+    def _parse_pneuma_csv(file_path, progress_reporter):
+        """
+        Parses a pNeuma csv file to a data frame with vehicles and a data frame with all track data.
 
-        crs_web_mercator = CRS.from_epsg(3857)
-        crs_gps = CRS.from_epsg(4326)
-        coordinate_transformer = Transformer.from_crs(crs_gps, crs_web_mercator)
+        In a pNeuma file, every line holds one vehicle: 4 vehicle values followed by the track, 6 values per time step, all separated by semicolons. The lines
+        are read in blocks of a few megabytes. The track values of all lines in a block are parsed with a single call to NumPy and appended to a growable
+        buffer per column, so no intermediate data frames are needed. The coordinate transformation is done once for all rows at the end.
+        """
+        file_size = os.path.getsize(file_path)
+        progress_reporter.start('Converting PNeuma csv to data frame', file_size)
 
-        # get number of lines in file first
-        file_path = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name + '.csv')
-        with open(file_path, 'r') as file:
-            lines = len([line for line in file])
+        # an estimate of the number of rows in the file (a row of 6 values takes about 60 characters) limits the number of times the buffers need to grow
+        estimated_number_of_rows = file_size // 60
 
-        progress_dialog = QtWidgets.QProgressDialog('Converting PNeuma csv to data frame', None, 0, lines)
-        progress_dialog.setWindowTitle('Processing data')
-        progress_dialog.setAutoClose(True)
-        progress_dialog.show()
-        progress_dialog.setValue(0)
-        QtWidgets.QApplication.instance().processEvents()
+        vehicles = []
+        vehicle_ids = _GrowableArray(estimated_number_of_rows, np.int64)
 
         with open(file_path, 'r') as file:
-            for index, line in enumerate(file):
-                if not index:
-                    # store the header
-                    as_list = line.replace('\n', '').split(';')
-                    header_list = [header.strip() for header in as_list[4::]]
-                    vehicle_header = [header.strip() for header in as_list[0:4]]
-                else:
-                    as_list = line.replace('\n', '').split(';')
-                    vehicle = [int(as_list[0]), str(as_list[1]), float(as_list[2]), float(as_list[3])]
+            header_line = file.readline()
+            as_list = header_line.replace('\n', '').split(';')
+            header_list = [header.strip() for header in as_list[4::]]
+            vehicle_header = [header.strip() for header in as_list[0:4]]
+            bytes_read = len(header_line)
+
+            columns = [_GrowableArray(estimated_number_of_rows, float) for _ in header_list]
+
+            while True:
+                lines = file.readlines(PNEUMA_READ_BLOCK_SIZE)
+                if not lines:
+                    break
+
+                track_values = []
+                number_of_values_per_line = []
+
+                for line in lines:
+                    bytes_read += len(line)
+                    vehicle_id, vehicle_type, traveled_distance, average_speed, track = line.replace('\n', '').split(';', 4)
+                    vehicle = [int(vehicle_id), str(vehicle_type), float(traveled_distance), float(average_speed)]
                     vehicles.append(vehicle)
 
-                    x_list = []
-                    y_list = []
-                    time_data_only = np.array([float(value) for value in as_list[4:-1]])
-                    time_data_only.resize(int(len(time_data_only) / 6), 6)
+                    # the last value on a line is always dropped, normally this is the empty value after the trailing semicolon
+                    number_of_values = track.count(';')
+                    number_of_rows = number_of_values // 6
+                    if number_of_rows:
+                        track_values.append(track.rsplit(';', 1)[0])
+                        number_of_values_per_line.append(number_of_values)
+                        vehicle_ids.append(np.full(number_of_rows, vehicle[0], dtype=np.int64))
 
-                    for row in time_data_only:
-                        x, y = coordinate_transformer.transform(row[0], row[1])
-                        x_list.append(x)
-                        y_list.append(y)
+                if track_values:
+                    values = PNeumaDataset._parse_values(track_values, number_of_values_per_line)
+                    values = values.reshape(-1, len(columns))
+                    for column_index, column in enumerate(columns):
+                        column.append(values[:, column_index])
 
-                    tracks_df = pd.DataFrame(time_data_only, columns=header_list)
-                    tracks_df['vehicle_id'] = pd.Series([vehicle[0]] * len(time_data_only))
-                    tracks_df['global_x'] = pd.Series(x_list)
-                    tracks_df['global_y'] = pd.Series(y_list)
-                    tracks.append(tracks_df)
-
-                    progress_dialog.setValue(index)
-                    QtWidgets.QApplication.instance().processEvents()
+                progress_reporter.update(bytes_read)
 
         vehicles_df = pd.DataFrame(vehicles, columns=vehicle_header)
-        tracks_total_df = pd.concat(tracks, axis=0, join='outer', ignore_index=True)
+
+        track_data = {name: column.to_array() for name, column in zip(header_list, columns)}
+        track_data['vehicle_id'] = vehicle_ids.to_array()
+
+        crs_web_mercator = CRS.from_epsg(3857)
+        crs_gps = CRS.from_epsg(4326)
+        coordinate_transformer = Transformer.from_crs(crs_gps, crs_web_mercator)
+        track_data['global_x'], track_data['global_y'] = coordinate_transformer.transform(track_data[header_list[0]], track_data[header_list[1]])
+
+        return vehicles_df, pd.DataFrame(track_data, copy=False)
+
+    @staticmethod
+    def _parse_values(track_values, number_of_values_per_line):
+        """
+        Parses the semicolon separated track values of multiple lines at once. Values at the end of a line that do not form a complete row of 6 are dropped.
+        """
+        number_of_values_per_line = np.array(number_of_values_per_line)
+        values = np.fromstring(';'.join(track_values), sep=';')
+
+        if len(values) != number_of_values_per_line.sum():
+            # fromstring stops at the first value it can not parse, parse the values one by one to get a clear error message
+            values = np.array([float(value) for line in track_values for value in line.split(';')])
+
+        number_of_values_to_keep = number_of_values_per_line - number_of_values_per_line % 6
+        if (number_of_values_to_keep != number_of_values_per_line).any():
+            line_starts = np.repeat(np.cumsum(number_of_values_per_line) - number_of_values_per_line, number_of_values_per_line)
+            position_in_line = np.arange(len(values)) - line_starts
+            values = values[position_in_line < np.repeat(number_of_values_to_keep, number_of_values_per_line)]
+        return values
+
+    @staticmethod
+    def read_pneuma_csv(dataset_id: PNeumaDatasetID, progress_reporter=None):
+        if progress_reporter is None:
+            progress_reporter = ProgressReporter()
+
+        file_path = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name + '.csv')
+        vehicles_df, tracks_total_df = PNeumaDataset._parse_pneuma_csv(file_path, progress_reporter)
 
         first_id = vehicles_df['track_id'].iat[0]
         first_time_series = tracks_total_df.loc[tracks_total_df['vehicle_id'] == first_id, 'time']
@@ -123,12 +185,11 @@ class PNeumaDataset(Dataset):
         # convert speed from km/h to m/s
         tracks_total_df['speed'] = tracks_total_df['speed'] / 3.6
 
-        smooth_pneuma_data(vehicles_df, tracks_total_df, dt.total_seconds())
+        progress_reporter.start('Smoothing trajectories and calculating headings', len(vehicles_df))
+        smooth_pneuma_data(vehicles_df, tracks_total_df, dt.total_seconds(), progress_callback=progress_reporter.update)
         new_dataset = PNeumaDataset(vehicles_df, tracks_total_df, dt, dataset_id)
         new_dataset.load_annotations_from_csv()
-        new_dataset.save()
 
-        progress_dialog.close()
-        QtWidgets.QApplication.instance().processEvents()
+        progress_reporter.finish()
 
         return new_dataset
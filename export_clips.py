@@ -0,0 +1,162 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import sys
+
+from dataobjects.annotation import Annotation
+from dataobjects.dataset import Dataset
+from dataobjects.enums import CacheFormat, DataSource
+from dataobjects.enums.annotationtype import AnnotationType
+from gui.clipexport import export_annotation_clips
+from processing.batchannotation import load_corpus_annotations
+from processing.progressreporter import ConsoleProgressReporter
+from visualize import DATASET_ID_TYPES, load_dataset
+
+"""
+Exports a video clip for every annotation of a dataset to a folder, together with an index csv file. The clips are rendered in parallel without opening a
+window, see gui/clipexport.py for more details. By default the annotations stored in the dataset are used (e.g. manual annotations), for HighD recordings the
+annotations can also be read from a csv file written by annotate_highd.py.
+
+Examples (run from the main travia folder):
+    python export_clips.py -s highd -d DATASET_01 -o clips
+    python export_clips.py -s highd -d DATASET_01 -a highd_annotations.csv --padding 50 --camera-width 150 -j 4
+"""
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(description='Export a video clip for every annotation of a dataset')
+    parser.add_argument(
+        "-s",
+        "--source",
+        type=str,
+        choices=list(DATASET_ID_TYPES.keys()),
+        help="The data source, one of highd, ngsim, pneuma, exid",
+        required=True,
+    )
+    parser.add_argument(
+        "-d",
+        "--dataset",
+        type=str,
+        help="The dataset id",
+        required=True,
+    )
+    parser.add_argument(
+        "-a",
+        "--annotations",
+        type=str,
+        help="Path to a csv file written by annotate_highd.py to read the annotations from, by default the annotations of the dataset are used",
+        required=False,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="clips",
+        help="The folder to save the clips and the index file in",
+    )
+    parser.add_argument(
+        "--camera-width",
+        type=float,
+        default=100.,
+        help="The width of the area around the ego vehicle that is shown in meters",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        nargs=2,
+        default=[960, 540],
+        metavar=("WIDTH", "HEIGHT"),
+        help="The size of the clips in pixels",
+    )
+    parser.add_argument(
+        "--padding",
+        type=int,
+        default=0,
+        help="The number of frames to add before and after every annotation",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="The number of clips to render in parallel, by default the number of cpu cores",
+        required=False,
+    )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        type=str,
+        choices=["pickle", "columnar"],
+        help="The format used to cache converted data, one of pickle, columnar",
+        required=False,
+    )
+    arguments = parser.parse_args()
+
+    if arguments.cache == 'columnar':
+        Dataset.cache_format = CacheFormat.COLUMNAR
+    elif arguments.cache == 'pickle':
+        Dataset.cache_format = CacheFormat.PICKLE
+
+    try:
+        dataset_id = DATASET_ID_TYPES[arguments.source][arguments.dataset]
+    except KeyError:
+        parser.error('%s is not a valid %s dataset id' % (arguments.dataset, arguments.source))
+
+    if arguments.annotations and dataset_id.data_source != DataSource.HIGHD:
+        parser.error('annotations can only be read from a csv file for HighD recordings')
+
+    return dataset_id, arguments
+
+
+def read_recording_annotations(file_path, dataset):
+    """
+    Creates Annotation objects for all annotations of a recording in a csv file written by annotate_highd.py.
+    """
+    corpus_annotations = load_corpus_annotations(file_path).reset_index()
+    recording_annotations = corpus_annotations.loc[corpus_annotations['recording_id'] == dataset.recording_id, :]
+
+    annotations = []
+    for row in recording_annotations.itertuples():
+        annotation = Annotation(dataset.dataset_id)
+        annotation.annotation_type = AnnotationType(row.annotation_type)
+        annotation.first_frame = int(row.first_frame)
+        annotation.last_frame = int(row.last_frame)
+        annotation.ego_vehicle_id = int(row.ego_vehicle_id)
+        annotation.notes = '' if not isinstance(row.notes, str) else row.notes
+        annotations.append(annotation)
+    return annotations
+
+
+if __name__ == '__main__':
+    dataset_id, arguments = get_arguments()
+
+    progress_reporter = ConsoleProgressReporter()
+    data = load_dataset(dataset_id, progress_reporter)
+
+    annotations = read_recording_annotations(arguments.annotations, data) if arguments.annotations else data.annotation_data
+    if not annotations:
+        print('No annotations found for %s' % dataset_id)
+        sys.exit(0)
+
+    index = export_annotation_clips(data, arguments.output, annotations, frame_size=tuple(arguments.size), camera_width=arguments.camera_width,
+                                    padding=arguments.padding, number_of_workers=arguments.jobs, progress_reporter=progress_reporter)
+
+    number_of_failed_clips = (index['status'] != 'done').sum()
+    print('Exported %d clips to %s' % (len(index) - number_of_failed_clips, arguments.output))
+    if number_of_failed_clips:
+        sys.exit(1)
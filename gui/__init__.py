@@ -1,3 +1,5 @@
 from .gui import TrafficVisualizerGui
 from .worldview import WorldView
 from .datasetselectiondialog import DatasetSelectionDialog
+from .progressdialogreporter import ProgressDialogReporter
+from .offscreenrenderer import OffscreenRenderer
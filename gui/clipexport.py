@@ -0,0 +1,198 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import gc
+import multiprocessing
+import os
+import tempfile
+import time
+
+import pandas as pd
+from PyQt5 import QtWidgets
+
+from dataobjects.dataset import Dataset
+from dataobjects.enums import CacheFormat
+from processing.columnarcache import save_columnar_cache, load_columnar_cache, can_memory_map_columnar_cache
+from processing.progressreporter import ConsoleProgressReporter
+from .offscreenrenderer import OffscreenRenderer
+from .tiledmap import load_tile_pyramid
+from .worldview import WorldView
+
+"""
+Exports a video clip for every annotation of a dataset, for example to review automatic annotations. Every clip shows the frames from the first to the last
+frame of the annotation, with the camera centered on the ego vehicle. The clips are rendered offscreen by worker processes.
+
+Workers do not receive a pickled copy of the dataset. Instead, every worker memory maps an unencrypted columnar cache of the dataset (see
+processing/columnarcache.py). The track data is then shared through the page cache of the operating system and every worker only reads the rows of the frames
+it renders. If the dataset is cached in the columnar format without encryption, this cache is used. Otherwise, the dataset is saved once to a temporary
+cache, which is removed when all clips are exported. Every worker keeps one visualisation master and renderer for
+all clips it renders, so the map is only loaded once per worker.
+
+Next to the clips, an index csv file is written with one row per annotation: the clip file, the annotation and whether the export succeeded.
+"""
+
+INDEX_FILE_NAME = 'clips.csv'
+INDEX_COLUMNS = ['clip_id', 'file_name', 'dataset', 'ego_vehicle_id', 'first_frame', 'last_frame', 'annotation_type', 'notes', 'number_of_frames', 'status',
+                 'wall_time_s', 'message']
+
+_worker_renderer = None
+
+
+def _initialize_worker(cache_path, frame_size):
+    # visualize.py imports the GUI, import it here such that it is only imported when a worker is started
+    from visualize import create_visualisation_master
+    global _worker_renderer
+
+    # no window is shown, so no display is needed
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    if QtWidgets.QApplication.instance() is None:
+        _initialize_worker.app = QtWidgets.QApplication([])
+
+    dataset = load_columnar_cache(cache_path, memory_map=True)
+    _worker_renderer = OffscreenRenderer(dataset, frame_size=frame_size)
+    _worker_renderer.register_visualisation_master(create_visualisation_master(dataset, _worker_renderer))
+
+
+def _release_worker():
+    """
+    Drops the renderer and the visualisation master, which hold memory maps into the cache files. On Windows, the cache folder can only be removed after
+    these memory maps are closed.
+    """
+    global _worker_renderer
+
+    _worker_renderer.visualisation_master = None
+    _worker_renderer = None
+    # the visualisation master and its vehicles refer to each other, collect them now instead of waiting for the garbage collector
+    gc.collect()
+
+
+def export_clip(clip):
+    """
+    Renders a single clip in a worker and returns its row for the index file. Errors are reported in the row, such that one failing clip does not stop the
+    export of the others.
+    """
+    start_time = time.perf_counter()
+    row = dict(clip)
+    row.pop('file_path')
+
+    try:
+        _worker_renderer.set_ego_vehicle(clip['ego_vehicle_id'], clip['camera_width'] if clip['ego_vehicle_id'] is not None else None)
+        row['number_of_frames'] = _worker_renderer.render_video(clip['file_path'], clip['first_frame'], clip['last_frame'], fourcc=clip['fourcc'])
+        row['status'] = 'done'
+        row['message'] = ''
+    except Exception as error:
+        row['number_of_frames'] = 0
+        row['status'] = 'failed'
+        row['message'] = '%s: %s' % (type(error).__name__, error)
+
+    row['wall_time_s'] = round(time.perf_counter() - start_time, 3)
+    return row
+
+
+def get_clip_file_name(dataset_id, clip_id, annotation, extension='.avi'):
+    file_name = '%s-clip-%04d-%s-ego-%s' % (dataset_id, clip_id, annotation.annotation_type.name.lower(), annotation.ego_vehicle_id)
+
+    # remove illegal characters from filename
+    return file_name.replace(':', '-').replace('/', '-').replace('\\', '-') + extension
+
+
+def export_annotation_clips(dataset, output_folder, annotations=None, frame_size=(960, 540), camera_width=100., padding=0, number_of_workers=None,
+                            fourcc='MJPG', extension='.avi', progress_reporter=None):
+    """
+    Renders a clip for every annotation and writes the index file to the output folder. Returns the index as a DataFrame.
+
+    :param dataset: the dataset the annotations belong to
+    :param output_folder: the folder to save the clips and index file in, it is created if it does not exist
+    :param annotations: list of Annotation objects, by default the annotation data of the dataset is used
+    :param frame_size: the (width, height) of the clips in pixels
+    :param camera_width: the width of the area around the ego vehicle that is shown in meters, annotations without ego vehicle show the full map
+    :param padding: the number of frames to add before and after every annotation
+    :param number_of_workers: the number of clips that are rendered in parallel, by default the number of cpu cores. If 1, all clips are rendered in this
+    process.
+    :param fourcc: the four character code of the video codec
+    :param extension: the extension of the clip files
+    :param progress_reporter: a ProgressReporter that is updated after every clip, by default the progress is printed to the console
+    """
+    if annotations is None:
+        annotations = dataset.annotation_data
+    if progress_reporter is None:
+        progress_reporter = ConsoleProgressReporter()
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    clips = []
+    for clip_id, annotation in enumerate(annotations):
+        file_name = get_clip_file_name(dataset.dataset_id, clip_id, annotation, extension)
+        clips.append({'clip_id': clip_id,
+                      'file_name': file_name,
+                      'file_path': os.path.join(output_folder, file_name),
+                      'dataset': str(dataset.dataset_id),
+                      'ego_vehicle_id': annotation.ego_vehicle_id,
+                      'first_frame': annotation.first_frame - padding,
+                      'last_frame': annotation.last_frame + padding,
+                      'annotation_type': annotation.annotation_type.value,
+                      'notes': annotation.notes,
+                      'camera_width': camera_width,
+                      'fourcc': fourcc})
+
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count() or 1
+    number_of_workers = max(1, min(number_of_workers, len(clips)))
+
+    index = []
+    progress_reporter.start('Exporting %d clips of %s' % (len(clips), dataset.dataset_id), len(clips))
+
+    # when columnar is the preferred cache format, the dataset was loaded from (or saved to) this cache
+    existing_cache_path = Dataset._get_cache_paths(dataset.dataset_id)[CacheFormat.COLUMNAR]
+
+    with tempfile.TemporaryDirectory() as cache_folder:
+        if Dataset.cache_format is CacheFormat.COLUMNAR and can_memory_map_columnar_cache(existing_cache_path):
+            cache_path = existing_cache_path
+        else:
+            cache_path = os.path.join(cache_folder, 'dataset')
+            save_columnar_cache(cache_path, dataset, encrypt=False)
+
+        if number_of_workers <= 1:
+            _initialize_worker(cache_path, frame_size)
+            try:
+                _collect_rows(map(export_clip, clips), index, progress_reporter)
+            finally:
+                _release_worker()
+        else:
+            # otherwise all workers would build the tile pyramid of the map at the same time when the map is used for the first time
+            tiled_map_path = WorldView.get_tiled_map_path(dataset.dataset_id)
+            if tiled_map_path is not None:
+                load_tile_pyramid(tiled_map_path)
+
+            context = multiprocessing.get_context('spawn')
+            with context.Pool(number_of_workers, initializer=_initialize_worker, initargs=(cache_path, frame_size)) as pool:
+                _collect_rows(pool.imap_unordered(export_clip, clips), index, progress_reporter)
+
+    progress_reporter.finish()
+
+    index = pd.DataFrame(index, columns=INDEX_COLUMNS).sort_values('clip_id').set_index('clip_id')
+    index.to_csv(os.path.join(output_folder, INDEX_FILE_NAME))
+    return index
+
+
+def _collect_rows(rows, index, progress_reporter):
+    for row in rows:
+        index.append(row)
+        if row['status'] != 'done':
+            print('clip %d failed: %s' % (row['clip_id'], row['message']))
+        progress_reporter.update(len(index))
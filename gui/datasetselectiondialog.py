@@ -2,6 +2,7 @@ import os
 
 from PyQt5 import QtWidgets
 
+from dataobjects.dataset import Dataset
 from dataobjects.enums import DataSource, HighDDatasetID, NGSimDatasetID, PNeumaDatasetID, ExiDDatasetID
 from .dataset_selection_dialog_ui import Ui_DatasetSelectionDialog
 
@@ -40,10 +41,9 @@ class DatasetSelectionDialog(QtWidgets.QDialog):
             all_ids = HighDDatasetID if current_data_source is DataSource.HIGHD else ExiDDatasetID
 
             for dataset_id in all_ids:
-                pkl_file_path = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name + '.pkl')
                 csv_file_path = os.path.join('data', dataset_id.data_sub_folder, dataset_id.track_data_file_name + '.csv')
 
-                if os.path.isfile(pkl_file_path) or os.path.isfile(csv_file_path):
+                if Dataset.cache_exists(dataset_id) or os.path.isfile(csv_file_path):
                     self.ui.datasetComboBox.addItem(str(dataset_id), userData=dataset_id)
         elif current_data_source in [DataSource.NGSIM, DataSource.PNEUMA]:
 
@@ -51,7 +51,7 @@ class DatasetSelectionDialog(QtWidgets.QDialog):
 
             for dataset_id in all_ids:
                 file_path = os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name)
-                if os.path.isfile(file_path + '.pkl') or os.path.isfile(file_path + '.csv'):
+                if Dataset.cache_exists(dataset_id) or os.path.isfile(file_path + '.csv'):
                     self.ui.datasetComboBox.addItem(str(dataset_id), userData=dataset_id)
         else:
             raise ValueError('No alternative is implemented for this data source. Is it a new data source?')
@@ -17,7 +17,6 @@ You should have received a copy of the GNU General Public License
 along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
 import datetime
-import multiprocessing
 import os
 
 import numpy as np
@@ -26,11 +25,12 @@ from PyQt5 import QtWidgets, QtCore, QtGui
 
 from dataobjects import HighDDataset, Annotation, Vehicle, AnnotationType
 from dataobjects.enums import DataSource
-from processing.examplecost import cost_function
+from processing.examplecost import IncrementalCostGrid
 from visualisation import VisualisationMaster, HighDVisualisationMaster
 from .annotationgraphics import AnnotationGraphicsObject
 from .guimainwindow_ui import Ui_MainWindow
 from .legenddialog import LegendDialog
+from .performancehud import PerformanceHud
 from .worldview import WorldView
 from gui.widgets import PNeumaInfoWidget, NGSimInfoWidget, HighDInfoWidget, ExidInfoWidget, VehicleInfoWidget
 
@@ -42,6 +42,9 @@ class TrafficVisualizerGui(QtWidgets.QMainWindow):
     visualisation_master: VisualisationMaster
     vehicle_info_widget: VehicleInfoWidget
 
+    # the (width, height) of recorded videos in pixels, by default (None) the size of the full map image or of the view, set with --recording-size
+    recording_frame_size = None
+
     def __init__(self, dataset, parent=None):
         super().__init__(parent)
 
@@ -74,6 +77,11 @@ class TrafficVisualizerGui(QtWidgets.QMainWindow):
         self.selected_vehicle = None
         self.selected_invisible_vehicle_id = None
         self.overlay_visible = False
+        self.overlay_cost_grid = None
+
+        self.recording_image = None
+        self.recording_view_only = False
+        self.performance_hud = None
 
         self.vehicles = {}
 
@@ -112,6 +120,12 @@ class TrafficVisualizerGui(QtWidgets.QMainWindow):
         self.visualisation_master = sim_master
         self.end_time = sim_master.end_time
         self.start_time = sim_master.start_time
+
+        # painting happens after the time step, the first paint after a time step is added to its profile
+        self.view.painted.connect(sim_master.profiler.add_render_duration)
+        self.performance_hud = PerformanceHud(self.view, sim_master)
+        self.performance_hud.set_enabled(self.ui.actionShow_performance_HUD.isChecked())
+        self.ui.actionShow_performance_HUD.toggled.connect(self.performance_hud.set_enabled)
         self.restore_annotations()
         self.update_buttons()
 
@@ -227,29 +241,21 @@ class TrafficVisualizerGui(QtWidgets.QMainWindow):
         self._update_annotation_info()
 
     def toggle_play(self, record=False):
-        if self.overlay_visible:
-            self._toggle_overlay()
         if self.visualisation_master:
             self.visualisation_master.toggle_running(record=record)
             self.update_buttons()
 
     def fast_forward(self):
-        if self.overlay_visible:
-            self._toggle_overlay()
         if self.visualisation_master:
             self.visualisation_master.fast_forward()
             self.update_buttons()
 
     def reverse(self):
-        if self.overlay_visible:
-            self._toggle_overlay()
         if self.visualisation_master:
             self.visualisation_master.reverse()
             self.update_buttons()
 
     def step_frame(self, step_size):
-        if self.overlay_visible:
-            self._toggle_overlay()
         if self.visualisation_master:
             self.visualisation_master.step_frame(step_size)
 
@@ -288,27 +294,39 @@ class TrafficVisualizerGui(QtWidgets.QMainWindow):
                 self.ui.annotationEgoCarComboBox.setCurrentText(str(vehicle.id))
 
     def get_image_of_current_view(self):
-        original_map_size = self.view.map_item.pixmap().size()
+        image = QtGui.QImage(self.view.get_map_image_size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+        self.view.render_scene(image)
+        return image
 
-        if self.dataset_id.data_source in [DataSource.NGSIM, DataSource.PNEUMA]:
-            # NGSIM and PNeuma Maps are quite big, scale them down and save at 25%
-            original_map_size = 0.25 * original_map_size
-        if self.dataset_id.data_source is DataSource.EXID:
-            v = self.visualisation_master.sim_data.dataset_version
-            if int(v[0]) > 2 or (int(v[0]) == 2 and int(v[1]) >= 1):
-                # ExiD maps are big after version 2.1, scale them down and save at 25%
-                original_map_size = 0.25 * original_map_size
+    def start_recording_frames(self):
+        """
+        Allocates the image that every recorded frame is rendered into and returns its (width, height). Depending on the view menu, either the full map or only
+        the current view is recorded. The view is rendered at the recording size, so zoomed in recordings of large maps are a lot cheaper to render and encode.
+        """
+        self.recording_view_only = self.ui.actionRecord_current_view_only.isChecked()
 
-        scene_bounding_rect = self.view.map_item.sceneBoundingRect()
+        if self.recording_frame_size is not None:
+            frame_size = QtCore.QSize(*self.recording_frame_size)
+        elif self.recording_view_only:
+            frame_size = self.view.viewport().size()
+        else:
+            frame_size = self.view.get_map_image_size()
 
-        image = QtGui.QImage(original_map_size, QtGui.QImage.Format_ARGB32_Premultiplied)
-        image_rect = QtCore.QRectF(image.rect())
+        self.recording_image = QtGui.QImage(frame_size, QtGui.QImage.Format_ARGB32_Premultiplied)
+        self.ui.actionRecord_current_view_only.setEnabled(False)
+        return frame_size.width(), frame_size.height()
 
-        painter = QtGui.QPainter(image)
-        self.view.scene.render(painter, image_rect, scene_bounding_rect, QtCore.Qt.KeepAspectRatio)
-        painter.end()
+    def render_recording_frame(self):
+        # the image is reused, the video recorder keeps a copy as long as it needs the previous frame
+        if self.recording_view_only:
+            self.view.render_view(self.recording_image)
+        else:
+            self.view.render_scene(self.recording_image)
+        return self.recording_image
 
-        return image
+    def stop_recording_frames(self):
+        self.recording_image = None
+        self.ui.actionRecord_current_view_only.setEnabled(True)
 
     def save_current_scene(self):
         save_path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Save current scene', 'data', filter='*.png')
@@ -353,6 +371,8 @@ class TrafficVisualizerGui(QtWidgets.QMainWindow):
 
     def update_all_graphics_positions(self):
         self.view.update_all_graphics_positions()
+        if self.overlay_visible:
+            self._update_overlay()
         if self.selected_vehicle:
             self.vehicle_info_widget.update_information(self.selected_vehicle)
 
@@ -377,12 +397,9 @@ class TrafficVisualizerGui(QtWidgets.QMainWindow):
         self.ui.fastForwardButton.setEnabled(bool(self.visualisation_master))
         self.ui.rewindButton.setEnabled(bool(self.visualisation_master))
         self.ui.timeEdit.setEnabled(bool(self.visualisation_master))
-        self.ui.createOverlayPushButton.setEnabled(
-            bool(self.visualisation_master) and isinstance(self.visualisation_master, HighDVisualisationMaster) and not self.visualisation_master.is_running)
+        self.ui.createOverlayPushButton.setEnabled(bool(self.visualisation_master) and isinstance(self.visualisation_master, HighDVisualisationMaster))
 
     def set_time(self, value):
-        if self.overlay_visible:
-            self._toggle_overlay()
         if self.visualisation_master:
             self.visualisation_master.set_time(value / 1000)
 
@@ -463,20 +480,15 @@ class TrafficVisualizerGui(QtWidgets.QMainWindow):
     def _toggle_overlay(self):
         """
         This is an example of how to create a heatmap overlay. The reward function used here purely serves as an example and has no meaning.
-        This example only works with HighD datasets
+        This example only works with HighD datasets. While the overlay is visible, it is updated every frame (see _update_overlay).
         """
         if self.overlay_visible:
             self.view.remove_overlay()
             self.overlay_visible = False
+            self.overlay_cost_grid = None
         elif isinstance(self.visualisation_master.sim_data, HighDDataset):
             self.setCursor(QtCore.Qt.WaitCursor)
 
-            surrounding_vehicles_positions = []
-            for id, vehicle in self.vehicles.items():
-                surrounding_vehicles_positions.append(vehicle.center_position)
-
-            surrounding_vehicles_positions = np.array(surrounding_vehicles_positions)
-
             pixels_per_meter = 5
             map_width = self.view.map_item.sceneBoundingRect().width()
             map_height = self.view.map_item.sceneBoundingRect().height()
@@ -494,20 +506,24 @@ class TrafficVisualizerGui(QtWidgets.QMainWindow):
             for index in range(len(lower_markings) - 1):
                 lane_centers.append((lower_markings[index + 1] - lower_markings[index]) / 2 + lower_markings[index])
 
-            x = [np.array([w / pixels_per_meter, h / pixels_per_meter]) for h in range(pixel_height) for w in range(pixel_width)]
-            args = zip(x, [surrounding_vehicles_positions] * len(x), [lane_centers] * len(x))
+            x_coordinates = np.arange(pixel_width) / pixels_per_meter
+            y_coordinates = np.arange(pixel_height) / pixels_per_meter
+            self.overlay_cost_grid = IncrementalCostGrid(x_coordinates, y_coordinates, lane_centers)
+            self.overlay_cost_grid.update({vehicle_id: vehicle.center_position for vehicle_id, vehicle in self.vehicles.items()})
 
-            with multiprocessing.Pool(10) as p:
-                costs_per_position = p.starmap(cost_function, args)
-
-            overlay_data = np.array(costs_per_position)
-            overlay_data.resize((pixel_height, pixel_width))
-
-            self.view.add_overlay(overlay_data, pixel_width, pixel_height)
+            # the overlay is updated every frame, a fixed value range keeps the colors comparable between frames
+            self.view.add_overlay(self.overlay_cost_grid.get_costs(), pixel_width, pixel_height, value_range=self.overlay_cost_grid.get_value_range())
             self.overlay_visible = True
             self.update_buttons()
             self.setCursor(QtCore.Qt.ArrowCursor)
 
+    def _update_overlay(self):
+        """
+        Updates the overlay to the current vehicle positions. Only the parts of the cost grid and the overlay around vehicles that moved are updated.
+        """
+        changed_windows = self.overlay_cost_grid.update({vehicle_id: vehicle.center_position for vehicle_id, vehicle in self.vehicles.items()})
+        self.view.update_overlay(self.overlay_cost_grid.get_costs(), changed_windows)
+
     def resizeEvent(self, e):
         view_rect = QtCore.QRectF(0.0, 0.0, self.ui.annotationGraphicsView.scene().itemsBoundingRect().width(), 1.0)
         self.ui.annotationGraphicsView.fitInView(view_rect, QtCore.Qt.KeepAspectRatio)
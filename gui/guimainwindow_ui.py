@@ -169,8 +169,17 @@ class Ui_MainWindow(object):
         self.actionColor_legend.setObjectName("actionColor_legend")
         self.actionSave_current_scene_to_image = QtWidgets.QAction(MainWindow)
         self.actionSave_current_scene_to_image.setObjectName("actionSave_current_scene_to_image")
+        self.actionRecord_current_view_only = QtWidgets.QAction(MainWindow)
+        self.actionRecord_current_view_only.setCheckable(True)
+        self.actionRecord_current_view_only.setObjectName("actionRecord_current_view_only")
+        self.actionShow_performance_HUD = QtWidgets.QAction(MainWindow)
+        self.actionShow_performance_HUD.setCheckable(True)
+        self.actionShow_performance_HUD.setObjectName("actionShow_performance_HUD")
         self.menuView.addAction(self.actionColor_legend)
         self.menuView.addAction(self.actionSave_current_scene_to_image)
+        self.menuView.addSeparator()
+        self.menuView.addAction(self.actionRecord_current_view_only)
+        self.menuView.addAction(self.actionShow_performance_HUD)
         self.menubar.addAction(self.menuView.menuAction())
 
         self.retranslateUi(MainWindow)
@@ -201,3 +210,5 @@ class Ui_MainWindow(object):
         self.menuView.setTitle(_translate("MainWindow", "View"))
         self.actionColor_legend.setText(_translate("MainWindow", "Color legend"))
         self.actionSave_current_scene_to_image.setText(_translate("MainWindow", "Save current scene to image"))
+        self.actionRecord_current_view_only.setText(_translate("MainWindow", "Record current view only"))
+        self.actionShow_performance_HUD.setText(_translate("MainWindow", "Show performance HUD"))
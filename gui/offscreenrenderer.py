@@ -0,0 +1,143 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from PyQt5 import QtCore, QtGui
+
+from visualisation.videorecorder import VideoRecorder
+from .worldview import WorldView
+
+"""
+Renders the visualisation of a dataset to a video file without a window and without a timer. The OffscreenRenderer takes the place of the
+TrafficVisualizerGui for a visualisation master. Vehicles are drawn by the same WorldView and VehicleGraphicsObjects as in the GUI, so the video looks the same
+as a recording made in the GUI. Frames are rendered one after another as fast as possible, the encoding is done by the writer thread of a VideoRecorder.
+
+A QApplication has to exist before creating a renderer. To render on a machine without a display, set the environment variable QT_QPA_PLATFORM=offscreen.
+"""
+
+
+class OffscreenRenderer:
+    def __init__(self, dataset, frame_size=None, ego_vehicle_id=None, camera_width=None):
+        """
+        :param dataset: the dataset to render
+        :param frame_size: the (width, height) of the video in pixels, defaults to the size of a recording in the GUI (the full map, large maps at 25%)
+        :param ego_vehicle_id: the id of a vehicle to highlight
+        :param camera_width: if provided, the camera shows an area of this width in meters centered on the ego vehicle, instead of the full map
+        """
+        self.dataset_id = dataset.dataset_id
+        self.view = WorldView(self, dataset.dataset_id, dataset)
+        self.visualisation_master = None
+        self.vehicles = {}
+
+        self.ego_vehicle_id = None
+        self.camera_width = None
+        self.set_ego_vehicle(ego_vehicle_id, camera_width)
+        self.camera_center = self.view.map_item.sceneBoundingRect().center()
+
+        if frame_size is None:
+            map_image_size = self.view.get_map_image_size()
+            frame_size = (map_image_size.width(), map_image_size.height())
+        self.frame_size = tuple(frame_size)
+
+        # the image is reused for every frame, it is only copied when the writer thread of the recorder still holds the previous frame
+        self.image = QtGui.QImage(self.frame_size[0], self.frame_size[1], QtGui.QImage.Format_ARGB32_Premultiplied)
+
+    def register_visualisation_master(self, visualisation_master):
+        self.visualisation_master = visualisation_master
+
+    def set_ego_vehicle(self, ego_vehicle_id, camera_width=None):
+        """
+        Changes the highlighted vehicle and the camera. This way one renderer can render clips of different vehicles.
+        """
+        if self.ego_vehicle_id in self.vehicles:
+            self.view.deselect_vehicle(self.vehicles[self.ego_vehicle_id])
+
+        self.ego_vehicle_id = None if ego_vehicle_id is None else str(ego_vehicle_id)
+        self.camera_width = camera_width
+
+        if self.ego_vehicle_id in self.vehicles:
+            self.view.select_vehicle(self.vehicles[self.ego_vehicle_id])
+
+    def render_frame(self, frame_number):
+        """
+        Shows a frame and renders it to the image of the renderer, which is returned.
+        """
+        self.visualisation_master.go_to_frame(frame_number)
+        self.view.render_scene(self.image, self._get_camera_rect())
+        return self.image
+
+    def render_video(self, file_path, first_frame=None, last_frame=None, fourcc='MJPG', progress_reporter=None):
+        """
+        Renders the frames from first_frame to last_frame (inclusive) to a video file at the playback speed of the GUI. By default all frames are rendered.
+        Returns the number of frames in the video.
+        """
+        default_first_frame, default_last_frame = self.visualisation_master.frame_range
+        first_frame = default_first_frame if first_frame is None else first_frame
+        last_frame = default_last_frame if last_frame is None else last_frame
+        frame_numbers = range(first_frame, last_frame + 1, self.visualisation_master.default_frame_step)
+
+        recorder = VideoRecorder(file_path, self.visualisation_master.playback_frame_rate, self.frame_size, fourcc=fourcc, drop_frames=False)
+        if progress_reporter:
+            progress_reporter.start('Rendering %s' % file_path, len(frame_numbers))
+
+        try:
+            for number_of_rendered_frames, frame_number in enumerate(frame_numbers):
+                recorder.add_frame(self.render_frame(frame_number))
+                if progress_reporter:
+                    progress_reporter.update(number_of_rendered_frames + 1)
+        finally:
+            recorder.stop()
+
+        if progress_reporter:
+            progress_reporter.finish()
+        return recorder.number_of_frames_written
+
+    def _get_camera_rect(self):
+        if self.camera_width is None:
+            return None
+
+        if self.ego_vehicle_id in self.vehicles:
+            position = self.vehicles[self.ego_vehicle_id].current_position
+            self.camera_center = QtCore.QPointF(position[0], position[1])
+
+        # the camera keeps the aspect ratio of the video, it stays at the last known position when the ego vehicle is not in the frame
+        width, height = self.frame_size
+        camera_height = self.camera_width * height / width
+        return QtCore.QRectF(self.camera_center.x() - self.camera_width / 2, self.camera_center.y() - camera_height / 2, self.camera_width, camera_height)
+
+    def add_vehicle(self, vehicle, vehicle_id):
+        self.vehicles[vehicle_id] = vehicle
+        self.view.add_vehicle(vehicle, vehicle_id)
+
+        if vehicle_id == self.ego_vehicle_id:
+            self.view.select_vehicle(vehicle)
+
+    def remove_vehicle(self, vehicle, vehicle_id):
+        self.view.remove_vehicle(vehicle_id)
+        self.vehicles.pop(vehicle_id)
+
+    def update_all_graphics_positions(self):
+        self.view.update_all_graphics_positions()
+
+    def select_vehicle(self, vehicle):
+        pass
+
+    def update_time_in_gui(self, time, frame_number):
+        pass
+
+    def update_buttons(self):
+        pass
@@ -16,62 +16,150 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
-import ctypes
+import numpy as np
+from PyQt5 import QtGui, QtWidgets, QtCore
 
-from PyQt5 import QtGui
+NUMBER_OF_COLORS = 4 * 2 ** 8
+
+
+def short_rainbow_lookup_table():
+    """
+    Returns a lookup table of NUMBER_OF_COLORS colors (as 0xAARRGGBB) based on the short rainbow implementation found here:
+    https://www.particleincell.com/2014/colormap/, but not completely the same. The table is split in four groups. In every group, two of the three colors are
+    kept constant and the third runs from 0-255 or 255-0. This results in a continuous range: 0xFF0000FF - 0xFF00FFFF - 0xFF00FF00 - 0xFFFFFF00 - 0xFFFF0000
+    """
+    values = np.arange(2 ** 8, dtype=np.uint32)
+    return np.concatenate([0xFF0000FF + values * 2 ** 8,
+                           0xFF00FF00 + (2 ** 8 - 1 - values),
+                           0xFF00FF00 + values * 2 ** 16,
+                           0xFFFF0000 + (2 ** 8 - 1 - values) * 2 ** 8]).astype(np.uint32)
+
+
+def grayscale_lookup_table():
+    """
+    Returns a lookup table of NUMBER_OF_COLORS colors (as 0xAARRGGBB) that runs from black to white.
+    """
+    gray_values = np.arange(NUMBER_OF_COLORS, dtype=np.uint32) // 4
+    return (0xFF000000 + gray_values * 0x010101).astype(np.uint32)
+
+
+COLOR_MAPS = {'short_rainbow': short_rainbow_lookup_table(),
+              'grayscale': grayscale_lookup_table()}
 
 
 class Overlay(QtGui.QPixmap):
-    def __init__(self, data, width, height):
+    def __init__(self, data, width, height, color_map='short_rainbow', value_range=None):
         """
         A pixmap overlay for the world view, to visualize cost/reward functions or other parameters. The data should be supplied as a table with scalar values.
-        All values are converted to pixels in the pixmap. High values will be displayed as red, low values as blue.
+        All values are converted to pixels in the pixmap. With the default color map, high values will be displayed as red, low values as blue.
+
+        The values are discretised to NUMBER_OF_COLORS (1024) levels, which are converted to colors with a lookup table. By default, the values are
+        automatically scaled such that the minimum value gets the first color and the maximum value the last. If a fixed value range is provided, values
+        outside of this range are clipped. A fixed range keeps the colors comparable when the overlay is updated with new data.
 
-        The values are automatically scaled such that the minimum value is full blue and the maximum value is full red. A 24 bit color representation
-        (0xRRBBGG) is used, so the values a discretised to a 1024 value color system.
+        The image that the colors are written to is kept, so the overlay can be updated with set_data without allocating new buffers. With a fixed value
+        range, set_window only converts a window of the data, which is faster when only small parts of the data change (e.g. around moving vehicles).
 
-        :param data: scalar data table to be converted to colormap
+        :param data: scalar data table to be converted to colormap, this array is not altered
         :param width: with in pixels
         :param height: height in pixels
+        :param color_map: the name of a color map in COLOR_MAPS, or a lookup table with NUMBER_OF_COLORS uint32 colors
+        :param value_range: tuple of (minimum value, maximum value), or None to scale to the minimum and maximum of the data
         """
         super().__init__(width, height)
 
         self.data_width = width
         self.data_height = height
+        self.lookup_table = COLOR_MAPS[color_map] if isinstance(color_map, str) else np.asarray(color_map, dtype=np.uint32)
+        self.value_range = value_range
+
+        self._image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+        self._scaled_values = np.empty((height, width))
+        self._color_indices = np.empty((height, width), dtype=np.intp)
+
+        self.set_data(data)
 
-        self._set_data(data)
+    def _get_image_pixels(self):
+        """
+        Returns a (height x width) uint32 view on the pixels of the image. The rows of a QImage can be padded, so the view uses the bytes per line as row stride.
+        """
+        pointer = self._image.bits()
+        pointer.setsize(self._image.sizeInBytes())
+        rows = np.frombuffer(pointer, dtype=np.uint32).reshape(self.data_height, self._image.bytesPerLine() // 4)
+        return rows[:, 0:self.data_width]
 
-    def _set_data(self, data):
+    def set_data(self, data):
         """
-        Convert the data to a colormap, load this as a QImage and convert the QImage to a QPixmap for easy displaying.
-        :param data: scalar data table to be converted to colormap
-        :return:
+        Converts the data to colors, writes them to the image and converts the image to this pixmap.
+
+        :param data: scalar data table of height x width to be converted to colormap
         """
+        if self.value_range is None:
+            minimum_value, maximum_value = data.min(), data.max()
+        else:
+            minimum_value, maximum_value = self.value_range
+
+        # map data to integer values from 0 to NUMBER_OF_COLORS - 1, using preallocated buffers
+        factor = (NUMBER_OF_COLORS - 1) / (maximum_value - minimum_value) if maximum_value > minimum_value else 0.
+        np.subtract(data.reshape(self.data_height, self.data_width), minimum_value, out=self._scaled_values)
+        self._scaled_values *= factor
+        np.rint(self._scaled_values, out=self._scaled_values)
+        np.clip(self._scaled_values, 0, NUMBER_OF_COLORS - 1, out=self._scaled_values)
+        np.copyto(self._color_indices, self._scaled_values, casting='unsafe')
+
+        pixels = self._get_image_pixels()
+        if pixels.flags.c_contiguous:
+            np.take(self.lookup_table, self._color_indices, out=pixels)
+        else:
+            pixels[:] = np.take(self.lookup_table, self._color_indices)
+
+        self.convertFromImage(self._image)
+
+    def set_window(self, data, rows, columns):
+        """
+        Converts a window of the data to colors and draws only this window on the pixmap. This needs a fixed value range, without one the full data is
+        converted with set_data.
+
+        :param data: scalar data table of height x width, of which only the window is used
+        :param rows: slice with the rows of the window
+        :param columns: slice with the columns of the window
+        """
+        if self.value_range is None:
+            self.set_data(data)
+            return
+
+        minimum_value, maximum_value = self.value_range
+        factor = (NUMBER_OF_COLORS - 1) / (maximum_value - minimum_value) if maximum_value > minimum_value else 0.
+
+        scaled_values = self._scaled_values[rows, columns]
+        np.subtract(data.reshape(self.data_height, self.data_width)[rows, columns], minimum_value, out=scaled_values)
+        scaled_values *= factor
+        np.rint(scaled_values, out=scaled_values)
+        np.clip(scaled_values, 0, NUMBER_OF_COLORS - 1, out=scaled_values)
+        color_indices = self._color_indices[rows, columns]
+        np.copyto(color_indices, scaled_values, casting='unsafe')
+        self._get_image_pixels()[rows, columns] = np.take(self.lookup_table, color_indices)
+
+        window = QtCore.QRect(int(columns.start), int(rows.start), scaled_values.shape[1], scaled_values.shape[0])
+        painter = QtGui.QPainter(self)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        painter.drawImage(window.topLeft(), self._image, window)
+        painter.end()
+
+
+class OverlayItem(QtWidgets.QGraphicsItem):
+    def __init__(self, overlay, parent=None):
+        """
+        Draws an Overlay in the scene. Unlike a QGraphicsPixmapItem, it does not keep its own copy of the pixmap, so drawing a window on the overlay with
+        set_window does not copy the full pixmap. Call update with the rectangle of the window afterwards.
+        """
+        super().__init__(parent)
+        self.setFlag(QtWidgets.QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.overlay = overlay
+
+    def boundingRect(self):
+        return QtCore.QRectF(0., 0., self.overlay.width(), self.overlay.height())
 
-        """ map data to integer values from 0 to 4 * 2^8 - 1 (1023), store as unsigned 32 bit integer array """
-        min_value = data.min()
-        data -= min_value
-
-        max_value = data.max()
-        factor = (4 * (2 ** 8) - 1) / max_value
-        data *= factor
-        data = data.round().astype(ctypes.c_uint32)
-
-        """ Convert discretized data to color map (based on the short rainbow implementation found here: https://www.particleincell.com/2014/colormap/, 
-        but not completely the same). Data is split in four groups, and all values are converted to range from 0-255 or 255-0. Then two of the three colors are 
-        kept constant for each group, and the third is swapped by the value (in a color representation of 0xFFRRGGBB). This results in the values being mapped  
-        to a continues range: 0xFF0000FF - 0xFF00FFFF - 0xFF00FF00 - 0xFFFFFF00 - 0xFFFF0000"""
-
-        rgb_table = data.copy()
-
-        rgb_table[data < 1 * (2 ** 8)] = 0xFF0000FF + data[data < 1 * (2 ** 8)].astype(ctypes.c_uint16) * 2 ** 8
-        rgb_table[(data >= 1 * (2 ** 8)) & (data < 2 * (2 ** 8))] = 0xFF00FF00 + (
-                -1 * (data[(data >= 1 * (2 ** 8)) & (data < 2 * (2 ** 8))] - 1 * 2 ** 8) + 2 ** 8 - 1).astype(ctypes.c_uint16)
-        rgb_table[(data >= 2 * (2 ** 8)) & (data < 3 * (2 ** 8))] = 0xFF00FF00 + (data[(data >= 2 * (2 ** 8)) & (data < 3 * (2 ** 8))] - 2 * (2 ** 8)).astype(
-            ctypes.c_uint16) * 2 ** 16
-        rgb_table[(data >= 3 * (2 ** 8)) & (data < 4 * (2 ** 8))] = 0xFFFF0000 + (
-                -1 * (data[(data >= 3 * (2 ** 8)) & (data < 4 * (2 ** 8))] - 3 * (2 ** 8)) + 2 ** 8 - 1).astype(ctypes.c_uint16) * 2 ** 8
-
-        """ Construct image and set data. """
-        im = QtGui.QImage(rgb_table.tobytes(), self.data_width, self.data_height, QtGui.QImage.Format_ARGB32)
-        self.convertFromImage(im)
+    def paint(self, painter, option, widget=None):
+        exposed_rect = option.exposedRect.intersected(self.boundingRect())
+        painter.drawPixmap(exposed_rect, self.overlay, exposed_rect)
@@ -0,0 +1,72 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from PyQt5 import QtWidgets, QtGui, QtCore
+
+from visualisation.playbackprofiler import STAGES
+
+"""
+An optional overlay on the WorldView that shows the effective frame rate of playback, the number of missed timer ticks and the mean duration of the stages of
+a time step (see visualisation/playbackprofiler.py). The text is refreshed twice per second instead of every frame, so the HUD itself hardly costs time.
+"""
+
+# the number of most recent time steps that the mean durations are computed over
+NUMBER_OF_TIME_STEPS_IN_SUMMARY = 50
+
+
+class PerformanceHud(QtWidgets.QLabel):
+    def __init__(self, view, visualisation_master):
+        super().__init__(parent=view)
+        self.view = view
+        self.visualisation_master = visualisation_master
+
+        font = QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont)
+        self.setFont(font)
+        self.setStyleSheet('QLabel { background-color: rgba(0, 0, 0, 160); color: white; padding: 4px; }')
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+
+        self.refresh_timer = QtCore.QTimer()
+        self.refresh_timer.setInterval(500)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def set_enabled(self, enabled):
+        self.setVisible(enabled)
+        if enabled:
+            self.refresh()
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+
+    def refresh(self):
+        profiler = self.visualisation_master.profiler
+        main_timer = self.visualisation_master.main_timer
+        target_frame_rate = 1e3 / main_timer.interval() if main_timer.isActive() and main_timer.interval() else 0.
+
+        lines = ['FPS %5.1f / %4.1f   missed ticks %d' % (profiler.get_effective_frame_rate(), target_frame_rate, profiler.number_of_missed_ticks)]
+
+        summary = profiler.get_summary(NUMBER_OF_TIME_STEPS_IN_SUMMARY)
+        for stage in STAGES:
+            if stage in summary:
+                lines.append('%-15s %7.2f ms' % (stage, summary[stage]['mean_ms']))
+
+        counts = self.view.frame_update_counts
+        lines.append('items  +%d  -%d  moved %d' % (counts['added'], counts['removed'], counts['moved']))
+
+        self.setText('\n'.join(lines))
+        self.adjustSize()
+        self.move(self.view.width() - self.width() - 10, 10)
@@ -0,0 +1,65 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import time
+
+from PyQt5 import QtWidgets
+
+from processing.progressreporter import ProgressReporter
+
+
+class ProgressDialogReporter(ProgressReporter):
+    def __init__(self, minimum_update_interval=0.05):
+        """
+        Shows the progress of processing steps in a QProgressDialog. The dialog is only updated (and the Qt events processed) when at least
+        minimum_update_interval seconds have passed since the last update, such that frequent progress updates do not slow down the processing.
+        """
+        self.minimum_update_interval = minimum_update_interval
+        self.progress_dialog = None
+        self._last_update_time = 0.
+
+    def start(self, message, total):
+        if self.progress_dialog is None:
+            self.progress_dialog = QtWidgets.QProgressDialog(message, None, 0, total)
+            self.progress_dialog.setWindowTitle('Processing data')
+            self.progress_dialog.setAutoClose(False)
+        else:
+            self.progress_dialog.setLabelText(message)
+            self.progress_dialog.setMaximum(total)
+
+        self.progress_dialog.setValue(0)
+        self.progress_dialog.show()
+        self._process_events()
+
+    def update(self, value, total=None):
+        if total is not None and total != self.progress_dialog.maximum():
+            self.progress_dialog.setMaximum(total)
+
+        if time.perf_counter() - self._last_update_time < self.minimum_update_interval:
+            return
+
+        self.progress_dialog.setValue(value)
+        self._process_events()
+
+    def finish(self):
+        self.progress_dialog.close()
+        self._process_events()
+
+    def _process_events(self):
+        self._last_update_time = time.perf_counter()
+        QtWidgets.QApplication.instance().processEvents()
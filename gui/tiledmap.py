@@ -0,0 +1,237 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import collections
+import json
+import math
+import os
+import shutil
+import tempfile
+
+from PyQt5 import QtWidgets, QtGui, QtCore
+
+"""
+The NGSIM and pNeuma maps are large orthophotos. Instead of loading them in a single pixmap, they are cut into a pyramid of tiles: level 0 holds the map at full
+resolution, every next level is scaled down by a factor two, until the map fits in a single tile. The pyramid is generated once and saved in a folder next to
+the map image (<map image name>_tiles). It is generated again if the map image changes. The pyramid is built in a temporary folder that is moved into place
+when it is complete, so other processes never read a partially written pyramid. If the pyramid can not be written (e.g. the data folder is read only), the map
+is loaded as a single pixmap instead.
+
+A TiledMapItem takes the place of the QGraphicsPixmapItem of the map. When painted, it selects the level that has about one tile pixel per device pixel and
+only draws the tiles that are exposed. Tiles are loaded when they are first needed and the most recently used tiles are kept in memory. This way, the full
+resolution map is never held in memory after the pyramid is generated, and showing or recording the full map only draws a few small tiles.
+"""
+
+PYRAMID_VERSION = 1
+TILE_SIZE = 512
+HEADER_FILE_NAME = 'pyramid.json'
+
+# the number of tiles kept in memory, at most 1 MB each
+MAXIMUM_NUMBER_OF_CACHED_TILES = 256
+
+
+def get_tile_folder(image_path):
+    return os.path.splitext(image_path)[0] + '_tiles'
+
+
+def _get_tile_path(tile_folder, level, row, column):
+    return os.path.join(tile_folder, 'level_%02d' % level, 'tile_%04d_%04d.png' % (row, column))
+
+
+def _get_source_stats(image_path):
+    file_stats = os.stat(image_path)
+    return {'size': file_stats.st_size, 'mtime_ns': file_stats.st_mtime_ns}
+
+
+def _load_header(tile_folder):
+    try:
+        with open(os.path.join(tile_folder, HEADER_FILE_NAME)) as header_file:
+            return json.load(header_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def is_tile_pyramid_up_to_date(image_path):
+    header = _load_header(get_tile_folder(image_path))
+    if header is None or header.get('pyramid_version') != PYRAMID_VERSION:
+        return False
+    return header['source'] == _get_source_stats(image_path)
+
+
+def build_tile_pyramid(image_path, tile_size=TILE_SIZE):
+    """
+    Cuts the image in a pyramid of tiles and saves it in the tile folder of the image. Returns the header of the pyramid, or None if the image can not be read.
+    An OSError is raised if the pyramid can not be written.
+    """
+    image = QtGui.QImage(image_path)
+    if image.isNull():
+        return None
+
+    # the temporary folder is next to the tile folder, such that it can be moved into place with a rename
+    final_tile_folder = get_tile_folder(os.path.abspath(image_path))
+    tile_folder = tempfile.mkdtemp(prefix=os.path.basename(final_tile_folder) + '_', dir=os.path.dirname(final_tile_folder))
+    try:
+        header = _write_tile_pyramid(image, image_path, tile_folder, tile_size)
+        _move_into_place(image_path, tile_folder, final_tile_folder)
+    except OSError:
+        shutil.rmtree(tile_folder, ignore_errors=True)
+        raise
+    return header
+
+
+def _move_into_place(image_path, tile_folder, final_tile_folder):
+    # another process may have built the same pyramid in the meantime, it may already be in use so it is kept
+    if is_tile_pyramid_up_to_date(image_path):
+        shutil.rmtree(tile_folder, ignore_errors=True)
+        return
+
+    if os.path.isdir(final_tile_folder):
+        # an out of date pyramid is removed first, a folder can not be replaced by another folder
+        shutil.rmtree(final_tile_folder)
+
+    try:
+        os.replace(tile_folder, final_tile_folder)
+    except OSError:
+        if not is_tile_pyramid_up_to_date(image_path):
+            raise
+        shutil.rmtree(tile_folder, ignore_errors=True)
+
+
+def _write_tile_pyramid(image, image_path, tile_folder, tile_size):
+    level_sizes = []
+    level = 0
+
+    while True:
+        os.makedirs(os.path.join(tile_folder, 'level_%02d' % level), exist_ok=True)
+        number_of_rows = math.ceil(image.height() / tile_size)
+        number_of_columns = math.ceil(image.width() / tile_size)
+
+        for row in range(number_of_rows):
+            for column in range(number_of_columns):
+                tile = image.copy(column * tile_size, row * tile_size, min(tile_size, image.width() - column * tile_size),
+                                  min(tile_size, image.height() - row * tile_size))
+                tile_path = _get_tile_path(tile_folder, level, row, column)
+                if not tile.save(tile_path):
+                    raise OSError('Could not save map tile %s' % tile_path)
+
+        level_sizes.append([image.width(), image.height()])
+        if number_of_rows == 1 and number_of_columns == 1:
+            break
+
+        image = image.scaled(math.ceil(image.width() / 2), math.ceil(image.height() / 2), QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+        level += 1
+
+    # the header is written last, such that a pyramid without header is never used
+    header = {'pyramid_version': PYRAMID_VERSION,
+              'source': _get_source_stats(image_path),
+              'tile_size': tile_size,
+              'level_sizes': level_sizes}
+    with open(os.path.join(tile_folder, HEADER_FILE_NAME), 'w') as header_file:
+        json.dump(header, header_file, indent=4)
+    return header
+
+
+def load_tile_pyramid(image_path):
+    """
+    Returns the header of the tile pyramid of an image, the pyramid is generated first if it does not exist or is out of date. Returns None if the image can
+    not be read or the pyramid can not be written.
+    """
+    if is_tile_pyramid_up_to_date(image_path):
+        return _load_header(get_tile_folder(image_path))
+
+    print('Generating map tiles for %s, this is only done once' % image_path)
+    try:
+        return build_tile_pyramid(image_path)
+    except OSError as error:
+        print('Could not generate map tiles, the map is loaded as a single image: %s' % error)
+        return None
+
+
+class TiledMapItem(QtWidgets.QGraphicsItem):
+    def __init__(self, tile_folder, header, parent=None):
+        super().__init__(parent)
+        self.setFlag(QtWidgets.QGraphicsItem.ItemUsesExtendedStyleOption)
+
+        self.tile_folder = tile_folder
+        self.tile_size = header['tile_size']
+        self.level_sizes = header['level_sizes']
+        self.tiles = collections.OrderedDict()
+
+    @staticmethod
+    def load(image_path):
+        """
+        Creates a TiledMapItem for an image. The tile pyramid is generated first if it does not exist or is out of date. Returns None if the image can not
+        be read or the pyramid can not be written, the map should then be loaded as a pixmap.
+        """
+        if not os.path.isfile(image_path):
+            return None
+
+        header = load_tile_pyramid(image_path)
+        if header is None:
+            return None
+        return TiledMapItem(get_tile_folder(image_path), header)
+
+    def image_size(self):
+        return QtCore.QSize(*self.level_sizes[0])
+
+    def boundingRect(self):
+        return QtCore.QRectF(0., 0., *self.level_sizes[0])
+
+    def select_level(self, level_of_detail):
+        """
+        Selects the smallest level that has at least one pixel per device pixel. The level of detail is the number of device pixels per full resolution pixel.
+        """
+        if level_of_detail <= 0.:
+            return len(self.level_sizes) - 1
+
+        level = math.floor(math.log2(1. / level_of_detail) + 1e-6)
+        return max(0, min(level, len(self.level_sizes) - 1))
+
+    def paint(self, painter, option, widget=None):
+        level = self.select_level(option.levelOfDetailFromTransform(painter.worldTransform()))
+        full_width, full_height = self.level_sizes[0]
+        level_width, level_height = self.level_sizes[level]
+        scale_x = full_width / level_width
+        scale_y = full_height / level_height
+
+        # the exposed part of the map in the pixels of the selected level
+        exposed_rect = option.exposedRect.intersected(self.boundingRect())
+        first_column = max(0, int(exposed_rect.left() / scale_x) // self.tile_size)
+        last_column = min(math.ceil(level_width / self.tile_size) - 1, int(exposed_rect.right() / scale_x) // self.tile_size)
+        first_row = max(0, int(exposed_rect.top() / scale_y) // self.tile_size)
+        last_row = min(math.ceil(level_height / self.tile_size) - 1, int(exposed_rect.bottom() / scale_y) // self.tile_size)
+
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                tile = self._get_tile(level, row, column)
+                target_rect = QtCore.QRectF(column * self.tile_size * scale_x, row * self.tile_size * scale_y, tile.width() * scale_x,
+                                            tile.height() * scale_y)
+                painter.drawPixmap(target_rect, tile, QtCore.QRectF(tile.rect()))
+
+    def _get_tile(self, level, row, column):
+        key = (level, row, column)
+        try:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+        except KeyError:
+            tile = QtGui.QPixmap(_get_tile_path(self.tile_folder, level, row, column))
+            self.tiles[key] = tile
+            if len(self.tiles) > MAXIMUM_NUMBER_OF_CACHED_TILES:
+                self.tiles.popitem(last=False)
+            return tile
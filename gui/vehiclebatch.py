@@ -0,0 +1,215 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import numpy as np
+from PyQt5 import QtWidgets, QtGui, QtCore
+from pyqtgraph.functions import arrayToQPath
+
+from .vehiclegraphics import get_label_font, get_static_text, is_upside_down
+
+"""
+Draws all vehicles of a frame with a single graphics item, as an alternative to one VehicleGraphicsObject per vehicle. In scenes with hundreds of vehicles
+(pNeuma and NGSIM Lankershim), moving hundreds of graphics items every frame means hundreds of setPos and setRotation calls and updates of the index of the
+scene. The VehicleBatchItem instead computes the corners of all vehicles at once from NumPy arrays and combines them in one QPainterPath per color, which is
+drawn with a single call. Clicking a vehicle is detected by transforming the mouse position to the frame of every vehicle. The vehicles look the same as with
+separate graphics objects, the ids are only drawn when they are large enough to read.
+"""
+
+ORIGIN_RADIUS = 0.25
+
+# the minimum height of an id in device pixels for the ids to be drawn
+MINIMUM_LABEL_HEIGHT = 4.
+
+
+class VehicleBatchItem(QtWidgets.QGraphicsItem):
+    def __init__(self, main_gui, parent=None):
+        super().__init__(parent)
+        self.main_gui = main_gui
+        self.vehicles = {}
+        self.highlighted_vehicle_ids = set()
+
+        self.frame_vehicle_ids = []
+        self.frame_vehicles = []
+        self.positions = np.zeros((0, 2))
+        self.headings = np.zeros(0)
+        self.lengths = np.zeros(0)
+        self.widths = np.zeros(0)
+        self.corners = np.zeros((0, 4, 2))
+        self.is_visible = np.zeros(0, dtype=bool)
+
+        self.paths = []
+        self.bounding_rect = QtCore.QRectF()
+
+    def add_vehicle(self, vehicle, vehicle_id):
+        self.vehicles[vehicle_id] = vehicle
+
+    def remove_vehicle(self, vehicle_id):
+        self.vehicles.pop(vehicle_id)
+        self.highlighted_vehicle_ids.discard(vehicle_id)
+
+    def set_highlight(self, vehicle_id, enabled):
+        if vehicle_id not in self.vehicles:
+            return
+
+        if enabled:
+            self.highlighted_vehicle_ids.add(vehicle_id)
+        else:
+            self.highlighted_vehicle_ids.discard(vehicle_id)
+        self._create_paths()
+        self.update()
+
+    def update_positions(self):
+        """
+        Reads the current position and heading of all vehicles and recomputes the shapes that are drawn. Returns the number of vehicles that are drawn at a
+        different position or heading than after the previous update, vehicles that are drawn for the first time are counted as moved.
+        """
+        previous_indices = {vehicle_id: index for index, vehicle_id in enumerate(self.frame_vehicle_ids)}
+        previous_poses = np.column_stack([self.positions, self.headings])
+        previous_is_visible = self.is_visible
+
+        self.frame_vehicle_ids = list(self.vehicles.keys())
+        self.frame_vehicles = list(self.vehicles.values())
+        number_of_vehicles = len(self.frame_vehicles)
+
+        self.positions = np.array([vehicle.current_position for vehicle in self.frame_vehicles], dtype=float).reshape((number_of_vehicles, 2))
+        self.headings = np.array([vehicle.current_heading for vehicle in self.frame_vehicles], dtype=float)
+        self.lengths = np.array([vehicle.length for vehicle in self.frame_vehicles], dtype=float)
+        self.widths = np.array([vehicle.width for vehicle in self.frame_vehicles], dtype=float)
+
+        # vehicles without a position yet are not drawn, just like separate graphics objects are not moved until they have a position
+        self.is_visible = self.positions.any(axis=1)
+        number_of_moved_vehicles = self._count_moved_vehicles(previous_indices, previous_poses, previous_is_visible)
+
+        # the corners in the frame of the vehicle, the origin is in the middle of the front bumper
+        local_x = np.stack([-self.lengths, np.zeros(number_of_vehicles), np.zeros(number_of_vehicles), -self.lengths], axis=1)
+        local_y = np.stack([-self.widths / 2, -self.widths / 2, self.widths / 2, self.widths / 2], axis=1)
+
+        # this is the rotation of setRotation(-degrees(heading)) in the y-down coordinates of the scene
+        cos_heading = np.cos(self.headings)[:, np.newaxis]
+        sin_heading = np.sin(self.headings)[:, np.newaxis]
+        self.corners = np.stack([local_x * cos_heading + local_y * sin_heading + self.positions[:, 0:1],
+                                 -local_x * sin_heading + local_y * cos_heading + self.positions[:, 1:2]], axis=2)
+
+        self.prepareGeometryChange()
+        if self.is_visible.any():
+            visible_corners = self.corners[self.is_visible]
+            top_left = visible_corners.min(axis=(0, 1)) - 1.
+            bottom_right = visible_corners.max(axis=(0, 1)) + 1.
+            self.bounding_rect = QtCore.QRectF(QtCore.QPointF(*top_left), QtCore.QPointF(*bottom_right))
+        else:
+            self.bounding_rect = QtCore.QRectF()
+
+        self._create_paths()
+        self.update()
+        return number_of_moved_vehicles
+
+    def _count_moved_vehicles(self, previous_indices, previous_poses, previous_is_visible):
+        # the vehicles are matched by id, because vehicles are added and removed between updates
+        previous_index = np.array([previous_indices.get(vehicle_id, -1) for vehicle_id in self.frame_vehicle_ids], dtype=int).reshape(-1)
+        was_drawn = previous_index >= 0
+        was_drawn[was_drawn] = previous_is_visible[previous_index[was_drawn]]
+
+        poses = np.column_stack([self.positions, self.headings])
+        is_unchanged = np.zeros(len(self.frame_vehicle_ids), dtype=bool)
+        is_unchanged[was_drawn] = (poses[was_drawn] == previous_poses[previous_index[was_drawn]]).all(axis=1)
+        return int((self.is_visible & ~is_unchanged).sum())
+
+    def _create_paths(self):
+        groups = {}
+        for index, (vehicle_id, vehicle) in enumerate(zip(self.frame_vehicle_ids, self.frame_vehicles)):
+            if self.is_visible[index]:
+                key = None if vehicle_id in self.highlighted_vehicle_ids else vehicle.vehicle_type
+                groups.setdefault(key, []).append(index)
+
+        self.paths = []
+        for vehicle_type, indices in groups.items():
+            color = QtGui.QColor(QtCore.Qt.blue) if vehicle_type is None else vehicle_type.gui_color
+
+            # every vehicle is a closed polygon of five points, the last point is not connected to the first point of the next vehicle
+            polygons = self.corners[indices][:, [0, 1, 2, 3, 0], :]
+            connect = np.ones(polygons.shape[0:2], dtype=np.int32)
+            connect[:, -1] = 0
+            path = arrayToQPath(polygons[:, :, 0].ravel(), polygons[:, :, 1].ravel(), connect=connect.ravel())
+
+            # the highlighted vehicle is drawn last, such that it is on top
+            if vehicle_type is None:
+                self.paths.append((color, path))
+            else:
+                self.paths.insert(0, (color, path))
+
+    def boundingRect(self):
+        return self.bounding_rect
+
+    def paint(self, painter, option, widget=None):
+        for color, path in self.paths:
+            painter.setPen(QtGui.QPen(color))
+            painter.setBrush(color)
+            painter.drawPath(path)
+
+        visible_indices = np.flatnonzero(self.is_visible)
+
+        painter.setPen(QtGui.QPen(QtCore.Qt.NoPen))
+        painter.setBrush(QtCore.Qt.red)
+        for x, y in self.positions[visible_indices]:
+            painter.drawEllipse(QtCore.QPointF(x, y), ORIGIN_RADIUS, ORIGIN_RADIUS)
+
+        level_of_detail = option.levelOfDetailFromTransform(painter.worldTransform())
+        if get_static_text('0').size().height() * level_of_detail >= MINIMUM_LABEL_HEIGHT:
+            self._draw_labels(painter, visible_indices)
+
+    def _draw_labels(self, painter, indices):
+        painter.setFont(get_label_font())
+        painter.setPen(QtCore.Qt.white)
+        view_rotation_angle = self.main_gui.view.current_rotation
+
+        for index in indices:
+            static_text = get_static_text(str(self.frame_vehicle_ids[index]))
+            size = static_text.size()
+            angle = -np.degrees(self.headings[index])
+
+            painter.save()
+            painter.translate(*self.corners[index].mean(axis=0))
+            painter.rotate(angle)
+            if is_upside_down(view_rotation_angle, angle):
+                painter.rotate(180)
+            painter.drawStaticText(QtCore.QPointF(-size.width() / 2, -size.height() / 2), static_text)
+            painter.restore()
+
+    def vehicle_at(self, position):
+        """
+        Returns the vehicle at a position in the scene, or None if there is no vehicle. The position is transformed to the frame of every vehicle.
+        """
+        relative_x = position.x() - self.positions[:, 0]
+        relative_y = position.y() - self.positions[:, 1]
+        cos_heading = np.cos(self.headings)
+        sin_heading = np.sin(self.headings)
+        local_x = relative_x * cos_heading - relative_y * sin_heading
+        local_y = relative_x * sin_heading + relative_y * cos_heading
+
+        is_hit = self.is_visible & (local_x >= -self.lengths) & (local_x <= 0.) & (np.abs(local_y) <= self.widths / 2)
+        hits = np.flatnonzero(is_hit)
+        return self.frame_vehicles[hits[-1]] if hits.size else None
+
+    def mousePressEvent(self, event):
+        vehicle = self.vehicle_at(event.pos())
+
+        if vehicle is None:
+            # let the view drag the scene
+            event.ignore()
+        else:
+            self.main_gui.select_vehicle(vehicle)
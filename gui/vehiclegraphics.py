@@ -18,65 +18,140 @@ along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
 from PyQt5 import QtWidgets, QtGui, QtCore
 
+"""
+Vehicles enter and leave the scene constantly, especially in pNeuma. To avoid creating and destroying graphics items for every appearance of a vehicle, the
+WorldView keeps a pool of VehicleGraphicsObjects. A graphics object is assigned to a new vehicle when it is taken from the pool, which only changes the size,
+color and label of its items. The labels are drawn from QStaticText objects that are shared by all graphics objects, so the text layout of an id is only
+computed once.
+"""
+
+
+_label_font = None
+_static_texts = {}
+
+
+def get_label_font():
+    global _label_font
+
+    # created on first use, because a QFont can only be created after the QApplication
+    if _label_font is None:
+        _label_font = QtGui.QFont()
+        _label_font.setPointSizeF(1.5)
+    return _label_font
+
+
+def get_static_text(text):
+    try:
+        return _static_texts[text]
+    except KeyError:
+        static_text = QtGui.QStaticText(text)
+        static_text.setPerformanceHint(QtGui.QStaticText.AggressiveCaching)
+        static_text.prepare(QtGui.QTransform(), get_label_font())
+        _static_texts[text] = static_text
+        return static_text
+
+
+def is_upside_down(view_rotation_angle, angle):
+    total_visual_rotation = view_rotation_angle + angle
+    while abs(total_visual_rotation) > 180:
+        if total_visual_rotation > 0:
+            total_visual_rotation -= 360
+        else:
+            total_visual_rotation += 360
+
+    # the angle can be a NumPy float, Qt only accepts python booleans
+    return bool(total_visual_rotation > 90.0 or total_visual_rotation < -90.)
+
+
+class VehicleLabelItem(QtWidgets.QGraphicsItem):
+    """
+    Draws the id of a vehicle centered on its position, upright or upside down such that it is always readable.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.static_text = None
+        self.text_rect = QtCore.QRectF()
+        self.upside_down = False
+
+    def set_text(self, text):
+        self.prepareGeometryChange()
+        self.static_text = get_static_text(text)
+        size = self.static_text.size()
+        self.text_rect = QtCore.QRectF(-size.width() / 2, -size.height() / 2, size.width(), size.height())
+
+    def set_upside_down(self, upside_down):
+        if upside_down != self.upside_down:
+            self.upside_down = upside_down
+            self.update()
 
-class VehicleGraphicsObject(QtWidgets.QGraphicsItemGroup):
+    def boundingRect(self):
+        return self.text_rect
+
+    def paint(self, painter, option, widget=None):
+        if self.upside_down:
+            painter.rotate(180)
+        painter.setFont(get_label_font())
+        painter.setPen(QtCore.Qt.white)
+        painter.drawStaticText(self.text_rect.topLeft(), self.static_text)
+
+
+class VehicleGraphicsObject(QtWidgets.QGraphicsRectItem):
     def __init__(self, vehicle, main_gui, vehicle_id, parent=None):
         super().__init__(parent)
         self.main_gui = main_gui
+        self.vehicle = None
+        self.vehicle_id = None
+        self.default_color = None
+
+        # the (x, y, heading) that was last applied to the item, see WorldView.update_all_graphics_positions
+        self.applied_pose = None
+
+        radius = 0.25
+        self.origin = QtWidgets.QGraphicsEllipseItem(-radius, -radius, 2 * radius, 2 * radius, self)
+        self.origin.setPen(QtGui.QPen(QtCore.Qt.NoPen))
+        self.origin.setBrush(QtCore.Qt.red)
+
+        self.label = VehicleLabelItem(self)
+
+        self.assign(vehicle, vehicle_id)
+
+    def assign(self, vehicle, vehicle_id):
+        """
+        Shows another vehicle with this graphics object, this is used to reuse graphics objects from the pool of the WorldView.
+        """
         self.vehicle = vehicle
         self.vehicle_id = vehicle_id
 
-        self.bounding_box = QtWidgets.QGraphicsRectItem(-vehicle.length, -vehicle.width / 2, vehicle.length, vehicle.width)
-
+        # like a new graphics object, the item starts at the origin until the vehicle has a position
+        self.setPos(0., 0.)
+        self.applied_pose = None
+        self.setRect(-vehicle.length, -vehicle.width / 2, vehicle.length, vehicle.width)
         self.default_color = vehicle.vehicle_type.gui_color
         self.set_highlight(False)
 
-        radius = 0.25
-        self.origin = QtWidgets.QGraphicsEllipseItem(-radius, -radius, 2 * radius, 2 * radius)
-        self.origin.setPen(QtGui.QPen(QtCore.Qt.NoPen))
-        self.origin.setBrush(QtCore.Qt.red)
+        self.label.set_text(str(vehicle_id))
+        self.label.setPos(-vehicle.length / 2, 0.)
 
-        self.text = QtWidgets.QGraphicsTextItem(str(vehicle_id))
-        font = QtGui.QFont()
-        font.setPointSizeF(1.5)
-        self.text.setDefaultTextColor(QtCore.Qt.white)
-        self.text.setFont(font)
-        self.text.setPos(- (vehicle.length / 2) - (self.text.boundingRect().width() / 2), - (self.text.boundingRect().height() / 2))
-
-        self.upside_down_text = QtWidgets.QGraphicsTextItem(str(vehicle_id))
-        self.upside_down_text.setDefaultTextColor(QtCore.Qt.white)
-        self.upside_down_text.setFont(font)
-        self.upside_down_text.setPos(- (self.vehicle.length / 2) + (self.upside_down_text.boundingRect().width() / 2),
-                                     (self.upside_down_text.boundingRect().height() / 2))
-        self.upside_down_text.setRotation(180)
-
-        self.addToGroup(self.bounding_box)
-        self.addToGroup(self.text)
-        self.addToGroup(self.upside_down_text)
-        self.addToGroup(self.origin)
+    def release(self):
+        """
+        Hides the graphics object when its vehicle leaves the scene, such that it can be returned to the pool.
+        """
+        self.setVisible(False)
+        self.vehicle = None
+        self.vehicle_id = None
 
     def mousePressEvent(self, event):
         self.main_gui.select_vehicle(self.vehicle)
 
     def set_highlight(self, enabled):
         if enabled:
-            self.bounding_box.setPen(QtCore.Qt.blue)
-            self.bounding_box.setBrush(QtCore.Qt.blue)
+            self.setPen(QtCore.Qt.blue)
+            self.setBrush(QtCore.Qt.blue)
         else:
-            self.bounding_box.setPen(self.default_color)
-            self.bounding_box.setBrush(self.default_color)
+            self.setPen(self.default_color)
+            self.setBrush(self.default_color)
 
     def setRotation(self, angle: float):
         super(VehicleGraphicsObject, self).setRotation(angle)
-
-        view_rotation_angle = self.main_gui.view.current_rotation
-
-        total_visual_rotation = view_rotation_angle + angle
-        while abs(total_visual_rotation) > 180:
-            if total_visual_rotation > 0:
-                total_visual_rotation -= 360
-            else:
-                total_visual_rotation += 360
-
-        self.upside_down_text.setVisible(total_visual_rotation > 90.0 or total_visual_rotation < -90.)
-        self.text.setVisible(-90. < total_visual_rotation < 90.0)
+        self.label.set_upside_down(is_upside_down(self.main_gui.view.current_rotation, angle))
@@ -17,30 +17,97 @@ You should have received a copy of the GNU General Public License
 along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
 import os
+import time
 
 import numpy as np
 from PyQt5 import QtWidgets, QtGui, QtCore
 
-from dataobjects.enums import DataSource
-from .overlay import Overlay
+from dataobjects.enums import DataSource, ViewportType
+from .overlay import Overlay, OverlayItem
+from .tiledmap import TiledMapItem
+from .vehiclebatch import VehicleBatchItem
 from .vehiclegraphics import VehicleGraphicsObject
 
 METERS_PER_US_SURVEY_FOOT = 0.3048006096
 
 
+def enable_software_opengl():
+    """
+    Makes Qt use a software OpenGL implementation (e.g. Mesa llvmpipe on Linux), such that the OpenGL viewport also works without a GPU. This has to be
+    called before the QApplication is created.
+    """
+    os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+    QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_UseSoftwareOpenGL)
+
+
+class MapScene(QtWidgets.QGraphicsScene):
+    """
+    A scene that draws the map as its background instead of as an item. Views of the scene cache their background (QGraphicsView.CacheBackground), so the
+    map is not painted again when only the vehicles move. The map item stays in the scene, hidden, such that its geometry can still be used.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.background_item = None
+
+    def set_background_item(self, item):
+        item.setVisible(False)
+        self.background_item = item
+        self.invalidate(QtCore.QRectF(), QtWidgets.QGraphicsScene.BackgroundLayer)
+
+    def drawBackground(self, painter, rect):
+        super().drawBackground(painter, rect)
+        if self.background_item is None:
+            return
+
+        item_transform = self.background_item.sceneTransform()
+        option = QtWidgets.QStyleOptionGraphicsItem()
+        option.exposedRect = item_transform.inverted()[0].mapRect(rect).intersected(self.background_item.boundingRect())
+
+        painter.save()
+        painter.setTransform(item_transform, True)
+        self.background_item.paint(painter, option, None)
+        painter.restore()
+
+
 class WorldView(QtWidgets.QGraphicsView):
-    def __init__(self, main_gui, dataset_id, dataset, parent=None):
+    # in these data sources hundreds of vehicles are visible at once, so all vehicles are drawn by a single VehicleBatchItem by default
+    BATCHED_VEHICLE_SOURCES = [DataSource.NGSIM, DataSource.PNEUMA]
+
+    # the viewport of new views, use ViewportType.OPENGL to render with OpenGL (see enable_software_opengl for machines without a GPU)
+    viewport_type = ViewportType.RASTER
+
+    # emitted after the view is painted, with the time it took in seconds
+    painted = QtCore.pyqtSignal(float)
+
+    def __init__(self, main_gui, dataset_id, dataset, parent=None, batch_vehicles=None, viewport_type=None):
+        """
+        :param batch_vehicles: if True, all vehicles are drawn by a single VehicleBatchItem instead of a graphics object per vehicle. By default this is done
+        for the data sources in BATCHED_VEHICLE_SOURCES.
+        :param viewport_type: the ViewportType of the view, by default WorldView.viewport_type
+        """
         super().__init__(parent)
 
         self.main_gui = main_gui
-        self.scene = QtWidgets.QGraphicsScene()
+        self.scene = MapScene()
         self.setRenderHint(QtGui.QPainter.HighQualityAntialiasing)
         self.setScene(self.scene)
-        self.setBackgroundBrush(QtGui.QBrush(QtGui.QColor(186, 186, 186)))
+
+        # the background brush is set on the scene, such that the scene draws the map on top of it
+        self.scene.setBackgroundBrush(QtGui.QBrush(QtGui.QColor(186, 186, 186)))
+        self.setCacheMode(QtWidgets.QGraphicsView.CacheBackground)
+
+        self.viewport_type = WorldView.viewport_type if viewport_type is None else viewport_type
+        if self.viewport_type is ViewportType.OPENGL:
+            self._set_opengl_viewport()
 
         self.map_item = None
+        self.map_image_size = QtCore.QSize()
+        self.map_image_scale = 1.
         self.overlay_item = None
+        self.overlay = None
         self._load_background(dataset_id, dataset)
+        self.scene.set_background_item(self.map_item)
 
         self.dial = QtWidgets.QDial(parent=self)
         self.dial.setFixedHeight(50)
@@ -71,6 +138,40 @@ class WorldView(QtWidgets.QGraphicsView):
 
         self.graphics_objects = {}
 
+        # graphics objects of vehicles that left the scene, they are hidden and reused for new vehicles
+        self.graphics_object_pool = []
+
+        # the number of graphics items that were added, removed and moved in the last time step
+        self.frame_update_counts = {'added': 0, 'removed': 0, 'moved': 0}
+        self._number_of_added_vehicles = 0
+        self._number_of_removed_vehicles = 0
+
+        if batch_vehicles is None:
+            batch_vehicles = dataset_id.data_source in self.BATCHED_VEHICLE_SOURCES
+        self.vehicle_batch = None
+        if batch_vehicles:
+            self.vehicle_batch = VehicleBatchItem(self.main_gui)
+            self.scene.addItem(self.vehicle_batch)
+
+    def _set_opengl_viewport(self):
+        surface_format = QtGui.QSurfaceFormat()
+        surface_format.setSamples(4)
+        opengl_widget = QtWidgets.QOpenGLWidget()
+        opengl_widget.setFormat(surface_format)
+        self.setViewport(opengl_widget)
+
+        # an OpenGL viewport is redrawn completely anyway, finding the parts that need an update is wasted time
+        self.setViewportUpdateMode(QtWidgets.QGraphicsView.FullViewportUpdate)
+
+    @staticmethod
+    def get_tiled_map_path(dataset_id):
+        """
+        Returns the path of the map image that is drawn from a pyramid of tiles, or None if the map of the data source is loaded as a single pixmap.
+        """
+        if dataset_id.data_source in [DataSource.NGSIM, DataSource.PNEUMA]:
+            return os.path.join('data', dataset_id.map_sub_folder, dataset_id.map_image_name + '.tif')
+        return None
+
     def _load_background(self, dataset_id, dataset):
         if dataset_id.data_source in [DataSource.HIGHD, DataSource.EXID]:
             if dataset_id.data_source is DataSource.HIGHD:
@@ -80,12 +181,16 @@ class WorldView(QtWidgets.QGraphicsView):
                 v = dataset.dataset_version
                 if int(v[0]) < 2 or (int(v[0]) == 2 and int(v[1]) < 1):
                     meters_per_pixel *= 6  # scale parameter 6 for earlier versions comes from json file with visualiser parameters
+                else:
+                    # ExiD maps are big after version 2.1, images of the map are saved at 25%
+                    self.map_image_scale = 0.25
 
             path_to_file = os.path.join('data', dataset_id.map_sub_folder, dataset_id.map_image_name + '.png')
 
             pixmap = QtGui.QPixmap(path_to_file)
             actual_height = pixmap.height() * meters_per_pixel
             self.map_item = QtWidgets.QGraphicsPixmapItem(pixmap)
+            self.map_image_size = pixmap.size()
             self.map_item.setTransformationMode(QtCore.Qt.SmoothTransformation)
             scale_factor = self.map_item.sceneBoundingRect().height() / actual_height
             self.map_item.setScale(meters_per_pixel)
@@ -94,8 +199,17 @@ class WorldView(QtWidgets.QGraphicsView):
             self.scene.addItem(self.map_item)
         elif dataset_id.data_source in [DataSource.NGSIM, DataSource.PNEUMA]:
             path_to_file = os.path.join('data', dataset_id.map_sub_folder, dataset_id.map_image_name)
-            pixmap = QtGui.QPixmap(path_to_file + '.tif')
-            self.map_item = QtWidgets.QGraphicsPixmapItem(pixmap)
+
+            # NGSIM and PNeuma Maps are quite big, they are drawn from a pyramid of tiles at the resolution that is needed (see tiledmap.py)
+            self.map_item = TiledMapItem.load(self.get_tiled_map_path(dataset_id))
+            if self.map_item is None:
+                self.map_item = QtWidgets.QGraphicsPixmapItem(QtGui.QPixmap(path_to_file + '.tif'))
+                self.map_image_size = self.map_item.pixmap().size()
+            else:
+                self.map_image_size = self.map_item.image_size()
+
+            # images of the map are saved at 25%
+            self.map_image_scale = 0.25
 
             with open(path_to_file + '.tfw', 'r') as map_info_file:
                 horizontal_resolution = float(map_info_file.readline())
@@ -124,36 +238,109 @@ class WorldView(QtWidgets.QGraphicsView):
             raise ValueError('No alternative is implemented for this data source. Is it a new data source?')
 
     def add_vehicle(self, vehicle_object, vehicle_id):
-        vehicle_graphics = VehicleGraphicsObject(vehicle_object, self.main_gui, vehicle_id)
-
-        self.scene.addItem(vehicle_graphics)
+        """
+        Adds a vehicle to the scene. It is positioned together with all other vehicles when update_all_graphics_positions is called at the end of the time step.
+        """
+        self._number_of_added_vehicles += 1
+
+        if self.vehicle_batch is not None:
+            self.vehicle_batch.add_vehicle(vehicle_object, vehicle_id)
+            return
+
+        if self.graphics_object_pool:
+            vehicle_graphics = self.graphics_object_pool.pop()
+            vehicle_graphics.assign(vehicle_object, vehicle_id)
+            vehicle_graphics.setVisible(True)
+        else:
+            vehicle_graphics = VehicleGraphicsObject(vehicle_object, self.main_gui, vehicle_id)
+            self.scene.addItem(vehicle_graphics)
 
         self.graphics_objects[vehicle_id] = vehicle_graphics
-        self.update_all_graphics_positions()
 
     def remove_vehicle(self, vehicle_id):
+        self._number_of_removed_vehicles += 1
+
+        if self.vehicle_batch is not None:
+            self.vehicle_batch.remove_vehicle(vehicle_id)
+            return
+
         graphics_item = self.graphics_objects.pop(vehicle_id)
-        self.scene.removeItem(graphics_item)
-        graphics_item.parent = None
-        self.update_all_graphics_positions()
+        graphics_item.release()
+        self.graphics_object_pool.append(graphics_item)
 
     def select_vehicle(self, vehicle_object):
+        if self.vehicle_batch is not None:
+            self.vehicle_batch.set_highlight(str(vehicle_object.id), True)
+            return
+
         try:
             self.graphics_objects[str(vehicle_object.id)].set_highlight(True)
         except KeyError:  # a car is selected that is not present in the current frame
             pass
 
     def deselect_vehicle(self, vehicle_object):
+        if self.vehicle_batch is not None:
+            self.vehicle_batch.set_highlight(str(vehicle_object.id), False)
+            return
+
         try:
             self.graphics_objects[str(vehicle_object.id)].set_highlight(False)
         except KeyError:  # a car is deselected that is not present in the current frame
             pass
 
     def update_all_graphics_positions(self):
-        for _, graphics_object in self.graphics_objects.items():
-            if any(graphics_object.vehicle.current_position):
-                graphics_object.setPos(graphics_object.vehicle.current_position[0], graphics_object.vehicle.current_position[1])
-                graphics_object.setRotation(-np.degrees(graphics_object.vehicle.current_heading))
+        """
+        Applies the changes of a time step to the scene: all vehicles that were added are positioned and vehicles that moved are updated. Graphics objects of
+        vehicles that did not move (e.g. in a traffic jam or when the same frame is shown again) are left untouched.
+        """
+        if self.vehicle_batch is not None:
+            # the batch recomputes all vehicles at once, but only counts the vehicles of which the pose changed
+            number_of_moved_vehicles = self.vehicle_batch.update_positions()
+        else:
+            number_of_moved_vehicles = 0
+            for graphics_object in self.graphics_objects.values():
+                vehicle = graphics_object.vehicle
+                if any(vehicle.current_position):
+                    pose = (vehicle.current_position[0], vehicle.current_position[1], vehicle.current_heading)
+                    if pose != graphics_object.applied_pose:
+                        graphics_object.setPos(pose[0], pose[1])
+                        graphics_object.setRotation(-np.degrees(pose[2]))
+                        graphics_object.applied_pose = pose
+                        number_of_moved_vehicles += 1
+
+        self.frame_update_counts = {'added': self._number_of_added_vehicles, 'removed': self._number_of_removed_vehicles, 'moved': number_of_moved_vehicles}
+        self._number_of_added_vehicles = 0
+        self._number_of_removed_vehicles = 0
+
+    def get_map_image_size(self):
+        """
+        Returns the size in pixels of an image of the full map, as used for saving and recording the scene.
+        """
+        return self.map_image_scale * self.map_image_size
+
+    def render_scene(self, image, scene_rect=None):
+        """
+        Renders a rectangle of the scene (by default the full map) into a QImage. The rectangle is scaled to fit the image while keeping its aspect ratio, parts
+        of the image that are not covered by the rectangle or the map get the background color.
+        """
+        if scene_rect is None:
+            scene_rect = self.map_item.sceneBoundingRect()
+
+        image.fill(self.scene.backgroundBrush().color())
+        painter = QtGui.QPainter(image)
+        self.scene.render(painter, QtCore.QRectF(image.rect()), scene_rect, QtCore.Qt.KeepAspectRatio)
+        painter.end()
+
+    def render_view(self, image):
+        """
+        Renders the part of the scene that is visible in the view, including zoom and rotation, into a QImage. The view is scaled to fit the image while
+        keeping its aspect ratio.
+        """
+        image.fill(self.scene.backgroundBrush().color())
+        painter = QtGui.QPainter(image)
+        painter.setRenderHints(self.renderHints())
+        self.render(painter, QtCore.QRectF(image.rect()), self.viewport().rect(), QtCore.Qt.KeepAspectRatio)
+        painter.end()
 
     def update_zoom(self):
         # Compute scale factors (in x- and y-direction)
@@ -170,23 +357,47 @@ class WorldView(QtWidgets.QGraphicsView):
         # Set view
         self.fitInView(view_zoom_rect, QtCore.Qt.KeepAspectRatio)
 
-    def add_overlay(self, data, width, height):
-        overlay_pixmap = Overlay(data, width, height)
+    def add_overlay(self, data, width, height, value_range=None):
+        self.overlay = Overlay(data, width, height, value_range=value_range)
 
-        self.overlay_item = QtWidgets.QGraphicsPixmapItem(overlay_pixmap)
+        self.overlay_item = OverlayItem(self.overlay)
         self.overlay_item.setScale(self.map_item.sceneBoundingRect().width() / width)
         self.overlay_item.setOpacity(0.5)
         self.scene.addItem(self.overlay_item)
 
+    def update_overlay(self, data, changed_windows=None):
+        """
+        Updates the overlay with new data. If changed_windows is a list of (row slice, column slice), only these windows of the overlay are converted and drawn
+        again, otherwise the full overlay is.
+        """
+        if changed_windows is None:
+            self.overlay.set_data(data)
+            self.overlay_item.update()
+            return
+
+        for rows, columns in changed_windows:
+            self.overlay.set_window(data, rows, columns)
+            self.overlay_item.update(QtCore.QRectF(float(columns.start), float(rows.start), float(columns.stop - columns.start), float(rows.stop - rows.start)))
+
     def remove_overlay(self):
         self.scene.removeItem(self.overlay_item)
         self.overlay_item = None
+        self.overlay = None
 
     def _update_rotation(self):
         new_rotation = self.dial.value()
         self.rotate(new_rotation - self.current_rotation)
         self.current_rotation = new_rotation
 
+        # the labels of the vehicles are flipped based on the rotation of the view, the batch item does this when it is painted
+        for graphics_object in self.graphics_objects.values():
+            graphics_object.setRotation(graphics_object.rotation())
+
+    def paintEvent(self, e):
+        start_time = time.perf_counter()
+        super().paintEvent(e)
+        self.painted.emit(time.perf_counter() - start_time)
+
     def resizeEvent(self, e):
         super().resizeEvent(e)
         self.update_zoom()
@@ -0,0 +1,120 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import sys
+
+from dataobjects.dataset import Dataset
+from dataobjects.enums import HighDDatasetID, NGSimDatasetID, PNeumaDatasetID, ExiDDatasetID, CacheFormat
+from processing.batchconversion import convert_datasets
+
+"""
+Converts datasets to the cache that is used to load them in the visualisation, without a GUI. This can be used to prepare data in batch, for example on a
+server. PyQt is not needed for this. Multiple datasets are converted in parallel, datasets with an up to date cache are skipped. See
+processing/batchconversion.py for more details.
+
+Examples (run from the main travia folder):
+    python preprocess.py -s highd -d DATASET_01
+    python preprocess.py -s pneuma --all
+    python preprocess.py --all -c columnar --report conversion_report.csv
+"""
+
+DATASET_IDS = {'highd': HighDDatasetID,
+               'ngsim': NGSimDatasetID,
+               'pneuma': PNeumaDatasetID,
+               'exid': ExiDDatasetID}
+
+
+def get_dataset_ids_from_arguments():
+    parser = argparse.ArgumentParser(description='Convert datasets to the travia cache format without starting the GUI')
+    parser.add_argument(
+        "-s",
+        "--source",
+        type=str,
+        choices=list(DATASET_IDS.keys()),
+        help="The data source, one of highd, ngsim, pneuma, exid. If omitted with --all, all sources are converted",
+        required=False,
+    )
+    parser.add_argument(
+        "-d",
+        "--dataset",
+        type=str,
+        help="The dataset id",
+        required=False,
+    )
+    parser.add_argument(
+        "-a",
+        "--all",
+        action="store_true",
+        help="Convert all datasets (of the selected source) for which the data is available",
+    )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        type=str,
+        choices=["pickle", "columnar"],
+        help="The format used to cache converted data, one of pickle, columnar",
+        required=False,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="The number of datasets to convert in parallel, by default this is based on the number of cpu cores and the available memory",
+        required=False,
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="Also convert datasets with an up to date cache",
+    )
+    parser.add_argument(
+        "-r",
+        "--report",
+        type=str,
+        help="Path to a csv file to write a summary with the wall time and peak memory use of every conversion to",
+        required=False,
+    )
+    arguments = parser.parse_args()
+
+    if arguments.cache == 'columnar':
+        Dataset.cache_format = CacheFormat.COLUMNAR
+    elif arguments.cache == 'pickle':
+        Dataset.cache_format = CacheFormat.PICKLE
+
+    if arguments.all:
+        sources = [arguments.source] if arguments.source else DATASET_IDS.keys()
+        return [dataset_id for source in sources for dataset_id in DATASET_IDS[source]], arguments
+    elif arguments.source and arguments.dataset:
+        try:
+            return [DATASET_IDS[arguments.source][arguments.dataset]], arguments
+        except KeyError:
+            parser.error('%s is not a valid dataset id for %s' % (arguments.dataset, arguments.source))
+    else:
+        parser.error('provide a source and a dataset, or use --all')
+
+
+if __name__ == '__main__':
+    dataset_ids, arguments = get_dataset_ids_from_arguments()
+    report = convert_datasets(dataset_ids, number_of_workers=arguments.jobs, force=arguments.force, report_path=arguments.report)
+
+    # when converting all datasets, missing data is expected and no reason to fail
+    failed_conversions = [row for row in report if row['status'] == 'failed' or (row['status'] == 'missing data' and not arguments.all)]
+    if failed_conversions:
+        sys.exit(1)
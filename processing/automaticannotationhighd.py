@@ -16,68 +16,156 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
-from dataobjects import HighDDataset, Annotation, AnnotationType
+import numpy as np
+
+from dataobjects import HighDDataset, AnnotationType
 from dataobjects.enums import VehicleType
+from processing.detectorengine import EventDetector, DetectorEngine
 
 """
 This file contains functions that automatically find and annotate some specific events in HighD data. It serves both as a tool to detect these events, and as an
 example of how this detection could work. From this it should be easy to extend the automatic detects to other dataset or events.
+
+Every detector is an EventDetector (see processing/detectorengine.py) that declares the columns of the track data it uses. The DetectorEngine visits the track
+of every vehicle once and hands it to all detectors, so running multiple detectors together costs about as much as running one. Events are found as runs of
+consecutive frames in which a condition holds. The detect_all_... functions run a single detector and add its annotations to the dataset.
 """
 
 
+def _lane_change_rows(track):
+    """
+    Returns a boolean array that flags the rows where the lane differs from the row before.
+    """
+    is_lane_change = np.zeros(len(track), dtype=bool)
+    is_lane_change[1:] = track['laneId'][1:] != track['laneId'][:-1]
+    return is_lane_change
+
+
+class CarBehindTruckDetector(EventDetector):
+    columns = ['precedingId']
+    annotation_type = AnnotationType.CAR_BEHIND_TRUCK
+
+    def __init__(self):
+        self.car_ids = set()
+        self.is_truck = np.zeros(1, dtype=bool)
+
+    def prepare(self, dataset):
+        vehicle_types = dataset.track_meta_data['class'].map(VehicleType.from_string)
+        self.car_ids = set(vehicle_types.index[vehicle_types.map(lambda vehicle_type: vehicle_type is VehicleType.CAR)].tolist())
+
+        # a lookup table with an extra False at the end, for preceding ids that are not in the meta data
+        self.is_truck = np.zeros(max(vehicle_types.index, default=0) + 2, dtype=bool)
+        self.is_truck[vehicle_types.index[vehicle_types.map(lambda vehicle_type: vehicle_type is VehicleType.TRUCK)].to_numpy()] = True
+
+    def wants_track(self, vehicle_id):
+        return vehicle_id in self.car_ids
+
+    def detect(self, track):
+        preceding_ids = np.clip(track['precedingId'], 0, len(self.is_truck) - 1)
+        run_starts, run_ends = track.runs(self.is_truck[preceding_ids])
+        return [(track.frames[first_row], track.frames[last_row], 'AUTOMATIC: Car behind a truck') for first_row, last_row in zip(run_starts, run_ends)]
+
+
+class LaneChangeDetector(EventDetector):
+    columns = ['laneId', 'yVelocity']
+    annotation_type = AnnotationType.LANE_CHANGE
+
+    def __init__(self, c=2.0):
+        """
+        Annotates the part of the trajectory around a lane change where the y-velocity of a vehicle is higher then its average y-velocity/c. Where c is a
+        parameter to tune the length of the annotated bit.
+        """
+        self.c = c
+
+    def detect(self, track):
+        is_lane_change = _lane_change_rows(track)
+        number_of_lane_changes = np.count_nonzero(is_lane_change)
+        if not number_of_lane_changes:
+            return []
+
+        average_y_velocity = np.abs(track['yVelocity']).mean()
+        run_starts, run_ends = track.runs(np.abs(track['yVelocity']) >= average_y_velocity / self.c)
+
+        lane_changes_before_row = np.concatenate([[0], np.cumsum(is_lane_change)])
+        lane_changes_in_run = lane_changes_before_row[run_ends + 1] - lane_changes_before_row[run_starts + 1]
+
+        number_of_detected_annotations = lane_changes_in_run.sum()
+        if number_of_lane_changes != number_of_detected_annotations:
+            print('Something is wrong with car %d, %d lane changes are made but %d are detected' % (
+                track.vehicle_id, number_of_lane_changes, number_of_detected_annotations))
+
+        return [(track.frames[first_row], track.frames[last_row], 'AUTOMATIC: Lane Change')
+                for first_row, last_row in zip(run_starts[lane_changes_in_run > 0], run_ends[lane_changes_in_run > 0])]
+
+
+class DecelerationDetector(EventDetector):
+    columns = ['xAcceleration']
+    annotation_type = AnnotationType.DECELERATION
+
+    def __init__(self, c=2.0):
+        """
+        Annotates all negative accelerations (decelerations) that have a magnitude <= the mean - c * the standard deviation of all accelerations in the dataset.
+        Where c is a parameter to tune the number of selected decelerations. By default, c=2.0 which represents approximately 2.2% of the lowest accelerations.
+        """
+        self.c = c
+        self.threshold = 0.
+
+    def prepare(self, dataset):
+        std = dataset.track_data.loc[:, 'xAcceleration'].std()
+        mean = dataset.track_data.loc[:, 'xAcceleration'].mean()
+        self.threshold = mean - self.c * std
+
+    def detect(self, track):
+        run_starts, run_ends = track.runs(track['xAcceleration'] <= self.threshold)
+        notes = ['AUTOMATIC: High Deceleration'] * (len(run_starts) - 1) + ['AUTOMATIC: High deceleration']
+        return [(track.frames[first_row], track.frames[last_row], note) for first_row, last_row, note in zip(run_starts, run_ends, notes)]
+
+
+class CompleteOvertakeDetector(EventDetector):
+    columns = ['laneId', 'yVelocity']
+    annotation_type = AnnotationType.COMPLETE_OVERTAKE
+
+    def __init__(self):
+        """
+        Annotates vehicles that change to the overtake lane and back. The annotation starts and ends at the nearest frames around the part in the overtake lane
+        where the lateral velocity is low, or at a gap in the track.
+        """
+        self.driving_directions = {}
+
+    def prepare(self, dataset):
+        self.driving_directions = dataset.track_meta_data['drivingDirection'].to_dict()
+
+    def detect(self, track):
+        lanes = track['laneId']
+        if np.count_nonzero(_lane_change_rows(track)) <= 1:
+            return []
+
+        if self.driving_directions[track.vehicle_id] == 1:  # 1 = left, the highest lane number is the overtake lane
+            rows_in_overtake_lane = np.flatnonzero(lanes == lanes.max())
+        else:  # 2 = right, the lowest lane number is the overtake lane
+            rows_in_overtake_lane = np.flatnonzero(lanes == lanes.min())
+
+        is_segment_start = track.segment_starts()
+        is_segment_end = np.append(is_segment_start[1:], True)
+        is_calm = np.abs(track['yVelocity']) <= np.abs(track['yVelocity']).mean() / 2.0
+
+        first_row = rows_in_overtake_lane[0]
+        first_row -= np.argmax((is_calm | is_segment_start)[first_row::-1])
+        last_row = rows_in_overtake_lane[-1]
+        last_row += np.argmax((is_calm | is_segment_end)[last_row:])
+
+        return [(track.frames[first_row], track.frames[last_row], 'AUTOMATIC: Complete overtake')]
+
+
+# All detectors with a short name, these names are used to select detectors when annotating many recordings
+DETECTORS = {'car_behind_truck': CarBehindTruckDetector,
+             'lane_change': LaneChangeDetector,
+             'deceleration': DecelerationDetector,
+             'complete_overtake': CompleteOvertakeDetector}
+
+
 def detect_all_cars_stuck_behind_a_truck(sim_data: HighDDataset):
-    number_of_cars = len(sim_data.track_meta_data)
-    car_types = [None] * (number_of_cars + 1)
-
-    for car_id in range(1, number_of_cars + 1):
-        car_types[car_id] = VehicleType.from_string(sim_data.track_meta_data.at[car_id, 'class'])
-
-    list_of_truck_ids = [i for i, x in enumerate(car_types) if x is VehicleType.TRUCK]
-
-    for car_id in range(1, number_of_cars + 1):
-        if car_types[car_id] is VehicleType.CAR:
-            car_data = sim_data.track_data.loc[sim_data.track_data.id == car_id, :]
-
-            frames_where_truck_is_followed = car_data.loc[car_data.precedingId.isin(list_of_truck_ids), :]
-
-            if not frames_where_truck_is_followed.empty:
-                last_frame = -1
-
-                for index in frames_where_truck_is_followed.index:
-                    current_frame = frames_where_truck_is_followed.at[index, 'frame']
-
-                    if last_frame == -1:
-                        annotation_fist_frame = current_frame
-                    elif current_frame != last_frame + 1:
-                        annotation_last_frame = last_frame
-                        new_annotation = Annotation(sim_data.recording_id)
-                        new_annotation.first_frame = annotation_fist_frame
-                        new_annotation.last_frame = annotation_last_frame
-                        new_annotation.ego_vehicle_id = car_id
-                        new_annotation.annotation_type = AnnotationType.CAR_BEHIND_TRUCK
-                        new_annotation.notes = 'AUTOMATIC: Car behind a truck'
-                        sim_data.annotation_data.append(new_annotation)
-                        annotation_fist_frame = current_frame
-                    last_frame = current_frame
-
-                annotation_last_frame = last_frame
-                new_annotation = Annotation(sim_data.recording_id)
-                new_annotation.first_frame = annotation_fist_frame
-                new_annotation.last_frame = annotation_last_frame
-                new_annotation.ego_vehicle_id = car_id
-                new_annotation.annotation_type = AnnotationType.CAR_BEHIND_TRUCK
-                new_annotation.notes = 'AUTOMATIC: Car behind a truck'
-                sim_data.annotation_data.append(new_annotation)
-
-
-def _lane_changes_in(data_frame):
-    number_of_lane_changes = 0
-    previous_id = data_frame['laneId'].iloc[0]
-    for lane_id in data_frame.loc[:, 'laneId'].to_numpy():
-        if lane_id != previous_id:
-            number_of_lane_changes += 1
-        previous_id = lane_id
-    return number_of_lane_changes
+    DetectorEngine([CarBehindTruckDetector()]).annotate(sim_data)
 
 
 def detect_all_lane_changes(sim_data: HighDDataset, c=2.0):
@@ -85,53 +173,7 @@ def detect_all_lane_changes(sim_data: HighDDataset, c=2.0):
     detects all lane changes in a dataset and annotates the part of the trajectory where the y-velocity of a vehicle is higher then its average y-velocity/c.
     Where c is a parameter to tune the length of the annotated bit. By default, c=2.0
     """
-    number_of_cars = len(sim_data.track_meta_data)
-    for car_id in range(1, number_of_cars + 1):
-        car_data = sim_data.track_data.loc[sim_data.track_data.id == car_id, :]
-
-        number_of_lane_changes = _lane_changes_in(car_data)
-        if number_of_lane_changes:
-            number_of_detected_annotations = 0
-            average_y_velocity = car_data.loc[:, 'yVelocity'].abs().mean()
-
-            lane_changing_data = car_data.loc[car_data.yVelocity.abs() >= average_y_velocity / c, :]
-
-            if not lane_changing_data.empty:
-                last_frame = -1
-
-                for index in lane_changing_data.index:
-                    current_frame = lane_changing_data.at[index, 'frame']
-
-                    if last_frame == -1:
-                        annotation_fist_frame = current_frame
-                    elif current_frame != last_frame + 1:
-                        annotation_last_frame = last_frame
-                        data_within_annotation = car_data.loc[(car_data.frame >= annotation_fist_frame) & (car_data.frame <= annotation_last_frame), :]
-                        if _lane_changes_in(data_within_annotation):
-                            number_of_detected_annotations += _lane_changes_in(data_within_annotation)
-                            new_annotation = Annotation(sim_data.recording_id)
-                            new_annotation.first_frame = annotation_fist_frame
-                            new_annotation.last_frame = annotation_last_frame
-                            new_annotation.ego_vehicle_id = car_id
-                            new_annotation.annotation_type = AnnotationType.LANE_CHANGE
-                            new_annotation.notes = 'AUTOMATIC: Lane Change'
-                            sim_data.annotation_data.append(new_annotation)
-                        annotation_fist_frame = current_frame
-                    last_frame = current_frame
-                annotation_last_frame = last_frame
-                data_within_annotation = car_data.loc[(car_data.frame >= annotation_fist_frame) & (car_data.frame <= annotation_last_frame), :]
-                if _lane_changes_in(data_within_annotation):
-                    number_of_detected_annotations += _lane_changes_in(data_within_annotation)
-                    new_annotation = Annotation(sim_data.recording_id)
-                    new_annotation.first_frame = annotation_fist_frame
-                    new_annotation.last_frame = annotation_last_frame
-                    new_annotation.ego_vehicle_id = car_id
-                    new_annotation.annotation_type = AnnotationType.LANE_CHANGE
-                    new_annotation.notes = 'AUTOMATIC: Lane Change'
-                    sim_data.annotation_data.append(new_annotation)
-            if number_of_lane_changes != number_of_detected_annotations:
-                print('Something is wrong with car %d, %d lane changes are made but %d are detected' % (
-                car_id, number_of_lane_changes, number_of_detected_annotations))
+    DetectorEngine([LaneChangeDetector(c)]).annotate(sim_data)
 
 
 def detect_all_significant_decelerations(sim_data, c=2.0):
@@ -139,93 +181,8 @@ def detect_all_significant_decelerations(sim_data, c=2.0):
     Automatically detects all negative accelerations (decelerations) in a dataset have a magnitude <= the mean - c * the standard deviation. Where c is a
     parameter to tune the number of selected decelerations. By default, c=2.0 which represents approximately 2.2% of the lowest accelerations.
     """
-    std = sim_data.track_data.loc[:, 'xAcceleration'].std()
-    mean = sim_data.track_data.loc[:, 'xAcceleration'].mean()
-
-    number_of_cars = len(sim_data.track_meta_data)
-    for car_id in range(1, number_of_cars + 1):
-        car_data = sim_data.track_data.loc[sim_data.track_data.id == car_id, :]
-
-        frames_where_acc_is_high = car_data.loc[car_data.xAcceleration <= mean - c * std, :]
-
-        if not frames_where_acc_is_high.empty:
-            last_frame = -1
-
-            for index in frames_where_acc_is_high.index:
-                current_frame = frames_where_acc_is_high.at[index, 'frame']
-
-                if last_frame == -1:
-                    annotation_fist_frame = current_frame
-                elif current_frame != last_frame + 1:
-                    annotation_last_frame = last_frame
-                    new_annotation = Annotation(sim_data.recording_id)
-                    new_annotation.first_frame = annotation_fist_frame
-                    new_annotation.last_frame = annotation_last_frame
-                    new_annotation.ego_vehicle_id = car_id
-                    new_annotation.annotation_type = AnnotationType.DECELERATION
-                    new_annotation.notes = 'AUTOMATIC: High Deceleration'
-                    sim_data.annotation_data.append(new_annotation)
-                    annotation_fist_frame = current_frame
-                last_frame = current_frame
-
-            annotation_last_frame = last_frame
-            new_annotation = Annotation(sim_data.recording_id)
-            new_annotation.first_frame = annotation_fist_frame
-            new_annotation.last_frame = annotation_last_frame
-            new_annotation.ego_vehicle_id = car_id
-            new_annotation.annotation_type = AnnotationType.DECELERATION
-            new_annotation.notes = 'AUTOMATIC: High deceleration'
-            sim_data.annotation_data.append(new_annotation)
+    DetectorEngine([DecelerationDetector(c)]).annotate(sim_data)
 
 
 def detect_all_complete_overtakes(sim_data: HighDDataset):
-    number_of_cars = len(sim_data.track_meta_data)
-    for car_id in range(1, number_of_cars + 1):
-        car_data = sim_data.track_data.loc[sim_data.track_data.id == car_id, :]
-        all_frame_numbers = car_data['frame'].to_numpy()
-
-        number_of_lane_changes = _lane_changes_in(car_data)
-        if number_of_lane_changes > 1:
-            average_y_velocity = car_data.loc[:, 'yVelocity'].abs().mean()
-            driving_direction = sim_data.track_meta_data.at[car_id, 'drivingDirection']  # 1 = left, 2 = right
-
-            all_driven_lanes = car_data.loc[:, 'laneId'].unique()
-            if driving_direction == 1:  # the highest lane number is the overtake lane
-                overtake_lane_data = car_data.loc[car_data.laneId == max(all_driven_lanes), :]
-            else:  # the lowest lane number is the overtake lane
-                overtake_lane_data = car_data.loc[car_data.laneId == min(all_driven_lanes), :]
-
-            first_frame_in_overtake_lane = overtake_lane_data['frame'].iat[0]
-            last_frame_in_overtake_lane = overtake_lane_data['frame'].iat[-1]
-
-            annotation_fist_frame = None
-            annotation_last_frame = None
-
-            current_frame = first_frame_in_overtake_lane
-            while annotation_fist_frame is None:
-                if car_data.loc[car_data.frame == current_frame].yVelocity.abs().iat[0] <= average_y_velocity / 2.0:
-                    annotation_fist_frame = current_frame
-                else:
-                    current_frame -= 1
-                    if current_frame not in all_frame_numbers:
-                        annotation_fist_frame = current_frame + 1
-
-            current_frame = last_frame_in_overtake_lane
-            while annotation_last_frame is None:
-                if car_data.loc[car_data.frame == current_frame].yVelocity.abs().iat[0] <= average_y_velocity / 2.0:
-                    annotation_last_frame = current_frame
-                else:
-                    current_frame += 1
-                    if current_frame not in all_frame_numbers:
-                        annotation_last_frame = current_frame - 1
-
-            if annotation_fist_frame is not None and annotation_last_frame is not None:
-                last_frame = -1
-                new_annotation = Annotation(sim_data.recording_id)
-                new_annotation.first_frame = annotation_fist_frame
-                new_annotation.last_frame = annotation_last_frame
-                new_annotation.ego_vehicle_id = car_id
-                new_annotation.annotation_type = AnnotationType.COMPLETE_OVERTAKE
-                new_annotation.notes = 'AUTOMATIC: Complete overtake'
-                sim_data.annotation_data.append(new_annotation)
-
+    DetectorEngine([CompleteOvertakeDetector()]).annotate(sim_data)
@@ -0,0 +1,204 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import csv
+import multiprocessing
+import time
+
+import pandas as pd
+
+from dataobjects import HighDDataset
+from dataobjects.dataset import Dataset
+from dataobjects.enums import DataSource
+from processing.automaticannotationhighd import DETECTORS
+from processing.batchconversion import get_number_of_workers
+from processing.detectorengine import DetectorEngine
+
+"""
+Runs the automatic HighD annotation detectors on many recordings in parallel worker processes, and merges the results in a single csv file. Every worker only
+loads the columns of the track data that the selected detectors use: from the memory mapped columnar cache if it exists, or else from the csv files. All
+selected detectors run in a single pass over the tracks with the DetectorEngine (see processing/detectorengine.py). The annotations in the merged file are sorted and indexed on recording and vehicle, use load_corpus_annotations to read them.
+
+The time needed to load every recording and the time spent in every detector are stored in a separate csv file.
+"""
+
+ANNOTATION_COLUMNS = ['recording_id', 'ego_vehicle_id', 'first_frame', 'last_frame', 'annotation_type', 'detector', 'notes']
+ANNOTATION_INDEX = ['recording_id', 'ego_vehicle_id']
+TIMING_COLUMNS = ['dataset', 'status', 'step', 'wall_time_s', 'number_of_annotations', 'message']
+
+
+def _load_recording(dataset_id, columns, save_annotations):
+    if save_annotations:
+        # the dataset is saved again afterwards, so all columns are needed
+        return HighDDataset.load(dataset_id)
+    elif Dataset.cache_exists(dataset_id):
+        return Dataset._load_from_cache(dataset_id)
+    else:
+        return HighDDataset.read_highd_csv(dataset_id, track_data_columns=columns)
+
+
+def annotate_recording(dataset_id, detector_names, save_annotations=False, cache_format=None):
+    """
+    Runs the detectors on a single recording. This is the function that runs in the worker processes, it returns the rows for the annotation and timing files.
+    The cache format is passed explicitly because the class attributes of Dataset are not copied to new processes.
+
+    :param dataset_id: HighDDatasetID of the recording
+    :param detector_names: list of keys of DETECTORS
+    :param save_annotations: if True, the annotations are also added to the recording and the recording is saved
+    :param cache_format: the preferred cache format to load the recording from
+    """
+    # the settings are restored afterwards, such that annotating in the main process does not change how other datasets are loaded
+    previous_cache_format, previous_memory_map_cache = Dataset.cache_format, Dataset.memory_map_cache
+    if cache_format is not None:
+        Dataset.cache_format = cache_format
+    Dataset.memory_map_cache = True
+
+    try:
+        return _annotate_recording(dataset_id, detector_names, save_annotations)
+    finally:
+        Dataset.cache_format, Dataset.memory_map_cache = previous_cache_format, previous_memory_map_cache
+
+
+def _annotate_recording(dataset_id, detector_names, save_annotations):
+    timing = []
+    annotations = []
+    detectors = [DETECTORS[detector_name]() for detector_name in detector_names]
+    engine = DetectorEngine(detectors)
+
+    start_time = time.perf_counter()
+    try:
+        dataset = _load_recording(dataset_id, engine.get_required_columns(DataSource.HIGHD), save_annotations)
+    except (FileNotFoundError, ValueError) as error:
+        return [], [_timing_row(dataset_id, 'missing data', 'load', start_time, 0, str(error))]
+    timing.append(_timing_row(dataset_id, 'done', 'load', start_time, 0))
+
+    start_time = time.perf_counter()
+    try:
+        new_annotations = engine.annotate(dataset) if save_annotations else engine.run(dataset)
+    except Exception as error:
+        return [], timing + [_timing_row(dataset_id, 'failed', 'detection', start_time, 0, '%s: %s' % (type(error).__name__, error))]
+
+    # the total time of the single pass over all tracks, followed by the time spent in the separate detectors
+    timing.append(_timing_row(dataset_id, 'done', 'detection', start_time, len(new_annotations)))
+    for detector_name, detector in zip(detector_names, detectors):
+        detected_annotations = [annotation for annotation in new_annotations if annotation.annotation_type is detector.annotation_type]
+        timing.append({'dataset': str(dataset_id),
+                       'status': 'done',
+                       'step': detector_name,
+                       'wall_time_s': round(engine.timing[detector.name], 3),
+                       'number_of_annotations': len(detected_annotations),
+                       'message': ''})
+        annotations += [{'recording_id': dataset.recording_id,
+                         'ego_vehicle_id': annotation.ego_vehicle_id,
+                         'first_frame': annotation.first_frame,
+                         'last_frame': annotation.last_frame,
+                         'annotation_type': annotation.annotation_type.value,
+                         'detector': detector_name,
+                         'notes': annotation.notes} for annotation in detected_annotations]
+
+    if save_annotations:
+        start_time = time.perf_counter()
+        dataset.save()
+        timing.append(_timing_row(dataset_id, 'done', 'save', start_time, 0))
+
+    return annotations, timing
+
+
+def _timing_row(dataset_id, status, step, start_time, number_of_annotations, message=''):
+    return {'dataset': str(dataset_id),
+            'status': status,
+            'step': step,
+            'wall_time_s': round(time.perf_counter() - start_time, 3),
+            'number_of_annotations': number_of_annotations,
+            'message': message}
+
+
+def _annotate_recording_job(arguments):
+    return annotate_recording(*arguments)
+
+
+def annotate_recordings(dataset_ids, detector_names, output_path, timing_path=None, number_of_workers=None, save_annotations=False):
+    """
+    Runs the detectors on all recordings and writes the merged annotations to a csv file. Returns the timing rows.
+
+    :param dataset_ids: list of HighDDatasetIDs
+    :param detector_names: list of keys of DETECTORS
+    :param output_path: path to the csv file to write the annotations to
+    :param timing_path: path to the csv file to write the time per recording and detector to
+    :param number_of_workers: the number of recordings that are processed in parallel, by default this is based on the number of cpu cores and the available
+    memory. If 1, all recordings are processed in this process.
+    :param save_annotations: if True, the annotations are also added to the recordings and the recordings are saved
+    """
+    if number_of_workers is None:
+        number_of_workers = get_number_of_workers(dataset_ids)
+
+    jobs = [(dataset_id, detector_names, save_annotations, Dataset.cache_format) for dataset_id in dataset_ids]
+    annotations = []
+    timing = []
+
+    if number_of_workers <= 1:
+        results = map(_annotate_recording_job, jobs)
+        _collect_results(results, annotations, timing)
+    else:
+        print('Annotating %d recordings with %d workers' % (len(dataset_ids), number_of_workers))
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(number_of_workers) as pool:
+            _collect_results(pool.imap_unordered(_annotate_recording_job, jobs), annotations, timing)
+
+    annotations = pd.DataFrame(annotations, columns=ANNOTATION_COLUMNS).sort_values(ANNOTATION_INDEX + ['first_frame', 'detector'], kind='stable')
+    annotations.set_index(ANNOTATION_INDEX).to_csv(output_path)
+
+    if timing_path is not None:
+        with open(timing_path, 'w', newline='') as timing_file:
+            writer = csv.DictWriter(timing_file, fieldnames=TIMING_COLUMNS)
+            writer.writeheader()
+            writer.writerows(timing)
+
+    _print_summary(timing)
+    return timing
+
+
+def _collect_results(results, annotations, timing):
+    for recording_annotations, recording_timing in results:
+        annotations += recording_annotations
+        timing += recording_timing
+
+        dataset = recording_timing[0]['dataset']
+        if recording_timing[0]['status'] == 'done':
+            print('%s: %d annotations in %.1f s' % (dataset, len(recording_annotations), sum(row['wall_time_s'] for row in recording_timing)))
+        else:
+            print('%s: %s %s' % (dataset, recording_timing[0]['status'], recording_timing[0]['message']))
+
+
+def _print_summary(timing):
+    steps = []
+    for row in timing:
+        if row['status'] == 'done' and row['step'] not in steps:
+            steps.append(row['step'])
+
+    for step in steps:
+        rows = [row for row in timing if row['step'] == step and row['status'] == 'done']
+        print('%-20s %8.1f s, %7d annotations' % (step, sum(row['wall_time_s'] for row in rows), sum(row['number_of_annotations'] for row in rows)))
+
+
+def load_corpus_annotations(file_path):
+    """
+    Loads the annotations written by annotate_recordings as a DataFrame indexed on recording id and ego vehicle id. Use for example
+    annotations.loc[(1, 25), :] for all annotations of vehicle 25 in recording 1, or annotations.xs(1) for all annotations in recording 1.
+    """
+    return pd.read_csv(file_path, index_col=ANNOTATION_INDEX).sort_index()
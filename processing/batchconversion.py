@@ -0,0 +1,277 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+from dataobjects import PNeumaDataset, NGSimDataset, HighDDataset, ExiDDataset
+from dataobjects.dataset import Dataset
+from dataobjects.enums import DataSource, NGSimDatasetID
+from processing.progressreporter import ProgressReporter, ConsoleProgressReporter
+
+"""
+Converts many datasets to the load cache in parallel. Every conversion runs in a new worker process, which keeps the memory of the workers from growing and
+allows measuring the peak memory use per dataset. The number of workers is based on the number of cpu cores and the available memory.
+
+After a successful conversion, the size, modification time and hash of the source files are stored in a small json file next to the cache. A dataset is
+only converted again if its source files changed, if it has no cache, or if the conversion pipeline changed (indicated by PIPELINE_VERSION).
+"""
+
+# Increase this number when a change in the conversion code should result in new caches for all datasets
+PIPELINE_VERSION = 1
+
+# Rough estimate of the peak memory needed to convert a dataset: a fixed part plus a multiple of the size of the csv files
+BASE_MEMORY_PER_CONVERSION = 500 * 2 ** 20
+MEMORY_PER_BYTE_OF_SOURCE_DATA = 6
+
+REPORT_COLUMNS = ['dataset', 'data_source', 'status', 'wall_time_s', 'peak_rss_mb', 'message']
+
+# The Peachtree and Lankershim files are split off from a file with all data of the location when they are first read
+COMBINED_NGSIM_FILE_NAMES = {NGSimDatasetID.PEACHTREE_0400_0415: 'NGSIM_Peachtree_Vehicle_Trajectories.csv',
+                             NGSimDatasetID.PEACHTREE_1245_0100: 'NGSIM_Peachtree_Vehicle_Trajectories.csv',
+                             NGSimDatasetID.LANKERSHIM_0828_0845: 'NGSIM__Lankershim_Vehicle_Trajectories.csv',
+                             NGSimDatasetID.LANKERSHIM_0845_0900: 'NGSIM__Lankershim_Vehicle_Trajectories.csv'}
+
+
+def get_source_files(dataset_id):
+    folder = os.path.join('data', dataset_id.data_sub_folder)
+
+    if dataset_id.data_source in [DataSource.HIGHD, DataSource.EXID]:
+        file_names = [dataset_id.track_data_file_name, dataset_id.track_meta_data_file_name, dataset_id.recording_meta_data_file_name]
+    else:
+        file_names = [dataset_id.data_file_name]
+    return [os.path.join(folder, file_name + '.csv') for file_name in file_names]
+
+
+def get_missing_source_files(dataset_id):
+    """
+    Returns the source files of a dataset that do not exist, an empty list means that the dataset can be converted.
+    """
+    missing_files = [file_path for file_path in get_source_files(dataset_id) if not os.path.isfile(file_path)]
+
+    combined_file_name = COMBINED_NGSIM_FILE_NAMES.get(dataset_id)
+    if missing_files and combined_file_name is not None and os.path.isfile(os.path.join('data', dataset_id.data_sub_folder, combined_file_name)):
+        return []
+    return missing_files
+
+
+def _get_manifest_path(dataset_id):
+    return os.path.join('data', dataset_id.data_sub_folder, dataset_id.data_file_name + '_sources.json')
+
+
+def _get_file_hash(file_path):
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(2 ** 20), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def _write_manifest(dataset_id):
+    sources = {}
+    for file_path in get_source_files(dataset_id):
+        if os.path.isfile(file_path):
+            file_stats = os.stat(file_path)
+            sources[file_path] = {'size': file_stats.st_size, 'mtime_ns': file_stats.st_mtime_ns, 'sha256': _get_file_hash(file_path)}
+
+    with open(_get_manifest_path(dataset_id), 'w') as manifest_file:
+        json.dump({'pipeline_version': PIPELINE_VERSION, 'sources': sources}, manifest_file, indent=4)
+
+
+def is_cache_up_to_date(dataset_id):
+    """
+    Checks if the dataset has a cache in the selected format that was created by the current pipeline from the current source files. Files with a changed modification time but
+    the same size are compared on their hash, so copying or touching the data does not result in a new conversion.
+    """
+    if not Dataset.cache_exists(dataset_id, Dataset.cache_format):
+        return False
+
+    try:
+        with open(_get_manifest_path(dataset_id)) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        return False
+
+    if manifest.get('pipeline_version') != PIPELINE_VERSION:
+        return False
+
+    for file_path in get_source_files(dataset_id):
+        stored_stats = manifest['sources'].get(file_path)
+
+        if stored_stats is None or not os.path.isfile(file_path):
+            return False
+
+        file_stats = os.stat(file_path)
+        if file_stats.st_size != stored_stats['size']:
+            return False
+        elif file_stats.st_mtime_ns != stored_stats['mtime_ns'] and _get_file_hash(file_path) != stored_stats['sha256']:
+            return False
+    return True
+
+
+def get_peak_memory_in_mb():
+    """
+    Returns the peak resident set size of this process. This is only available on linux, nan is returned on other systems.
+    """
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return float('nan')
+
+
+def _get_available_memory():
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def get_number_of_workers(dataset_ids):
+    """
+    Returns the number of parallel conversions that fit on this machine, based on the number of cpu cores and the memory needed for the largest dataset.
+    """
+    number_of_workers = os.cpu_count() or 1
+    available_memory = _get_available_memory()
+
+    if available_memory is not None and dataset_ids:
+        source_sizes = [sum(os.path.getsize(file_path) for file_path in get_source_files(dataset_id) if os.path.isfile(file_path)) for dataset_id in dataset_ids]
+        memory_per_conversion = BASE_MEMORY_PER_CONVERSION + MEMORY_PER_BYTE_OF_SOURCE_DATA * max(source_sizes)
+        number_of_workers = min(number_of_workers, available_memory // memory_per_conversion)
+
+    return max(1, min(number_of_workers, len(dataset_ids)))
+
+
+def convert_dataset(dataset_id, progress_reporter=None):
+    """
+    Reads a dataset from its source files and saves it to the cache, an existing cache is replaced.
+    """
+    if dataset_id.data_source == DataSource.HIGHD:
+        dataset = HighDDataset.read_highd_csv(dataset_id)
+    elif dataset_id.data_source == DataSource.NGSIM:
+        dataset = NGSimDataset.read_ngsim_data(dataset_id, progress_reporter)
+    elif dataset_id.data_source == DataSource.PNEUMA:
+        dataset = PNeumaDataset.read_pneuma_csv(dataset_id, progress_reporter)
+    elif dataset_id.data_source == DataSource.EXID:
+        dataset = ExiDDataset.read_exid_csv(dataset_id)
+    else:
+        raise ValueError('No alternative is implemented for this data source. Is it a new data source?')
+
+    dataset.save()
+    _write_manifest(dataset_id)
+
+
+def _run_conversion(dataset_id, cache_format=None, encrypt_columnar_cache=False, progress_reporter=None):
+    """
+    Converts a single dataset and returns a row for the report. This is the function that runs in the worker processes, the cache settings are passed
+    explicitly because the class attributes of Dataset are not copied to new processes.
+    """
+    if cache_format is not None:
+        Dataset.cache_format = cache_format
+    Dataset.encrypt_columnar_cache = encrypt_columnar_cache
+
+    start_time = time.perf_counter()
+    missing_files = get_missing_source_files(dataset_id)
+    try:
+        if missing_files:
+            # missing data is checked before converting, such that every error during the conversion is reported as a failure
+            status = 'missing data'
+            message = 'missing ' + ', '.join(missing_files)
+        else:
+            convert_dataset(dataset_id, progress_reporter)
+            status = 'converted'
+            message = ''
+    except Exception as error:
+        status = 'failed'
+        message = '%s: %s' % (type(error).__name__, error)
+
+    return {'dataset': str(dataset_id),
+            'data_source': str(dataset_id.data_source),
+            'status': status,
+            'wall_time_s': round(time.perf_counter() - start_time, 2),
+            'peak_rss_mb': round(get_peak_memory_in_mb(), 1),
+            'message': message}
+
+
+def _run_conversion_job(arguments):
+    return _run_conversion(*arguments)
+
+
+def convert_datasets(dataset_ids, number_of_workers=None, force=False, report_path=None):
+    """
+    Converts all datasets whose cache is not up to date. Returns the rows of the report and, if a report path is provided, writes them to a csv file.
+
+    :param dataset_ids: list of dataset ids
+    :param number_of_workers: the number of parallel conversions, by default this is based on the number of cpu cores and the available memory. If 1, all
+    datasets are converted in this process with progress printed to the console
+    :param force: convert all datasets, also if the cache is up to date
+    :param report_path: path to the csv file to write the report to
+    """
+    report = []
+    datasets_to_convert = []
+
+    for dataset_id in dataset_ids:
+        if not force and is_cache_up_to_date(dataset_id):
+            print('%s: up to date' % dataset_id)
+            report.append({'dataset': str(dataset_id), 'data_source': str(dataset_id.data_source), 'status': 'up to date', 'wall_time_s': 0.,
+                           'peak_rss_mb': float('nan'), 'message': ''})
+        else:
+            datasets_to_convert.append(dataset_id)
+
+    if number_of_workers is None:
+        number_of_workers = get_number_of_workers(datasets_to_convert)
+
+    settings = (Dataset.cache_format, Dataset.encrypt_columnar_cache)
+
+    if number_of_workers <= 1:
+        for dataset_id in datasets_to_convert:
+            print('%s: converting' % dataset_id)
+            report.append(_run_conversion(dataset_id, *settings, progress_reporter=ConsoleProgressReporter()))
+            _print_result(report[-1])
+    elif datasets_to_convert:
+        print('Converting %d datasets with %d workers' % (len(datasets_to_convert), number_of_workers))
+
+        # every conversion gets a new (spawned) process, this releases all memory after a conversion and makes the peak memory measurement per dataset
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(number_of_workers, maxtasksperchild=1) as pool:
+            jobs = [(dataset_id,) + settings + (ProgressReporter(),) for dataset_id in datasets_to_convert]
+            for result in pool.imap_unordered(_run_conversion_job, jobs):
+                report.append(result)
+                _print_result(result)
+
+    if report_path is not None:
+        with open(report_path, 'w', newline='') as report_file:
+            writer = csv.DictWriter(report_file, fieldnames=REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(report)
+
+    return report
+
+
+def _print_result(result):
+    if result['status'] == 'converted':
+        print('%s: converted in %.1f s, peak memory %.0f MB' % (result['dataset'], result['wall_time_s'], result['peak_rss_mb']))
+    else:
+        print('%s: %s %s' % (result['dataset'], result['status'], result['message']))
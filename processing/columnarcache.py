@@ -0,0 +1,255 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from processing.encryptiontools import save_encrypted_pickle, load_encrypted_pickle, encrypt_chunks, decrypt_chunks_into
+
+"""
+A columnar cache for Dataset objects. Instead of pickling a complete dataset object, all pandas DataFrames that are attributes of the dataset (e.g. track_data
+and track_meta_data) are stored column by column in uncompressed .npy files. Numeric columns can then be read with a single read per column, without the
+extra in-memory copies needed to decrypt and unpickle one big object. All other attributes (recording meta data, annotations, etc.) are stored in a small
+header file, which is an encrypted pickle just like the old cache files.
+
+When loading, the unencrypted column files can be memory mapped instead of read. The DataFrames are then constructed on read-only views of the files without
+copying, which makes opening a dataset almost instant. Pages of the files are only read from disk when they are accessed, so for example only the rows of the
+frames that are visualised are loaded. Note that memory mapped DataFrames can not be modified in place.
+
+The .npy files are stored without pickled objects, so they are safe to open. Object columns (e.g. text) are stored as integer codes, the distinct values are
+stored in the header. Missing values (NaN, None) get code -1 and are loaded as NaN. Columns of timezone aware datetimes are stored in UTC and converted back
+to their timezone when loading. Optionally, the column files can be encrypted as well. This is done in chunks such that no second copy of the full encrypted data is needed when loading.
+
+Folder structure:
+    <cache folder>/header.pkl
+    <cache folder>/<table name>/column_000.npy (or column_000.enc when encrypted)
+    <cache folder>/<table name>/index.npy (only for tables that do not have a default RangeIndex)
+"""
+
+CACHE_FORMAT_VERSION = 2
+ENCRYPTION_CHUNK_SIZE = 16 * 2 ** 20
+HEADER_FILE_NAME = 'header.pkl'
+
+
+def _load_header(folder_path):
+    """
+    Returns the header of a columnar cache, or None if the cache does not exist or was saved in another format version.
+    """
+    header_path = os.path.join(folder_path, HEADER_FILE_NAME)
+    if not os.path.isfile(header_path):
+        return None
+
+    header = load_encrypted_pickle(header_path)
+    return header if header['format_version'] == CACHE_FORMAT_VERSION else None
+
+
+def columnar_cache_exists(folder_path):
+    """
+    Checks if a columnar cache exists in the current format, a cache in an older format is treated as absent such that the dataset is converted again.
+    """
+    return _load_header(folder_path) is not None
+
+
+def can_memory_map_columnar_cache(folder_path):
+    """
+    Checks if a columnar cache exists in the current format and without encrypted column files, such that load_columnar_cache can memory map it.
+    """
+    header = _load_header(folder_path)
+    return header is not None and not any(schema['encrypted'] for schema in header['tables'].values())
+
+
+def save_columnar_cache(folder_path, dataset, encrypt=False):
+    os.makedirs(folder_path, exist_ok=True)
+
+    # remove the old header first, a cache without a header is considered absent. This way an interrupted save never results in a corrupt cache
+    header_path = os.path.join(folder_path, HEADER_FILE_NAME)
+    if os.path.isfile(header_path):
+        os.remove(header_path)
+
+    state = dict(vars(dataset))
+    tables = {}
+
+    for attribute_name, value in vars(dataset).items():
+        if isinstance(value, pd.DataFrame):
+            tables[attribute_name] = _save_table(os.path.join(folder_path, attribute_name), value, encrypt)
+            state[attribute_name] = None
+
+    header = {'format_version': CACHE_FORMAT_VERSION,
+              'dataset_class': type(dataset),
+              'state': state,
+              'tables': tables}
+    save_encrypted_pickle(header_path, header)
+
+
+def is_memory_mapped(array):
+    """
+    Checks if a NumPy array is (a view on) a memory mapped file.
+    """
+    return _get_memory_map(array) is not None
+
+
+def _get_memory_map(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return array
+        array = getattr(array, 'base', None)
+    return None
+
+
+def load_columnar_cache(folder_path, memory_map=False):
+    header = _load_header(folder_path)
+    if header is None:
+        return None
+
+    dataset_class = header['dataset_class']
+    dataset = dataset_class.__new__(dataset_class)
+    dataset.__dict__.update(header['state'])
+
+    for attribute_name, schema in header['tables'].items():
+        setattr(dataset, attribute_name, _load_table(os.path.join(folder_path, attribute_name), schema, memory_map))
+
+    return dataset
+
+
+def _save_table(folder_path, data_frame, encrypt):
+    os.makedirs(folder_path, exist_ok=True)
+
+    schema = {'columns': [],
+              'index': None,
+              'index_name': data_frame.index.name,
+              'number_of_rows': len(data_frame),
+              'encrypted': encrypt}
+
+    for position, column_name in enumerate(data_frame.columns):
+        file_name = 'column_%03d' % position
+        values, encoding = _encode_values(data_frame[column_name])
+        dtype = _save_array(os.path.join(folder_path, file_name), values, encrypt)
+        schema['columns'].append((column_name, file_name, dtype, encoding))
+
+    if isinstance(data_frame.index, pd.RangeIndex):
+        schema['index'] = ('range', data_frame.index.start, data_frame.index.stop, data_frame.index.step)
+    else:
+        values, encoding = _encode_values(data_frame.index)
+        dtype = _save_array(os.path.join(folder_path, 'index'), values, encrypt)
+        schema['index'] = ('array', 'index', dtype, encoding)
+
+    return schema
+
+
+def _load_table(folder_path, schema, memory_map):
+    columns = {}
+    for column_name, file_name, dtype, encoding in schema['columns']:
+        values = _load_array(os.path.join(folder_path, file_name), dtype, schema['number_of_rows'], schema['encrypted'], memory_map)
+        columns[column_name] = _decode_values(values, encoding)
+
+    if schema['index'][0] == 'range':
+        _, start, stop, step = schema['index']
+        index = pd.RangeIndex(start, stop, step, name=schema['index_name'])
+    else:
+        _, file_name, dtype, encoding = schema['index']
+        values = _load_array(os.path.join(folder_path, file_name), dtype, schema['number_of_rows'], schema['encrypted'], memory_map=False)
+        index = pd.Index(_decode_values(values, encoding), name=schema['index_name'])
+
+    # copy=False keeps every column as a separate array, instead of consolidating them in a new block. This is what keeps memory mapped columns mapped.
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def _encode_values(values):
+    """
+    Converts a column or index to an array that can be stored without pickling. Returns the array and the encoding needed to restore the values, which is
+    stored in the header.
+    """
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        datetimes = pd.DatetimeIndex(values)
+        return datetimes.tz_convert('UTC').tz_localize(None).to_numpy(), ('datetimetz', datetimes.tz)
+
+    array = values.to_numpy()
+    if array.dtype == object:
+        # missing values get code -1, which selects the NaN that is appended to the categories
+        codes, categories = pd.factorize(array)
+        categories_with_missing_value = np.empty(len(categories) + 1, dtype=object)
+        categories_with_missing_value[:-1] = categories
+        categories_with_missing_value[-1] = np.nan
+        return codes.astype(np.int32 if len(categories) < 2 ** 31 else np.int64), ('categorical', categories_with_missing_value)
+
+    return array, None
+
+
+def _decode_values(values, encoding):
+    if encoding is None:
+        return values
+
+    kind, argument = encoding
+    if kind == 'categorical':
+        return argument[values]
+    elif kind == 'datetimetz':
+        return pd.DatetimeIndex(values).tz_localize('UTC').tz_convert(argument)
+    else:
+        raise ValueError('Unknown column encoding in columnar cache: %s' % kind)
+
+
+def _save_array(file_path_without_extension, values, encrypt):
+    memory_map = _get_memory_map(values)
+    if not encrypt and memory_map is not None and os.path.abspath(memory_map.filename) == os.path.abspath(file_path_without_extension + '.npy'):
+        # this column was loaded as a memory map of this exact file, it can not have been changed (it is read-only) and overwriting it would invalidate the map
+        return values.dtype.str
+
+    values = np.ascontiguousarray(values)
+
+    # write to a temporary file first and replace the old file afterwards. Existing memory maps of the old file then stay valid, truncating a mapped file
+    # would crash the process when the mapped data is accessed.
+    if encrypt:
+        file_path = file_path_without_extension + '.enc'
+        tokens = encrypt_chunks(values.view(np.uint8), ENCRYPTION_CHUNK_SIZE)
+        with open(file_path + '.tmp', 'wb') as file:
+            for token in tokens:
+                file.write(len(token).to_bytes(8, 'little'))
+                file.write(token)
+        stale_file = file_path_without_extension + '.npy'
+    else:
+        file_path = file_path_without_extension + '.npy'
+        with open(file_path + '.tmp', 'wb') as file:
+            np.save(file, values, allow_pickle=False)
+        stale_file = file_path_without_extension + '.enc'
+
+    os.replace(file_path + '.tmp', file_path)
+
+    if os.path.isfile(stale_file):
+        os.remove(stale_file)
+
+    return values.dtype.str
+
+
+def _load_array(file_path_without_extension, dtype, number_of_rows, encrypted, memory_map):
+    if encrypted:
+        values = np.empty(number_of_rows, dtype=np.dtype(dtype))
+        with open(file_path_without_extension + '.enc', 'rb') as file:
+            decrypt_chunks_into(_read_tokens(file), values.view(np.uint8))
+        return values
+    else:
+        return np.load(file_path_without_extension + '.npy', mmap_mode='r' if memory_map else None, allow_pickle=False)
+
+
+def _read_tokens(file):
+    while True:
+        length = file.read(8)
+        if not length:
+            return
+        yield file.read(int.from_bytes(length, 'little'))
@@ -0,0 +1,200 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import abc
+import time
+
+import numpy as np
+
+from dataobjects import Annotation, AnnotationType
+from dataobjects.enums import DataSource
+from processing.frameindex import FrameIndex, frame_keys_from_time
+
+"""
+An engine that runs multiple event detectors on a dataset in a single pass. Every detector declares the columns of the track data it uses. The engine groups
+the rows per vehicle with a FrameIndex on the vehicle ids and then visits the track of every vehicle once. The columns are not copied or sorted as a whole,
+which matters for memory mapped datasets: the rows of a vehicle are gathered from the columns when its track is created. If the rows of a vehicle are stored
+contiguously and sorted on frame (as in the HighD, ExiD and NGSIM files), the track holds views on the columns and nothing is copied. The track is handed to
+all detectors that are interested in the vehicle as a VehicleTrack, so the data is not copied per detector. Only the vehicle id and frame columns are read in
+full.
+
+To add a detector, inherit from EventDetector, set columns and annotation_type, and implement detect. Detectors that need statistics over the full dataset
+(e.g. the mean of a column) can compute them in prepare, which is called once before the vehicles are visited. The engine works for all data sources, the
+vehicle id and frame columns are selected based on the source of the dataset. pNeuma has no frame numbers, for pNeuma frame numbers are computed from the
+time stamps in the same way as in the visualisation.
+"""
+
+# The columns that identify the vehicle and the frame of every row, per data source
+TRACK_KEY_COLUMNS = {DataSource.HIGHD: ('id', 'frame'),
+                     DataSource.EXID: ('trackId', 'frame'),
+                     DataSource.NGSIM: ('Vehicle_ID', 'Frame_ID'),
+                     DataSource.PNEUMA: ('vehicle_id', 'time')}
+
+
+class VehicleTrack:
+    def __init__(self, vehicle_id, frames, columns):
+        """
+        The track of a single vehicle, sorted on frame. The columns are views on the track data of the dataset, or copies of the rows of the vehicle if
+        these are not stored contiguously. They should not be altered, use track['column name'] to get them.
+        """
+        self.vehicle_id = vehicle_id
+        self.frames = frames
+        self.columns = columns
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __len__(self):
+        return len(self.frames)
+
+    def segment_starts(self):
+        """
+        Returns a boolean array that is True for the first row of every sequence of consecutive frames. This is only the first row if the track has no gaps.
+        """
+        is_segment_start = np.ones(len(self.frames), dtype=bool)
+        is_segment_start[1:] = self.frames[1:] != self.frames[:-1] + 1
+        return is_segment_start
+
+    def runs(self, mask):
+        """
+        Finds the runs of consecutive frames in which mask is True. Returns two arrays with the first and last row of every run.
+        """
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return rows, rows
+
+        is_run_start = np.ones(len(rows), dtype=bool)
+        is_run_start[1:] = self.frames[rows[1:]] != self.frames[rows[:-1]] + 1
+
+        run_start_indices = np.flatnonzero(is_run_start)
+        run_end_indices = np.append(run_start_indices[1:], len(rows)) - 1
+        return rows[run_start_indices], rows[run_end_indices]
+
+
+class EventDetector(abc.ABC):
+    # the columns of the track data that the detector uses, the vehicle id and frame are always available
+    columns = []
+    annotation_type = AnnotationType.MANUAL
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+    def prepare(self, dataset):
+        """
+        Called once per dataset before the tracks are visited. Override this to compute statistics over the full dataset, or to read the track meta data.
+        """
+        pass
+
+    def wants_track(self, vehicle_id):
+        """
+        Override this to skip vehicles without looking at their data, for example to only consider cars. If no detector wants a track, it is not created.
+        """
+        return True
+
+    @abc.abstractmethod
+    def detect(self, track: VehicleTrack):
+        """
+        Returns an iterable of events for a single vehicle track. Every event is a tuple of (first frame, last frame, notes).
+        """
+        pass
+
+
+class DetectorEngine:
+    def __init__(self, detectors):
+        """
+        Runs a list of EventDetector objects in a single pass over the tracks of a dataset. After running, the time spent in every detector (in seconds) is
+        available in the timing dict.
+        """
+        self.detectors = detectors
+        self.timing = {}
+
+    def get_required_columns(self, data_source):
+        vehicle_id_column, frame_column = TRACK_KEY_COLUMNS[data_source]
+        columns = [vehicle_id_column, frame_column]
+        for detector in self.detectors:
+            columns += [column for column in detector.columns if column not in columns]
+        return columns
+
+    def run(self, dataset):
+        """
+        Runs all detectors on the dataset and returns a list of Annotation objects, ordered on vehicle. The annotations are not added to the dataset.
+        """
+        self.timing = {detector.name: 0. for detector in self.detectors}
+
+        vehicle_id_column, frame_column = TRACK_KEY_COLUMNS[dataset.dataset_id.data_source]
+
+        # to_numpy of a single column returns the stored array (or memory map) without a copy
+        columns = {column: dataset.track_data[column].to_numpy() for column in self.get_required_columns(dataset.dataset_id.data_source)}
+
+        frames = columns[frame_column]
+        if dataset.dataset_id.data_source is DataSource.PNEUMA:
+            frames = frame_keys_from_time(frames, dataset.frame_rate)
+
+        vehicle_index = FrameIndex(columns[vehicle_id_column])
+
+        for detector in self.detectors:
+            start_time = time.perf_counter()
+            detector.prepare(dataset)
+            self.timing[detector.name] += time.perf_counter() - start_time
+
+        annotations = []
+        for vehicle_id, track_start, track_end in zip(vehicle_index.frames, vehicle_index.start_offsets, vehicle_index.end_offsets):
+            vehicle_id = int(vehicle_id)
+            interested_detectors = [detector for detector in self.detectors if detector.wants_track(vehicle_id)]
+            if not interested_detectors:
+                continue
+
+            track = self._create_track(vehicle_id, vehicle_index.row_order[track_start:track_end], frames, columns)
+
+            for detector in interested_detectors:
+                start_time = time.perf_counter()
+                for first_frame, last_frame, notes in detector.detect(track):
+                    new_annotation = Annotation(dataset.dataset_id)
+                    new_annotation.first_frame = int(first_frame)
+                    new_annotation.last_frame = int(last_frame)
+                    new_annotation.ego_vehicle_id = vehicle_id
+                    new_annotation.annotation_type = detector.annotation_type
+                    new_annotation.notes = notes
+                    annotations.append(new_annotation)
+                self.timing[detector.name] += time.perf_counter() - start_time
+
+        return annotations
+
+    @staticmethod
+    def _create_track(vehicle_id, rows, frames, columns):
+        # the row order of the index is stable, so the rows of a vehicle are in the order in which they are stored
+        track_frames = frames[rows]
+        if np.any(track_frames[1:] < track_frames[:-1]):
+            frame_order = np.argsort(track_frames, kind='stable')
+            rows = rows[frame_order]
+            track_frames = track_frames[frame_order]
+        elif len(rows) and rows[-1] - rows[0] == len(rows) - 1:
+            # the rows are contiguous and sorted on frame, so the track can use views on the columns
+            rows = slice(rows[0], rows[-1] + 1)
+            track_frames = frames[rows]
+
+        return VehicleTrack(vehicle_id, track_frames, {column: values[rows] for column, values in columns.items()})
+
+    def annotate(self, dataset):
+        """
+        Runs all detectors on the dataset and adds the annotations to the annotation data of the dataset.
+        """
+        annotations = self.run(dataset)
+        dataset.annotation_data += annotations
+        return annotations
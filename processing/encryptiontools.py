@@ -18,6 +18,7 @@ along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
 import os
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 
 from cryptography.fernet import Fernet, InvalidToken
 
@@ -64,3 +65,52 @@ def load_encrypted_pickle(file_path):
                                'Try removing the pickle file from your data folder and loading the data from the csv files.')
         data = pickle.loads(data_as_bytes)
     return data
+
+
+def encrypt_chunks(buffer, chunk_size):
+    """
+    Encrypts a (large) bytes-like object in independent chunks, such that it can be decrypted without holding a second encrypted copy of all data in memory.
+    The chunks are encrypted in parallel threads. Returns a list of encrypted tokens.
+    """
+    fernet = Fernet(_get_key())
+    buffer = memoryview(buffer).cast('B')
+    chunks = [buffer[start:start + chunk_size] for start in range(0, len(buffer), chunk_size)]
+
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(lambda chunk: fernet.encrypt(bytes(chunk)), chunks))
+
+
+def decrypt_chunks_into(tokens, out_buffer):
+    """
+    Decrypts tokens created with encrypt_chunks and writes the results consecutively into a preallocated writable bytes-like object.
+    """
+    fernet = Fernet(_get_key())
+    out_buffer = memoryview(out_buffer).cast('B')
+
+    def decrypt(token):
+        try:
+            return fernet.decrypt(token)
+        except InvalidToken:
+            raise RuntimeError('The loaded file could not be opened. It might have been saved on a different computer and encrypted with a different key. '
+                               'Or the file was corrupted. '
+                               'Try removing the cache from your data folder and loading the data from the csv files.')
+
+    # decrypt a limited number of chunks at a time, so the encrypted data is never completely in memory
+    batch_size = os.cpu_count() or 1
+    position = 0
+    with ThreadPoolExecutor(max_workers=batch_size) as executor:
+        for batch in _batched(tokens, batch_size):
+            for chunk in executor.map(decrypt, batch):
+                out_buffer[position:position + len(chunk)] = chunk
+                position += len(chunk)
+
+
+def _batched(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -24,3 +24,117 @@ def cost_function(x, surrounding_vehicles_positions, lane_centers):
     distance_other_vehicle = (x[0] - surrounding_vehicles_positions[:, 0]) ** 2 + (x[1] - surrounding_vehicles_positions[:, 1]) ** 2
     collision_feature = sum(np.exp(-.3 * distance_other_vehicle))
     return -lane_center_feature + 5 * collision_feature
+
+
+def cost_grid(x_coordinates, y_coordinates, surrounding_vehicles_positions, lane_centers):
+    """
+    Evaluates cost_function for every point in a grid at once. Returns an array of len(y_coordinates) x len(x_coordinates).
+
+    Both terms of the cost function are separable: the lane center term only depends on y, and every collision term exp(-0.3 * (dx^2 + dy^2)) is the product
+    of exp(-0.3 * dx^2) and exp(-0.3 * dy^2). The sum of the collision terms over all vehicles is then a single matrix product of a (vehicles x rows) and a
+    (vehicles x columns) array. Apart from the result, the memory use only scales with the number of rows and columns, not with the number of grid points.
+
+    :param x_coordinates: 1D array with the x coordinates of the grid columns
+    :param y_coordinates: 1D array with the y coordinates of the grid rows
+    :param surrounding_vehicles_positions: array of vehicles x 2 with the x and y position of every vehicle
+    :param lane_centers: list of the y coordinates of the lane centers
+    """
+    x_coordinates = np.asarray(x_coordinates, dtype=float)
+    y_coordinates = np.asarray(y_coordinates, dtype=float)
+    surrounding_vehicles_positions = np.asarray(surrounding_vehicles_positions, dtype=float).reshape(-1, 2)
+    lane_centers = np.asarray(lane_centers, dtype=float)
+
+    lane_center_feature = np.exp(-0.8 * ((y_coordinates[:, np.newaxis] - lane_centers) ** 2)).sum(axis=1)
+
+    collision_factors_x = np.exp(-.3 * (x_coordinates - surrounding_vehicles_positions[:, 0:1]) ** 2)
+    collision_factors_y = np.exp(-.3 * (y_coordinates - surrounding_vehicles_positions[:, 1:2]) ** 2)
+
+    costs = collision_factors_y.T @ collision_factors_x
+    costs *= 5
+    costs -= lane_center_feature[:, np.newaxis]
+    return costs
+
+
+class IncrementalCostGrid:
+    def __init__(self, x_coordinates, y_coordinates, lane_centers, influence_threshold=1e-6):
+        """
+        Keeps the costs of cost_function on a grid up to date while vehicles move, such that the grid can be updated every frame during playback.
+
+        The lane center term never changes, so it is computed once. The collision term of a vehicle decays as exp(-0.3 * d^2), so it is only evaluated in a
+        square window around the vehicle, outside of which it is smaller than influence_threshold. The contribution of every vehicle is stored, when a vehicle
+        moves only its old contribution is subtracted from the costs and its new contribution is added, in place. Cells that are not close to a moving vehicle
+        are not touched. update returns the windows that changed, such that a user of the grid (e.g. an overlay) can also update only these parts.
+
+        :param x_coordinates: 1D array with the (increasing) x coordinates of the grid columns
+        :param y_coordinates: 1D array with the (increasing) y coordinates of the grid rows
+        :param lane_centers: list of the y coordinates of the lane centers
+        :param influence_threshold: the value of a collision term below which it is neglected
+        """
+        self.x_coordinates = np.asarray(x_coordinates, dtype=float)
+        self.y_coordinates = np.asarray(y_coordinates, dtype=float)
+        self.influence_radius = np.sqrt(-np.log(influence_threshold) / .3)
+
+        lane_centers = np.asarray(lane_centers, dtype=float)
+        self._lane_center_feature = np.exp(-0.8 * ((self.y_coordinates[:, np.newaxis] - lane_centers) ** 2)).sum(axis=1)
+        self._costs = np.repeat(-self._lane_center_feature[:, np.newaxis], len(self.x_coordinates), axis=1)
+
+        # {vehicle id: (position, row slice, column slice, contribution)}
+        self._contributions = {}
+
+    def _window(self, coordinates, position):
+        first = np.searchsorted(coordinates, position - self.influence_radius)
+        last = np.searchsorted(coordinates, position + self.influence_radius, side='right')
+        return slice(first, last)
+
+    def _add_vehicle(self, vehicle_id, position):
+        rows = self._window(self.y_coordinates, position[1])
+        columns = self._window(self.x_coordinates, position[0])
+
+        contribution = np.outer(np.exp(-.3 * (self.y_coordinates[rows] - position[1]) ** 2), np.exp(-.3 * (self.x_coordinates[columns] - position[0]) ** 2))
+        contribution *= 5
+        self._costs[rows, columns] += contribution
+        self._contributions[vehicle_id] = (position, rows, columns, contribution)
+        return rows, columns
+
+    def _remove_vehicle(self, vehicle_id):
+        _, rows, columns, contribution = self._contributions.pop(vehicle_id)
+        self._costs[rows, columns] -= contribution
+        return rows, columns
+
+    def update(self, vehicle_positions):
+        """
+        Updates the grid to the new vehicle positions. Vehicles that are not in vehicle_positions anymore are removed from the grid. Returns a list of
+        (row slice, column slice) windows that contain all cells that changed, a moving vehicle results in a single window that covers its old and new position.
+
+        :param vehicle_positions: dict of {vehicle id: (x, y)}
+        """
+        changed_windows = []
+        for vehicle_id in [vehicle_id for vehicle_id in self._contributions.keys() if vehicle_id not in vehicle_positions]:
+            changed_windows.append(self._remove_vehicle(vehicle_id))
+
+        for vehicle_id, position in vehicle_positions.items():
+            position = (float(position[0]), float(position[1]))
+            if vehicle_id in self._contributions:
+                if self._contributions[vehicle_id][0] == position:
+                    continue
+                old_rows, old_columns = self._remove_vehicle(vehicle_id)
+                new_rows, new_columns = self._add_vehicle(vehicle_id, position)
+                changed_windows.append((slice(min(old_rows.start, new_rows.start), max(old_rows.stop, new_rows.stop)),
+                                        slice(min(old_columns.start, new_columns.start), max(old_columns.stop, new_columns.stop))))
+            else:
+                changed_windows.append(self._add_vehicle(vehicle_id, position))
+        return changed_windows
+
+    def get_costs(self):
+        """
+        Returns the costs as an array of len(y_coordinates) x len(x_coordinates). This array is updated in place by update, it should not be altered.
+        """
+        return self._costs
+
+    def get_value_range(self):
+        """
+        Returns a fixed (minimum, maximum) of the costs, such that the colors of an overlay do not change scale while vehicles move. The minimum is the lowest
+        lane center term without vehicles, the maximum is the highest cost that a single vehicle can cause. Where vehicles overlap, the costs can exceed this
+        maximum.
+        """
+        return -self._lane_center_feature.max(), 5. - self._lane_center_feature.min()
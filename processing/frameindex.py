@@ -0,0 +1,65 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import numpy as np
+
+
+class FrameIndex:
+    def __init__(self, frames):
+        """
+        An index on the rows of track data, grouped per frame. The rows are (stably) sorted on their frame number, after that all rows of a single frame form
+        a contiguous block that is described by a start and end offset. Looking up the rows of a frame is a binary search on the unique frame numbers, so the
+        cost of a lookup no longer depends on the total number of rows in a dataset.
+
+        :param frames: array with the frame number (or any other sortable key that identifies a time step) of every row
+        """
+        frames = np.asarray(frames)
+
+        self.row_order = np.argsort(frames, kind='stable')
+        sorted_frames = frames[self.row_order]
+
+        self.frames, self.start_offsets = np.unique(sorted_frames, return_index=True)
+        self.end_offsets = np.append(self.start_offsets[1:], len(sorted_frames))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def slice_of(self, frame):
+        """
+        Returns a slice that selects all rows of the requested frame from columns sorted with sorted_column. An empty slice is returned if the frame does not
+        exist.
+        """
+        position = np.searchsorted(self.frames, frame)
+
+        if position < len(self.frames) and self.frames[position] == frame:
+            return slice(self.start_offsets[position], self.end_offsets[position])
+        else:
+            return slice(0, 0)
+
+    def sorted_column(self, column):
+        """
+        Returns a contiguous copy of a column, with its rows in the order of this index.
+        """
+        return np.ascontiguousarray(np.asarray(column)[self.row_order])
+
+
+def frame_keys_from_time(time_in_seconds, frame_rate):
+    """
+    Converts time stamps in seconds to integer frame keys. This avoids comparing floating point time stamps for equality.
+    """
+    return np.round(np.asarray(time_in_seconds) * frame_rate).astype(np.int64)
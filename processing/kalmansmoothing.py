@@ -16,11 +16,24 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
+import concurrent.futures
+import multiprocessing
+import os
+
 import numpy as np
-import pykalman
 
-from PyQt5 import QtWidgets
 from dataobjects.enums import VehicleType
+from processing.unscentedsmoother import additive_unscented_smoother
+
+"""
+Functions to smooth the trajectories in NGSim and pNeuma data with an unscented Kalman filter (and smoother). Every vehicle is smoothed independently, so the
+work is divided over multiple processes. Within a process, tracks of a similar length are smoothed together in batches with the vectorized smoother from
+processing/unscentedsmoother.py. The tracks of all vehicles are grouped once, the smoothed states are collected in preallocated arrays and added to the track
+data in one go. Progress is reported with an optional callback function that is called as progress_callback(number_done, total).
+"""
+
+MAXIMUM_TRACKS_PER_BATCH = 64
+MAXIMUM_TIME_STEPS_PER_BATCH = 2 ** 17
 
 
 def _f(state, wheelbase, dt):
@@ -59,114 +72,230 @@ def _estimate_initial_heading(measured_data):
     return np.arctan2(dy, dx)
 
 
-def smooth_ngsim_data(data):
+def _smooth_batch(jobs):
+    """
+    Smooths the tracks of a batch of vehicles, this runs in a worker process. Returns a list with for every job the smoothed x, y, heading and velocity or
+    None if smoothing failed.
+
+    :param jobs: list of tuples (measured_data, initial_state_mean, wheelbase, dt, observed_states, transition_covariance), where observed_states is a
+    boolean mask that selects the observed values from the state. dt, observed_states and transition_covariance must be the same for all jobs.
+    """
+    try:
+        return _smooth_tracks_together(jobs)
+    except np.linalg.LinAlgError:
+        if len(jobs) == 1:
+            return [None]
+        # find out which track(s) caused the error by smoothing them one by one
+        return [_smooth_batch([job])[0] for job in jobs]
+
+
+def _smooth_tracks_together(jobs):
+    _, _, _, dt, observed_states, transition_covariance = jobs[0]
+
+    track_lengths = np.array([len(job[0]) for job in jobs])
+    observations = np.empty((len(jobs), track_lengths.max(), sum(observed_states)))
+    for index, job in enumerate(jobs):
+        measured_data = job[0]
+        observations[index, :len(measured_data)] = measured_data
+        observations[index, len(measured_data):] = measured_data[-1]
+
+    initial_state_means = np.array([job[1] for job in jobs])
+    wheelbases = np.array([job[2] for job in jobs])[:, np.newaxis]
+
+    def transition_function(points):
+        # _f indexes the states on the first axis, this makes it work on all points of all tracks in the batch at once
+        return np.moveaxis(_f(np.moveaxis(points, -1, 0), wheelbases, dt), 0, -1)
+
+    smoothed_states = additive_unscented_smoother(observations, track_lengths, transition_function, observed_states, initial_state_means,
+                                                  np.eye(6) * transition_covariance)
+    return [smoothed_states[index, :length, 0:4] for index, length in enumerate(track_lengths)]
+
+
+def _create_batches(jobs):
+    """
+    Divides the jobs in batches of tracks with a similar length, returns a list of lists with job indices.
+    """
+    batches = []
+    current_batch = []
+
+    for index in sorted(range(len(jobs)), key=lambda job_index: len(jobs[job_index][0])):
+        # the jobs are sorted on length, so the current job determines the padded length of the batch
+        padded_size = (len(current_batch) + 1) * len(jobs[index][0])
+        if current_batch and (len(current_batch) == MAXIMUM_TRACKS_PER_BATCH or padded_size > MAXIMUM_TIME_STEPS_PER_BATCH):
+            batches.append(current_batch)
+            current_batch = []
+        current_batch.append(index)
+
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+
+def _smooth_all_tracks(jobs, number_of_workers, progress_callback):
+    """
+    Smooths the tracks of all jobs in batches and returns the results in the same order as the jobs. If number_of_workers is 1, all tracks are smoothed in
+    this process.
+    """
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count() or 1
+
+    if multiprocessing.current_process().daemon:
+        # daemon processes (e.g. the workers of a batch conversion) can not start worker processes of their own
+        number_of_workers = 1
+
+    batches = _create_batches(jobs)
+    batch_jobs = [[jobs[index] for index in batch] for batch in batches]
+    results = [None] * len(jobs)
+    number_done = 0
+
+    if progress_callback:
+        progress_callback(0, len(jobs))
 
-    def g(state):
-        """
-        Observation function, returns the observation based on the current state
-        state: [x, y, heading, velocity, steering_angle, acceleration]
-        """
-        observation = state[[True, True, False, True, False, True]]
-        return observation
+    if number_of_workers <= 1 or len(batches) <= 1:
+        batch_results = map(_smooth_batch, batch_jobs)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=number_of_workers)
+        batch_results = executor.map(_smooth_batch, batch_jobs)
 
-    all_vehicle_ids = data['Vehicle_ID'].unique()
+    try:
+        for batch, batch_result in zip(batches, batch_results):
+            for index, result in zip(batch, batch_result):
+                results[index] = result
+
+            number_done += len(batch)
+            if progress_callback:
+                progress_callback(number_done, len(jobs))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return results
+
+
+def smooth_ngsim_data(data, progress_callback=None, number_of_workers=None):
+    """
+    Adds the columns Smoothed_Global_X, Smoothed_Global_Y, Smoothed_Heading and Smoothed_Vel to the NGSim data. These are NaN for vehicles for which
+    smoothing was skipped or failed.
+
+    :param data: the NGSim track data (in meters)
+    :param progress_callback: optional function that is called as progress_callback(number_done, total)
+    :param number_of_workers: the number of worker processes, defaults to the number of cpu cores. Use 1 to smooth all tracks in this process.
+    """
+    smoothed_vehicle_ids, smoothed_rows, jobs = _create_ngsim_jobs(data)
+
+    results = _smooth_all_tracks(jobs, number_of_workers, progress_callback)
+    smoothed_data = _collect_results(len(data), smoothed_vehicle_ids, smoothed_rows, results)
+
+    data['Smoothed_Global_X'] = smoothed_data[:, 0]
+    data['Smoothed_Global_Y'] = smoothed_data[:, 1]
+    data['Smoothed_Heading'] = smoothed_data[:, 2]
+    data['Smoothed_Vel'] = smoothed_data[:, 3]
+    return data
+
+
+def _create_ngsim_jobs(data):
+    """
+    Returns the vehicle ids, the row numbers (sorted on frame) and the smoothing job for every vehicle in the NGSim data that should be smoothed.
+    """
     dt = 0.1
+    observed_states = [True, True, False, True, False, True]
 
-    progress_dialog = QtWidgets.QProgressDialog('Smoothing trajectories and calculating headings', None, 0, len(all_vehicle_ids))
-    progress_dialog.setWindowTitle('Processing data')
-    progress_dialog.setAutoClose(True)
-    progress_dialog.show()
-    progress_dialog.setValue(0)
-    QtWidgets.QApplication.instance().processEvents()
-
-    for index, vehicle_id in enumerate(all_vehicle_ids):
-        vehicle_data = data.loc[data['Vehicle_ID'] == vehicle_id, ['Frame_ID', 'Global_X', 'Global_Y', 'v_Vel', 'v_Acc']].sort_values('Frame_ID')
-        measured_data = vehicle_data.loc[:, ['Global_X', 'Global_Y', 'v_Vel', 'v_Acc']].to_numpy()
-        vehicle_length = float(data.loc[data['Vehicle_ID'] == vehicle_id, 'v_Length'].mean())
-
-        if len(vehicle_data['Frame_ID']) <= 5:
-            print(
-                'WARNING: vehicle with ID %d appears in only %d frame(s), smoothing is skipped for this vehicle' % (vehicle_id, len(vehicle_data['Frame_ID'])))
+    frame_ids = data['Frame_ID'].to_numpy()
+    measurements = data.loc[:, ['Global_X', 'Global_Y', 'v_Vel', 'v_Acc']].to_numpy(dtype=float)
+    vehicle_lengths = data['v_Length'].to_numpy(dtype=float)
+    rows_per_vehicle = data.groupby('Vehicle_ID', sort=False).indices
+
+    smoothed_vehicle_ids = []
+    smoothed_rows = []
+    jobs = []
+
+    for vehicle_id in data['Vehicle_ID'].unique():
+        rows = rows_per_vehicle[vehicle_id]
+        rows = rows[np.argsort(frame_ids[rows], kind='stable')]
+
+        if len(rows) <= 5:
+            print('WARNING: vehicle with ID %d appears in only %d frame(s), smoothing is skipped for this vehicle' % (vehicle_id, len(rows)))
             continue
 
+        measured_data = measurements[rows, :]
+        vehicle_length = float(vehicle_lengths[rows].mean())
+
         theta0 = _estimate_initial_heading(measured_data)
         initial_state_mean = np.array([measured_data[0, 0], measured_data[0, 1], theta0, measured_data[0, 2], 0.0, measured_data[0, 3]])
 
-        wb = 0.7 * vehicle_length
+        smoothed_vehicle_ids.append(vehicle_id)
+        smoothed_rows.append(rows)
+        jobs.append((measured_data, initial_state_mean, 0.7 * vehicle_length, dt, observed_states, 0.005))
 
-        ukf = pykalman.AdditiveUnscentedKalmanFilter(lambda s: _f(s, wb, dt), g, n_dim_state=6, n_dim_obs=4, transition_covariance=np.eye(6) * 0.005,
-                                                     initial_state_mean=initial_state_mean)
-        try:
-            result_from_smoothing = ukf.smooth(measured_data)
-            smoothed_states = result_from_smoothing[0]
+    return smoothed_vehicle_ids, smoothed_rows, jobs
 
-            data.loc[vehicle_data.index, 'Smoothed_Global_X'] = smoothed_states[:, 0]
-            data.loc[vehicle_data.index, 'Smoothed_Global_Y'] = smoothed_states[:, 1]
-            data.loc[vehicle_data.index, 'Smoothed_Heading'] = smoothed_states[:, 2]
-            data.loc[vehicle_data.index, 'Smoothed_Vel'] = smoothed_states[:, 3]
-        except np.linalg.LinAlgError:
-            print('WARNING: smoothing for vehicle with ID %d failed' % vehicle_id)
-
-        progress_dialog.setValue(index)
-        QtWidgets.QApplication.instance().processEvents()
 
-    progress_dialog.close()
-    QtWidgets.QApplication.instance().processEvents()
-    return data
+def smooth_pneuma_data(vehicles_df, tracks_total_df, dt, progress_callback=None, number_of_workers=None):
+    """
+    Adds the columns smoothed_global_x, smoothed_global_y, smoothed_heading and smoothed_speed to the pNeuma track data. These are NaN for vehicles for which
+    smoothing was skipped or failed.
+
+    :param vehicles_df: the pNeuma vehicle data
+    :param tracks_total_df: the pNeuma track data (with global_x and global_y in web mercator coordinates)
+    :param dt: the time between two frames in seconds
+    :param progress_callback: optional function that is called as progress_callback(number_done, total)
+    :param number_of_workers: the number of worker processes, defaults to the number of cpu cores. Use 1 to smooth all tracks in this process.
+    """
+    smoothed_vehicle_ids, smoothed_rows, jobs = _create_pneuma_jobs(vehicles_df, tracks_total_df, dt)
 
+    results = _smooth_all_tracks(jobs, number_of_workers, progress_callback)
+    smoothed_data = _collect_results(len(tracks_total_df), smoothed_vehicle_ids, smoothed_rows, results)
 
-def smooth_pneuma_data(vehicles_df, tracks_total_df, dt):
+    tracks_total_df['smoothed_global_x'] = smoothed_data[:, 0]
+    tracks_total_df['smoothed_global_y'] = smoothed_data[:, 1]
+    tracks_total_df['smoothed_heading'] = smoothed_data[:, 2]
+    tracks_total_df['smoothed_speed'] = smoothed_data[:, 3]
 
-    def g(state):
-        """
-        Observation function, returns the observation based on the current state
-        state: [x, y, heading, velocity, steering_angle, acceleration]
-        """
-        observation = state[[True, True, False, True, False, False]]
-        return observation
 
-    all_vehicle_ids = vehicles_df['track_id']
+def _create_pneuma_jobs(vehicles_df, tracks_total_df, dt):
+    """
+    Returns the vehicle ids, the row numbers (sorted on time) and the smoothing job for every vehicle in the pNeuma data that should be smoothed.
+    """
+    observed_states = [True, True, False, True, False, False]
 
-    progress_dialog = QtWidgets.QProgressDialog('Smoothing trajectories and calculating headings', None, 0, len(all_vehicle_ids))
-    progress_dialog.setWindowTitle('Processing data')
-    progress_dialog.setAutoClose(True)
-    progress_dialog.show()
-    progress_dialog.setValue(0)
-    QtWidgets.QApplication.instance().processEvents()
+    times = tracks_total_df['time'].to_numpy()
+    measurements = tracks_total_df.loc[:, ['global_x', 'global_y', 'speed']].to_numpy(dtype=float)
+    rows_per_vehicle = tracks_total_df.groupby('vehicle_id', sort=False).indices
+    vehicle_types = vehicles_df.drop_duplicates('track_id').set_index('track_id')['type']
 
-    for index, vehicle_id in enumerate(all_vehicle_ids):
-        vehicle_data = tracks_total_df.loc[tracks_total_df['vehicle_id'] == vehicle_id, ['time', 'global_x', 'global_y', 'speed']].sort_values('time')
-        vehicle_type = VehicleType.from_string(vehicles_df.loc[vehicles_df['track_id'] == vehicle_id, 'type'].iat[0])
+    smoothed_vehicle_ids = []
+    smoothed_rows = []
+    jobs = []
 
-        measured_data = vehicle_data.loc[:, ['global_x', 'global_y', 'speed']].to_numpy()
+    for vehicle_id in vehicles_df['track_id']:
+        rows = rows_per_vehicle.get(vehicle_id, np.array([], dtype=np.int64))
+        rows = rows[np.argsort(times[rows], kind='stable')]
+        vehicle_type = VehicleType.from_string(vehicle_types.at[vehicle_id])
 
         _, vehicle_length = vehicle_type.default_size_for_pneuma
 
-        if len(vehicle_data['time']) <= 5:
-            print(
-                'WARNING: vehicle with ID %d appears in only %d frame(s), smoothing is skipped for this vehicle' % (vehicle_id, len(vehicle_data['time'])))
+        if len(rows) <= 5:
+            print('WARNING: vehicle with ID %d appears in only %d frame(s), smoothing is skipped for this vehicle' % (vehicle_id, len(rows)))
             continue
 
+        measured_data = measurements[rows, :]
+
         theta0 = _estimate_initial_heading(measured_data)
         initial_state_mean = np.array([measured_data[0, 0], measured_data[0, 1], theta0, measured_data[0, 2], 0.0, 0.0])
 
-        wb = 0.7 * vehicle_length
+        smoothed_vehicle_ids.append(vehicle_id)
+        smoothed_rows.append(rows)
+        jobs.append((measured_data, initial_state_mean, 0.7 * vehicle_length, dt, observed_states, 0.001))
 
-        ukf = pykalman.AdditiveUnscentedKalmanFilter(lambda s: _f(s, wb, dt), g, n_dim_state=6, n_dim_obs=3, transition_covariance=np.eye(6) * 0.001,
-                                                     initial_state_mean=initial_state_mean)
-        try:
-            result_from_smoothing = ukf.smooth(measured_data)
-            smoothed_states = result_from_smoothing[0]
+    return smoothed_vehicle_ids, smoothed_rows, jobs
 
-            tracks_total_df.loc[vehicle_data.index, 'smoothed_global_x'] = smoothed_states[:, 0]
-            tracks_total_df.loc[vehicle_data.index, 'smoothed_global_y'] = smoothed_states[:, 1]
-            tracks_total_df.loc[vehicle_data.index, 'smoothed_heading'] = smoothed_states[:, 2]
-            tracks_total_df.loc[vehicle_data.index, 'smoothed_speed'] = smoothed_states[:, 3]
-        except np.linalg.LinAlgError:
-            print('WARNING: smoothing for vehicle with ID %d failed' % vehicle_id)
 
-        progress_dialog.setValue(index)
-        QtWidgets.QApplication.instance().processEvents()
+def _collect_results(number_of_rows, vehicle_ids, rows_per_vehicle, results):
+    smoothed_data = np.full((number_of_rows, 4), np.nan)
 
-    progress_dialog.close()
-    QtWidgets.QApplication.instance().processEvents()
+    for vehicle_id, rows, smoothed_states in zip(vehicle_ids, rows_per_vehicle, results):
+        if smoothed_states is None:
+            print('WARNING: smoothing for vehicle with ID %d failed' % vehicle_id)
+        else:
+            smoothed_data[rows, :] = smoothed_states
+    return smoothed_data
@@ -0,0 +1,78 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import sys
+import time
+
+
+class ProgressReporter:
+    """
+    Reports the progress of long running processing steps, like converting and smoothing data. Processing code calls start, update and finish. Subclasses
+    decide how the progress is shown, this base class ignores it. This way the processing code does not depend on a GUI and can run in batch jobs.
+    """
+
+    def start(self, message, total):
+        """
+        Starts reporting a new step, the step is done when the progress value reaches total.
+        """
+        pass
+
+    def update(self, value, total=None):
+        """
+        Updates the progress of the current step. This can be called very often, subclasses should keep it cheap. Optionally, the total can be changed.
+        This method has the same signature as the progress callbacks in the processing modules, so it can be passed directly as a callback.
+        """
+        pass
+
+    def finish(self):
+        pass
+
+
+class ConsoleProgressReporter(ProgressReporter):
+    def __init__(self, step_in_percent=10, stream=sys.stdout):
+        """
+        Prints the progress as a new line every step_in_percent percent, which keeps log files of batch jobs readable.
+        """
+        self.step_in_percent = step_in_percent
+        self.stream = stream
+
+        self._message = ''
+        self._total = 1
+        self._last_reported_percentage = None
+        self._start_time = 0.
+
+    def start(self, message, total):
+        self._message = message
+        self._total = total
+        self._last_reported_percentage = None
+        self._start_time = time.perf_counter()
+        self.update(0)
+
+    def update(self, value, total=None):
+        if total is not None:
+            self._total = total
+
+        percentage = int(100 * value / self._total) if self._total else 100
+        percentage -= percentage % self.step_in_percent
+
+        if percentage != self._last_reported_percentage:
+            self._last_reported_percentage = percentage
+            print('%s: %d%%' % (self._message, percentage), file=self.stream, flush=True)
+
+    def finish(self):
+        print('%s: done in %.1f s' % (self._message, time.perf_counter() - self._start_time), file=self.stream, flush=True)
@@ -0,0 +1,157 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import numpy as np
+
+"""
+A vectorized unscented Kalman filter and Rauch-Tung-Striebel smoother with additive noise. It implements the same algorithm, with the same default parameters
+(alpha = 1, beta = 0, kappa = 3 - n), as the AdditiveUnscentedKalmanFilter of pykalman, so the results are numerically equal up to floating point round-off.
+
+The difference is that all sigma points of a time step are propagated through the transition function as one array, and that multiple tracks are processed
+at once. The arrays have a leading batch dimension, tracks in a batch can have different lengths. Shorter tracks are padded at the end, the padded time steps
+do not influence the results. Sorting tracks on their length before batching them keeps the amount of padding small.
+
+The observation function is limited to selecting a subset of the states, this is the only observation function used in Travia.
+"""
+
+
+def _sigma_point_weights(number_of_states):
+    alpha = 1.0
+    beta = 0.0
+    kappa = 3.0 - number_of_states
+
+    lamda = (alpha * alpha) * (number_of_states + kappa) - number_of_states
+    c = number_of_states + lamda
+
+    weights_mean = np.full(2 * number_of_states + 1, 0.5 / c)
+    weights_mean[0] = lamda / c
+    weights_covariance = weights_mean.copy()
+    weights_covariance[0] = lamda / c + (1 - alpha * alpha + beta)
+
+    return np.sqrt(c), weights_mean, weights_covariance
+
+
+def _sigma_points(means, covariances, scale):
+    """
+    Returns the sigma points for a batch of means (batch x n) and covariances (batch x n x n) as an array of batch x (2n + 1) x n.
+    """
+    # the columns of the lower cholesky factor are the offsets of the sigma points, swapping the axes makes every row one offset
+    offsets = np.swapaxes(np.linalg.cholesky(covariances), -1, -2) * scale
+    means = means[:, np.newaxis, :]
+    return np.concatenate([means, means + offsets, means - offsets], axis=1)
+
+
+def _moments(points, weights_mean, weights_covariance, additive_covariance=None):
+    mean = np.einsum('p,bpn->bn', weights_mean, points)
+    difference = points - mean[:, np.newaxis, :]
+    covariance = np.einsum('bpi,p,bpj->bij', difference, weights_covariance, difference)
+
+    if additive_covariance is not None:
+        covariance += additive_covariance
+    return mean, covariance
+
+
+def _cross_covariance(points_a, mean_a, points_b, mean_b, weights):
+    return np.einsum('bpi,p,bpj->bij', points_a - mean_a[:, np.newaxis, :], weights, points_b - mean_b[:, np.newaxis, :])
+
+
+def _right_divide(a, b):
+    """
+    Returns a @ inv(b) for a batch of symmetric matrices b. pykalman uses the pseudo inverse here, but b always includes the additive noise covariance so it
+    is invertible. Solving the linear system is a lot faster than the singular value decomposition needed for the pseudo inverse.
+    """
+    return np.swapaxes(np.linalg.solve(b, np.swapaxes(a, -1, -2)), -1, -2)
+
+
+def additive_unscented_smoother(observations, track_lengths, transition_function, observed_states, initial_state_means, transition_covariance,
+                                observation_covariance=None, initial_state_covariance=None):
+    """
+    Filters and smooths a batch of tracks. Raises a numpy.linalg.LinAlgError if a covariance matrix is not positive definite for any of the tracks.
+
+    :param observations: array of batch x time steps x observed states, the values after the end of a track are ignored
+    :param track_lengths: array with the number of valid time steps for every track in the batch
+    :param transition_function: function that maps an array of batch x points x states to the next states (with the same shape)
+    :param observed_states: boolean mask of length n that selects the observed values from the state
+    :param initial_state_means: array of batch x states
+    :param transition_covariance: n x n array
+    :param observation_covariance: array of observed states x observed states, defaults to the identity matrix
+    :param initial_state_covariance: n x n array, defaults to the identity matrix
+    :return: the smoothed state means as an array of batch x time steps x states
+    """
+    observed_states = np.asarray(observed_states, dtype=bool)
+    track_lengths = np.asarray(track_lengths)
+    batch_size, number_of_time_steps, number_of_observations = observations.shape
+    number_of_states = len(observed_states)
+
+    if observation_covariance is None:
+        observation_covariance = np.eye(number_of_observations)
+    if initial_state_covariance is None:
+        initial_state_covariance = np.eye(number_of_states)
+
+    scale, weights_mean, weights_covariance = _sigma_point_weights(number_of_states)
+
+    filtered_means = np.zeros((batch_size, number_of_time_steps, number_of_states))
+    filtered_covariances = np.zeros((batch_size, number_of_time_steps, number_of_states, number_of_states))
+
+    for t in range(number_of_time_steps):
+        if t == 0:
+            predicted_points = _sigma_points(np.asarray(initial_state_means, dtype=float),
+                                             np.broadcast_to(initial_state_covariance, (batch_size, number_of_states, number_of_states)), scale)
+            predicted_mean, predicted_covariance = _moments(predicted_points, weights_mean, weights_covariance)
+        else:
+            state_points = _sigma_points(filtered_means[:, t - 1], filtered_covariances[:, t - 1], scale)
+            predicted_mean, predicted_covariance = _moments(transition_function(state_points), weights_mean, weights_covariance, transition_covariance)
+            predicted_points = _sigma_points(predicted_mean, predicted_covariance, scale)
+
+        observation_points = predicted_points[:, :, observed_states]
+        observation_mean, observation_covariance_prediction = _moments(observation_points, weights_mean, weights_covariance, observation_covariance)
+        cross_covariance = _cross_covariance(predicted_points, predicted_mean, observation_points, observation_mean, weights_mean)
+
+        gain = _right_divide(cross_covariance, observation_covariance_prediction)
+        innovation = observations[:, t] - observation_mean
+        filtered_mean = predicted_mean + np.einsum('bij,bj->bi', gain, innovation)
+        filtered_covariance = predicted_covariance - gain @ np.swapaxes(cross_covariance, -1, -2)
+
+        if t == 0:
+            filtered_means[:, t] = filtered_mean
+            filtered_covariances[:, t] = filtered_covariance
+        else:
+            # tracks that already ended keep their last filtered state, this keeps the padded time steps valid input for the next time step
+            is_active = t < track_lengths
+            filtered_means[:, t] = np.where(is_active[:, np.newaxis], filtered_mean, filtered_means[:, t - 1])
+            filtered_covariances[:, t] = np.where(is_active[:, np.newaxis, np.newaxis], filtered_covariance, filtered_covariances[:, t - 1])
+
+    smoothed_means = filtered_means.copy()
+    next_smoothed_covariance = filtered_covariances[:, -1].copy()
+
+    for t in reversed(range(number_of_time_steps - 1)):
+        state_points = _sigma_points(filtered_means[:, t], filtered_covariances[:, t], scale)
+        predicted_points = transition_function(state_points)
+        predicted_mean, predicted_covariance = _moments(predicted_points, weights_mean, weights_covariance, transition_covariance)
+        cross_covariance = _cross_covariance(state_points, filtered_means[:, t], predicted_points, predicted_mean, weights_covariance)
+
+        smoother_gain = _right_divide(cross_covariance, predicted_covariance)
+        smoothed_mean = filtered_means[:, t] + np.einsum('bij,bj->bi', smoother_gain, smoothed_means[:, t + 1] - predicted_mean)
+        smoothed_covariance = filtered_covariances[:, t] + smoother_gain @ (next_smoothed_covariance - predicted_covariance) @ np.swapaxes(smoother_gain, -1, -2)
+
+        # the backward pass of a track starts at its own last time step, before that the smoothed state equals the filtered state
+        is_active = t < track_lengths - 1
+        smoothed_means[:, t] = np.where(is_active[:, np.newaxis], smoothed_mean, filtered_means[:, t])
+        next_smoothed_covariance = np.where(is_active[:, np.newaxis, np.newaxis], smoothed_covariance, filtered_covariances[:, t])
+
+    return smoothed_means
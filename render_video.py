@@ -0,0 +1,159 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import argparse
+import os
+
+from PyQt5 import QtWidgets
+
+from dataobjects.dataset import Dataset
+from dataobjects.enums import CacheFormat
+from gui import OffscreenRenderer
+from processing.progressreporter import ConsoleProgressReporter
+from visualize import DATASET_ID_TYPES, create_visualisation_master, load_dataset
+
+"""
+Renders the visualisation of a dataset to a video file without opening a window. This is a lot faster than recording in the GUI, because frames are rendered
+as fast as possible instead of at the speed of playback. The video plays at the speed of playback in the GUI. The video looks the same as a recording made
+in the GUI, optionally the camera follows an ego vehicle, which is then highlighted.
+
+Examples (run from the main travia folder):
+    python render_video.py -s highd -d DATASET_01
+    python render_video.py -s highd -d DATASET_01 --first-frame 1000 --last-frame 1500 --ego 123 --camera-width 150 --size 1280 720 -o clip.mp4
+"""
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(description='Render the visualisation of a dataset to a video file')
+    parser.add_argument(
+        "-s",
+        "--source",
+        type=str,
+        choices=list(DATASET_ID_TYPES.keys()),
+        help="The data source, one of highd, ngsim, pneuma, exid",
+        required=True,
+    )
+    parser.add_argument(
+        "-d",
+        "--dataset",
+        type=str,
+        help="The dataset id",
+        required=True,
+    )
+    parser.add_argument(
+        "-f",
+        "--first-frame",
+        type=int,
+        help="The first frame to render, by default the video starts at the first frame of the dataset",
+        required=False,
+    )
+    parser.add_argument(
+        "-l",
+        "--last-frame",
+        type=int,
+        help="The last frame to render, by default the video ends at the last frame of the dataset",
+        required=False,
+    )
+    parser.add_argument(
+        "-e",
+        "--ego",
+        type=str,
+        help="The id of a vehicle to highlight, the camera follows this vehicle if a camera width is provided",
+        required=False,
+    )
+    parser.add_argument(
+        "--camera-width",
+        type=float,
+        help="The width of the area around the ego vehicle that is shown in meters, by default the full map is shown",
+        required=False,
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        nargs=2,
+        metavar=("WIDTH", "HEIGHT"),
+        help="The size of the video in pixels, by default this is the size of a recording in the GUI",
+        required=False,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        help="Path to the video file, use the .avi or .mp4 extension. By default the video is saved in the current folder",
+        required=False,
+    )
+    parser.add_argument(
+        "--codec",
+        type=str,
+        help="The four character code of the video codec, by default MJPG is used for .avi files and mp4v for .mp4 files",
+        required=False,
+    )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        type=str,
+        choices=["pickle", "columnar"],
+        help="The format used to cache converted data, one of pickle, columnar",
+        required=False,
+    )
+    arguments = parser.parse_args()
+
+    if arguments.cache == 'columnar':
+        Dataset.cache_format = CacheFormat.COLUMNAR
+    elif arguments.cache == 'pickle':
+        Dataset.cache_format = CacheFormat.PICKLE
+
+    try:
+        dataset_id = DATASET_ID_TYPES[arguments.source][arguments.dataset]
+    except KeyError:
+        parser.error('%s is not a valid %s dataset id' % (arguments.dataset, arguments.source))
+
+    if arguments.codec and len(arguments.codec) != 4:
+        parser.error('the codec should be a four character code, like MJPG')
+
+    return dataset_id, arguments
+
+
+def get_default_file_name(dataset_id, first_frame, last_frame, ego_vehicle_id):
+    file_name = str(dataset_id)
+    if first_frame is not None or last_frame is not None:
+        file_name += '-frames-%s-%s' % ('start' if first_frame is None else first_frame, 'end' if last_frame is None else last_frame)
+    if ego_vehicle_id is not None:
+        file_name += '-ego-%s' % ego_vehicle_id
+
+    # remove illegal characters from filename
+    return file_name.replace(':', '-').replace('/', '-').replace('\\', '-') + '.avi'
+
+
+if __name__ == '__main__':
+    dataset_id, arguments = get_arguments()
+    output_path = arguments.output or get_default_file_name(dataset_id, arguments.first_frame, arguments.last_frame, arguments.ego)
+    codec = arguments.codec or ('mp4v' if output_path.lower().endswith('.mp4') else 'MJPG')
+
+    # no window is shown, so no display is needed
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QtWidgets.QApplication([])
+
+    progress_reporter = ConsoleProgressReporter()
+    data = load_dataset(dataset_id, progress_reporter)
+
+    renderer = OffscreenRenderer(data, frame_size=arguments.size, ego_vehicle_id=arguments.ego, camera_width=arguments.camera_width)
+    renderer.register_visualisation_master(create_visualisation_master(data, renderer))
+    number_of_frames = renderer.render_video(output_path, arguments.first_frame, arguments.last_frame, fourcc=codec, progress_reporter=progress_reporter)
+
+    print('Saved %d frames to %s' % (number_of_frames, output_path))
@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dataobjects import HighDDataset, AnnotationType
+from dataobjects.enums import HighDDatasetID
+from processing import automaticannotationhighd
+
+
+class TestAutomaticAnnotationHighD(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = HighDDataset(HighDDatasetID.DATASET_01)
+        self.dataset.recording_id = 1
+        self.dataset.track_meta_data = pd.DataFrame({'id': [1, 2],
+                                                     'class': ['Car', 'Truck'],
+                                                     'drivingDirection': [2, 2]}).set_index('id')
+
+        # vehicle 1 changes from lane 3 to 2 and back, with a gap in its track at frame 8, vehicle 2 drives in lane 3
+        car_frames = np.array([0, 1, 2, 3, 4, 5, 6, 7, 9, 10, 11, 12])
+        car_lanes = np.array([3, 3, 3, 2, 2, 2, 2, 2, 2, 3, 3, 3])
+        car_y_velocity = np.array([0., 0., 1., 1., 0., 0., 0., 1., 1., 1., 0., 0.])
+        truck_frames = np.arange(0, 13)
+
+        self.dataset.track_data = pd.DataFrame({'id': np.concatenate([np.full(12, 1), np.full(13, 2)]),
+                                                'frame': np.concatenate([car_frames, truck_frames]),
+                                                'laneId': np.concatenate([car_lanes, np.full(13, 3)]),
+                                                'yVelocity': np.concatenate([car_y_velocity, np.zeros(13)]),
+                                                'xAcceleration': np.zeros(25),
+                                                'precedingId': np.concatenate([[2, 2, 2, 0, 0, 0, 0, 0, 0, 2, 2, 2], np.zeros(13, dtype=int)])})
+
+    def _annotations(self, annotation_type):
+        return [(a.ego_vehicle_id, a.first_frame, a.last_frame) for a in self.dataset.annotation_data if a.annotation_type is annotation_type]
+
+    def test_car_behind_truck(self):
+        automaticannotationhighd.detect_all_cars_stuck_behind_a_truck(self.dataset)
+        self.assertListEqual(self._annotations(AnnotationType.CAR_BEHIND_TRUCK), [(1, 0, 2), (1, 10, 12)])
+
+    def test_lane_changes(self):
+        automaticannotationhighd.detect_all_lane_changes(self.dataset)
+        self.assertListEqual(self._annotations(AnnotationType.LANE_CHANGE), [(1, 2, 3), (1, 9, 10)])
+
+    def test_complete_overtake(self):
+        automaticannotationhighd.detect_all_complete_overtakes(self.dataset)
+        self.assertListEqual(self._annotations(AnnotationType.COMPLETE_OVERTAKE), [(1, 1, 11)])
@@ -0,0 +1,115 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dataobjects import HighDDataset, Annotation, AnnotationType
+from dataobjects.enums import HighDDatasetID
+from processing.columnarcache import save_columnar_cache, load_columnar_cache, columnar_cache_exists, is_memory_mapped, can_memory_map_columnar_cache
+from processing.columnarcache import CACHE_FORMAT_VERSION, HEADER_FILE_NAME
+from processing.encryptiontools import save_encrypted_pickle, load_encrypted_pickle
+
+
+class TestColumnarCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = HighDDataset(HighDDatasetID.DATASET_05)
+        self.dataset.recording_id = 5
+        self.dataset.start_time = datetime.datetime(2017, 1, 1, 8, 30)
+        self.dataset.upper_lane_markings = [8.5, 12.5]
+
+        self.dataset.track_meta_data = pd.DataFrame({'id': [1, 2, 3],
+                                                     'class': ['Car', 'Truck', 'Car'],
+                                                     'width': [4.5, 15.0, 4.1]}).set_index('id')
+        self.dataset.track_data = pd.DataFrame({'frame': np.arange(1000) % 100,
+                                                'id': np.arange(1000) // 400 + 1,
+                                                'x': np.random.uniform(0, 400, 1000)})
+
+        annotation = Annotation(self.dataset.dataset_id)
+        annotation.first_frame = 10
+        annotation.last_frame = 20
+        annotation.annotation_type = AnnotationType.LANE_CHANGE
+        self.dataset.annotation_data.append(annotation)
+
+    def _assert_round_trip(self, encrypt):
+        with tempfile.TemporaryDirectory() as folder:
+            cache_path = os.path.join(folder, '05_cache')
+            save_columnar_cache(cache_path, self.dataset, encrypt=encrypt)
+            self.assertTrue(columnar_cache_exists(cache_path))
+
+            loaded_dataset = load_columnar_cache(cache_path)
+
+        self.assertIsInstance(loaded_dataset, HighDDataset)
+        self.assertEqual(loaded_dataset.dataset_id, HighDDatasetID.DATASET_05)
+        self.assertEqual(loaded_dataset.start_time, self.dataset.start_time)
+        self.assertListEqual(loaded_dataset.upper_lane_markings, self.dataset.upper_lane_markings)
+        self.assertEqual(loaded_dataset.annotation_data[0].annotation_type, AnnotationType.LANE_CHANGE)
+
+        pd.testing.assert_frame_equal(loaded_dataset.track_data, self.dataset.track_data)
+        self.assertListEqual(loaded_dataset.track_meta_data.index.tolist(), [1, 2, 3])
+        self.assertEqual(loaded_dataset.track_meta_data.index.name, 'id')
+        self.assertEqual(loaded_dataset.track_meta_data.at[2, 'class'], 'Truck')
+
+    def test_round_trip(self):
+        self._assert_round_trip(encrypt=False)
+
+    def test_encrypted_round_trip(self):
+        self._assert_round_trip(encrypt=True)
+
+    def test_missing_values_round_trip(self):
+        self.dataset.track_meta_data['drivingDirection'] = ['left', np.nan, None]
+        self.dataset.track_meta_data['firstSeen'] = pd.to_datetime(['2017-01-01 08:30', None, '2017-01-01 08:31']).tz_localize('Europe/Amsterdam')
+
+        for encrypt in (False, True):
+            with tempfile.TemporaryDirectory() as folder:
+                cache_path = os.path.join(folder, '05_cache')
+                save_columnar_cache(cache_path, self.dataset, encrypt=encrypt)
+                loaded_dataset = load_columnar_cache(cache_path)
+
+            loaded_meta_data = loaded_dataset.track_meta_data
+            self.assertEqual(loaded_meta_data.at[1, 'drivingDirection'], 'left')
+            self.assertListEqual(loaded_meta_data['drivingDirection'].isna().tolist(), [False, True, True])
+            pd.testing.assert_series_equal(loaded_meta_data['firstSeen'], self.dataset.track_meta_data['firstSeen'])
+
+    def test_missing_cache(self):
+        with tempfile.TemporaryDirectory() as folder:
+            self.assertIsNone(load_columnar_cache(os.path.join(folder, 'does_not_exist')))
+            self.assertFalse(can_memory_map_columnar_cache(os.path.join(folder, 'does_not_exist')))
+
+    def test_old_format_is_ignored(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cache_path = os.path.join(folder, '05_cache')
+            save_columnar_cache(cache_path, self.dataset)
+
+            header_path = os.path.join(cache_path, HEADER_FILE_NAME)
+            header = load_encrypted_pickle(header_path)
+            header['format_version'] = CACHE_FORMAT_VERSION - 1
+            save_encrypted_pickle(header_path, header)
+
+            self.assertFalse(columnar_cache_exists(cache_path))
+            self.assertIsNone(load_columnar_cache(cache_path))
+
+    def test_can_memory_map(self):
+        with tempfile.TemporaryDirectory() as folder:
+            save_columnar_cache(os.path.join(folder, 'plain'), self.dataset, encrypt=False)
+            save_columnar_cache(os.path.join(folder, 'encrypted'), self.dataset, encrypt=True)
+
+            self.assertTrue(can_memory_map_columnar_cache(os.path.join(folder, 'plain')))
+            self.assertFalse(can_memory_map_columnar_cache(os.path.join(folder, 'encrypted')))
+
+    def test_memory_mapped_round_trip(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cache_path = os.path.join(folder, '05_cache')
+            save_columnar_cache(cache_path, self.dataset)
+
+            loaded_dataset = load_columnar_cache(cache_path, memory_map=True)
+            self.assertTrue(is_memory_mapped(loaded_dataset.track_data['x'].to_numpy()))
+            self.assertTrue(loaded_dataset.track_data.equals(self.dataset.track_data))
+
+            # saving a memory mapped dataset to its own cache should not invalidate the memory maps
+            save_columnar_cache(cache_path, loaded_dataset)
+            self.assertTrue(loaded_dataset.track_data.equals(self.dataset.track_data))
+            del loaded_dataset
@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dataobjects import NGSimDataset, AnnotationType
+from dataobjects.enums import NGSimDatasetID
+from processing.detectorengine import EventDetector, DetectorEngine
+
+
+class HighSpeedDetector(EventDetector):
+    columns = ['v_Vel']
+    annotation_type = AnnotationType.MANUAL
+
+    def detect(self, track):
+        run_starts, run_ends = track.runs(track['v_Vel'] > 20.)
+        return [(track.frames[first_row], track.frames[last_row], 'fast') for first_row, last_row in zip(run_starts, run_ends)]
+
+
+class TrackLengthDetector(EventDetector):
+    columns = ['v_Vel', 'v_Acc']
+    annotation_type = AnnotationType.DECELERATION
+
+    def __init__(self):
+        self.number_of_visits = 0
+
+    def wants_track(self, vehicle_id):
+        return vehicle_id != 2
+
+    def detect(self, track):
+        self.number_of_visits += 1
+        return [(track.frames[0], track.frames[-1], str(len(track)))]
+
+
+class TestDetectorEngine(unittest.TestCase):
+
+    def setUp(self):
+        # two shuffled NGSim tracks, vehicle 1 has a gap at frame 13
+        track_data = pd.DataFrame({'Vehicle_ID': [1] * 9 + [2] * 5,
+                                   'Frame_ID': [10, 11, 12, 14, 15, 16, 17, 18, 19, 30, 31, 32, 33, 34],
+                                   'v_Vel': [25., 25., 25., 25., 10., 10., 25., 25., 10., 10., 21., 21., 10., 10.],
+                                   'v_Acc': 0.})
+        self.dataset = NGSimDataset(track_data.sample(frac=1., random_state=1), NGSimDatasetID.I80_0400_0415)
+
+    def test_single_pass_with_multiple_detectors(self):
+        track_length_detector = TrackLengthDetector()
+        engine = DetectorEngine([HighSpeedDetector(), track_length_detector])
+        annotations = engine.run(self.dataset)
+
+        self.assertListEqual([(a.ego_vehicle_id, a.first_frame, a.last_frame, a.annotation_type, a.notes) for a in annotations],
+                             [(1, 10, 12, AnnotationType.MANUAL, 'fast'),
+                              (1, 14, 14, AnnotationType.MANUAL, 'fast'),
+                              (1, 17, 18, AnnotationType.MANUAL, 'fast'),
+                              (1, 10, 19, AnnotationType.DECELERATION, '9'),
+                              (2, 31, 32, AnnotationType.MANUAL, 'fast')])
+        self.assertEqual(track_length_detector.number_of_visits, 1)
+        self.assertListEqual(engine.get_required_columns(self.dataset.dataset_id.data_source), ['Vehicle_ID', 'Frame_ID', 'v_Vel', 'v_Acc'])
+        self.assertSetEqual(set(engine.timing.keys()), {'HighSpeedDetector', 'TrackLengthDetector'})
+        self.assertListEqual(self.dataset.annotation_data, [])
+
+        engine.annotate(self.dataset)
+        self.assertEqual(len(self.dataset.annotation_data), 5)
+
+    def test_sorted_tracks_are_not_copied(self):
+        sorted_dataset = NGSimDataset(self.dataset.track_data.sort_values(['Vehicle_ID', 'Frame_ID']), NGSimDatasetID.I80_0400_0415)
+        velocities = sorted_dataset.track_data['v_Vel'].to_numpy()
+        tracks = []
+
+        class TrackCollector(EventDetector):
+            columns = ['v_Vel']
+
+            def detect(self, track):
+                tracks.append(track)
+                return []
+
+        DetectorEngine([TrackCollector()]).run(sorted_dataset)
+
+        self.assertListEqual([track.vehicle_id for track in tracks], [1, 2])
+        self.assertListEqual(tracks[1].frames.tolist(), [30, 31, 32, 33, 34])
+        self.assertTrue(all(np.shares_memory(track['v_Vel'], velocities) for track in tracks))
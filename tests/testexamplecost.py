@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from processing.examplecost import cost_function, cost_grid, IncrementalCostGrid
+
+
+class TestExampleCost(unittest.TestCase):
+
+    def test_grid_equals_cost_function(self):
+        rng = np.random.default_rng(0)
+        vehicle_positions = np.column_stack([rng.uniform(0., 40., 15), rng.uniform(0., 20., 15)])
+        lane_centers = [3., 7., 13., 17.]
+        x_coordinates = np.arange(200) / 5
+        y_coordinates = np.arange(100) / 5
+
+        costs = cost_grid(x_coordinates, y_coordinates, vehicle_positions, lane_centers)
+        expected = np.array([[cost_function(np.array([x, y]), vehicle_positions, np.array(lane_centers)) for x in x_coordinates] for y in y_coordinates])
+
+        self.assertTupleEqual(costs.shape, (100, 200))
+        np.testing.assert_allclose(costs, expected, rtol=0., atol=1e-12)
+
+    def test_grid_without_vehicles(self):
+        costs = cost_grid(np.arange(3.), np.arange(2.), np.array([]), [0.])
+        np.testing.assert_allclose(costs, -np.exp(-0.8 * np.arange(2.) ** 2)[:, np.newaxis] * np.ones(3))
+
+    def test_incremental_grid(self):
+        x_coordinates = np.arange(300) / 5
+        y_coordinates = np.arange(100) / 5
+        lane_centers = [3., 7., 13., 17.]
+        positions = {1: (10., 3.), 2: (30., 7.), 3: (50., 13.)}
+
+        cost_grid_with_updates = IncrementalCostGrid(x_coordinates, y_coordinates, lane_centers)
+        cost_grid_with_updates.update(positions)
+
+        for step in range(10):
+            positions = {vehicle_id: (x + 0.7, y + 0.1) for vehicle_id, (x, y) in positions.items() if vehicle_id != 2 or step < 5}
+            positions[4] = (40., 17.)
+            cost_grid_with_updates.update(positions)
+
+        expected = cost_grid(x_coordinates, y_coordinates, np.array(list(positions.values())), lane_centers)
+        np.testing.assert_allclose(cost_grid_with_updates.get_costs(), expected, rtol=0., atol=1e-5)
+
+    def test_value_range(self):
+        x_coordinates = np.arange(300) / 5
+        y_coordinates = np.arange(100) / 5
+        cost_grid_with_updates = IncrementalCostGrid(x_coordinates, y_coordinates, [3., 7., 13., 17.])
+        value_range = cost_grid_with_updates.get_value_range()
+
+        self.assertAlmostEqual(value_range[0], cost_grid_with_updates.get_costs().min())
+
+        # the value range does not depend on the vehicles, separate vehicles stay within it
+        cost_grid_with_updates.update({1: (10., 3.), 2: (30., 9.), 3: (50., 20.)})
+        costs = cost_grid_with_updates.get_costs()
+        self.assertTupleEqual(cost_grid_with_updates.get_value_range(), value_range)
+        self.assertGreaterEqual(costs.min(), value_range[0] - 1e-9)
+        self.assertLessEqual(costs.max(), value_range[1])
+
+    def test_changed_windows(self):
+        x_coordinates = np.arange(300) / 5
+        y_coordinates = np.arange(100) / 5
+        cost_grid_with_updates = IncrementalCostGrid(x_coordinates, y_coordinates, [3., 7., 13., 17.])
+        cost_grid_with_updates.update({1: (10., 3.), 2: (30., 7.), 3: (50., 13.)})
+        previous_costs = cost_grid_with_updates.get_costs().copy()
+
+        # vehicle 1 moves, vehicle 2 is removed and vehicle 3 stands still
+        changed_windows = cost_grid_with_updates.update({1: (12., 3.5), 3: (50., 13.)})
+        self.assertEqual(len(changed_windows), 2)
+
+        is_outside_windows = np.ones(previous_costs.shape, dtype=bool)
+        for rows, columns in changed_windows:
+            is_outside_windows[rows, columns] = False
+        np.testing.assert_array_equal(cost_grid_with_updates.get_costs()[is_outside_windows], previous_costs[is_outside_windows])
+        self.assertFalse(np.allclose(cost_grid_with_updates.get_costs(), previous_costs))
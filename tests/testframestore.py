@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from processing.frameindex import frame_keys_from_time
+from visualisation.framestore import FrameStore
+
+
+class TestFrameStore(unittest.TestCase):
+
+    def setUp(self):
+        frames = np.array([3, 1, 2, 1, 3, 3, 5])
+        self.track_data = pd.DataFrame({'frame': frames,
+                                        'id': [1, 1, 1, 2, 2, 3, 3],
+                                        'x': np.arange(7, dtype=float)},
+                                       index=np.arange(10, 17))
+        self.frame_store = FrameStore(self.track_data, frames, {'vehicle_id': 'id', 'x': 'x', 'not_in_data': 'missing'})
+
+    def test_frame_batches(self):
+        for frame in [1, 2, 3, 5]:
+            expected = self.track_data.loc[self.track_data.frame == frame, :]
+            batch = self.frame_store.get_frame(frame)
+
+            self.assertListEqual(batch['vehicle_id'].tolist(), expected['id'].tolist())
+            self.assertListEqual(batch['x'].tolist(), expected['x'].tolist())
+            self.assertListEqual(self.frame_store.get_row_labels(frame).tolist(), expected.index.tolist())
+
+    def test_missing_frame_and_column(self):
+        self.assertEqual(len(self.frame_store.get_frame(4)['vehicle_id']), 0)
+        self.assertEqual(len(self.frame_store.get_frame_as_lists(100)['x']), 0)
+        self.assertNotIn('not_in_data', self.frame_store)
+        self.assertIn('x', self.frame_store)
+
+    def test_frame_keys_from_time(self):
+        time_stamps = np.arange(0, 100) * 0.04
+        keys = frame_keys_from_time(time_stamps, 25.)
+        self.assertListEqual(keys.tolist(), list(range(100)))
@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from processing.kalmansmoothing import smooth_ngsim_data
+
+
+class TestKalmanSmoothing(unittest.TestCase):
+
+    def setUp(self):
+        random_generator = np.random.default_rng(0)
+        tracks = []
+
+        for vehicle_id, number_of_frames in [(1, 40), (2, 3), (3, 60)]:
+            frames = np.arange(number_of_frames)
+            tracks.append(pd.DataFrame({'Vehicle_ID': vehicle_id,
+                                        'Frame_ID': frames + 10 * vehicle_id,
+                                        'Global_X': frames * 1.5 + random_generator.normal(0., 0.1, number_of_frames),
+                                        'Global_Y': vehicle_id * 3.5 + random_generator.normal(0., 0.1, number_of_frames),
+                                        'v_Vel': 15. + random_generator.normal(0., 0.2, number_of_frames),
+                                        'v_Acc': random_generator.normal(0., 0.1, number_of_frames),
+                                        'v_Length': 4.5}))
+
+        # shuffle the rows, the tracks should be sorted on frame before smoothing
+        self.data = pd.concat(tracks, ignore_index=True).sample(frac=1., random_state=1)
+
+    def test_parallel_and_serial_smoothing_are_equal(self):
+        progress = []
+        serial_result = smooth_ngsim_data(self.data.copy(), progress_callback=lambda done, total: progress.append((done, total)), number_of_workers=1)
+        parallel_result = smooth_ngsim_data(self.data.copy(), number_of_workers=2)
+
+        for column in ['Smoothed_Global_X', 'Smoothed_Global_Y', 'Smoothed_Heading', 'Smoothed_Vel']:
+            np.testing.assert_allclose(serial_result[column].to_numpy(), parallel_result[column].to_numpy())
+
+        self.assertEqual(progress[-1], (2, 2))
+
+    def test_short_tracks_are_skipped(self):
+        result = smooth_ngsim_data(self.data.copy(), number_of_workers=1)
+
+        self.assertTrue(result.loc[result['Vehicle_ID'] == 2, 'Smoothed_Global_X'].isnull().all())
+        self.assertFalse(result.loc[result['Vehicle_ID'] != 2, 'Smoothed_Global_X'].isnull().any())
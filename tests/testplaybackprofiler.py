@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from visualisation.playbackprofiler import PlaybackProfiler, STAGES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+
+class TestPlaybackProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('visualisation.playbackprofiler.time.perf_counter', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.profiler = PlaybackProfiler(capacity=4)
+
+    def _time_step(self, frame_number, timer_interval=0.04):
+        self.profiler.start_time_step(frame_number, timer_interval)
+        self.clock.now += 0.002
+        self.profiler.lap('data_fetch')
+        self.clock.now += 0.003
+        self.profiler.lap('vehicle_update')
+        self.clock.now += 0.005
+        self.profiler.lap('gui_update')
+        self.profiler.add_render_duration(0.012)
+        self.clock.now += 0.03
+
+    def test_stage_durations(self):
+        self._time_step(1)
+
+        np.testing.assert_allclose(self.profiler.durations[0, :4], [0.002, 0.003, 0.005, 0.012])
+        self.assertTrue(np.isnan(self.profiler.durations[0, STAGES.index('encode')]))
+        self.assertEqual(set(self.profiler.get_summary().keys()), {'data_fetch', 'vehicle_update', 'gui_update', 'render'})
+
+    def test_only_first_render_is_stored(self):
+        # paints before the first time step are ignored
+        self.profiler.add_render_duration(0.5)
+        self._time_step(1)
+
+        # a repaint of the same frame, e.g. when the HUD text is refreshed
+        self.profiler.add_render_duration(0.1)
+        self.assertAlmostEqual(self.profiler.durations[0, STAGES.index('render')], 0.012)
+
+        self._time_step(2)
+        self.assertAlmostEqual(self.profiler.durations[1, STAGES.index('render')], 0.012)
+
+    def test_ring_buffer_keeps_most_recent_time_steps(self):
+        for frame_number in range(1, 7):
+            self._time_step(frame_number)
+
+        self.assertEqual(self.profiler.number_of_time_steps, 6)
+        self.assertEqual(self.profiler.frame_numbers[self.profiler._get_ordered_rows()].tolist(), [3, 4, 5, 6])
+        self.assertAlmostEqual(self.profiler.get_effective_frame_rate(window=1.), 25.)
+
+    def test_missed_ticks(self):
+        self._time_step(1)
+        self.clock.now += 0.08
+        self._time_step(2)
+
+        # a time step without timer (e.g. a single frame step) does not count as a missed tick
+        self.clock.now += 1.
+        self._time_step(3, timer_interval=None)
+        self._time_step(4)
+
+        self.assertEqual(self.profiler.number_of_missed_ticks, 2)
+
+    def test_save(self):
+        for frame_number in range(1, 4):
+            self._time_step(frame_number)
+
+        with tempfile.TemporaryDirectory() as folder:
+            self.profiler.save(os.path.join(folder, 'profile.csv'))
+            self.profiler.save(os.path.join(folder, 'profile.json'))
+
+            with open(os.path.join(folder, 'profile.csv')) as profile_file:
+                rows = list(csv.DictReader(profile_file))
+            with open(os.path.join(folder, 'profile.json')) as profile_file:
+                profile = json.load(profile_file)
+
+        self.assertEqual([row['frame_number'] for row in rows], ['1', '2', '3'])
+        self.assertEqual(rows[0]['encode_ms'], '')
+        self.assertAlmostEqual(float(rows[1]['render_ms']), 12.)
+        self.assertEqual(len(profile['time_steps']), 3)
+        self.assertAlmostEqual(profile['summary']['gui_update']['mean_ms'], 5.)
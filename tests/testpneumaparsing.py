@@ -0,0 +1,33 @@
+import os
+import tempfile
+import unittest
+
+from pyproj import CRS, Transformer
+
+from dataobjects import PNeumaDataset
+from processing.progressreporter import ProgressReporter
+
+
+class TestPNeumaParsing(unittest.TestCase):
+
+    def test_parse_pneuma_csv(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, 'pneuma.csv')
+            with open(file_path, 'w') as file:
+                file.write('track_id; type; traveled_d; avg_speed; lat; lon; speed; lon_acc; lat_acc; time\n')
+                file.write('1; Car; 10.50; 9.5; 37.98; 23.73; 10.0; 0.1; -0.1; 0.00; 37.99; 23.74; 11.0; 0.2; -0.2; 0.04; \n')
+                # an incomplete time step at the end of a line is ignored
+                file.write('2; Taxi; 3.00; 5.0; 37.97; 23.72; 5.0; 0.0; 0.0; 0.00; 37.98; 23.73; \n')
+                file.write('3; Bus; 0.00; 0.0; \n')
+
+            vehicles, tracks = PNeumaDataset._parse_pneuma_csv(file_path, ProgressReporter())
+
+        self.assertListEqual(vehicles['track_id'].tolist(), [1, 2, 3])
+        self.assertListEqual(vehicles['type'].tolist(), [' Car', ' Taxi', ' Bus'])
+        self.assertListEqual(list(tracks.columns), ['lat', 'lon', 'speed', 'lon_acc', 'lat_acc', 'time', 'vehicle_id', 'global_x', 'global_y'])
+        self.assertListEqual(tracks['vehicle_id'].tolist(), [1, 1, 2])
+        self.assertListEqual(tracks['speed'].tolist(), [10.0, 11.0, 5.0])
+        self.assertListEqual(tracks['time'].tolist(), [0.0, 0.04, 0.0])
+
+        transformer = Transformer.from_crs(CRS.from_epsg(4326), CRS.from_epsg(3857))
+        self.assertTupleEqual((tracks['global_x'].iat[1], tracks['global_y'].iat[1]), transformer.transform(37.99, 23.74))
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from PyQt5 import QtGui
+
+from gui.tiledmap import TiledMapItem, build_tile_pyramid, get_tile_folder, is_tile_pyramid_up_to_date, load_tile_pyramid
+
+
+class TestTiledMap(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.image_path = os.path.join(self.folder.name, 'map.tif')
+
+        image = QtGui.QImage(1000, 300, QtGui.QImage.Format_RGB32)
+        image.fill(QtGui.QColor(40, 80, 120))
+        image.save(self.image_path, 'TIFF')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_pyramid_levels(self):
+        header = build_tile_pyramid(self.image_path, tile_size=128)
+
+        self.assertEqual(header['level_sizes'], [[1000, 300], [500, 150], [250, 75], [125, 38]])
+        self.assertTrue(is_tile_pyramid_up_to_date(self.image_path))
+
+        tile_folder = get_tile_folder(self.image_path)
+        self.assertEqual(len(os.listdir(os.path.join(tile_folder, 'level_00'))), 8 * 3)
+        self.assertEqual(len(os.listdir(os.path.join(tile_folder, 'level_03'))), 1)
+
+        edge_tile = QtGui.QImage(os.path.join(tile_folder, 'level_00', 'tile_0002_0007.png'))
+        self.assertEqual((edge_tile.width(), edge_tile.height()), (1000 - 7 * 128, 300 - 2 * 128))
+
+    def test_changed_map_is_out_of_date(self):
+        build_tile_pyramid(self.image_path, tile_size=128)
+
+        image = QtGui.QImage(400, 200, QtGui.QImage.Format_RGB32)
+        image.fill(QtGui.QColor(0, 0, 0))
+        image.save(self.image_path, 'TIFF')
+
+        self.assertFalse(is_tile_pyramid_up_to_date(self.image_path))
+
+        # the out of date pyramid is replaced, no temporary folders are left behind
+        header = build_tile_pyramid(self.image_path, tile_size=128)
+        self.assertEqual(header['level_sizes'], [[400, 200], [200, 100], [100, 50]])
+        self.assertTrue(is_tile_pyramid_up_to_date(self.image_path))
+        self.assertListEqual(sorted(os.listdir(self.folder.name)), ['map.tif', 'map_tiles'])
+
+    def test_tiles_can_not_be_written(self):
+        with mock.patch.object(QtGui.QImage, 'save', return_value=False):
+            self.assertIsNone(load_tile_pyramid(self.image_path))
+            self.assertIsNone(TiledMapItem.load(self.image_path))
+
+        self.assertListEqual(os.listdir(self.folder.name), ['map.tif'])
+
+    def test_select_level(self):
+        item = TiledMapItem(get_tile_folder(self.image_path), build_tile_pyramid(self.image_path, tile_size=128))
+
+        self.assertEqual(item.select_level(2.), 0)
+        self.assertEqual(item.select_level(1.), 0)
+        self.assertEqual(item.select_level(0.6), 0)
+        self.assertEqual(item.select_level(0.5), 1)
+        self.assertEqual(item.select_level(0.25), 2)
+        self.assertEqual(item.select_level(0.01), 3)
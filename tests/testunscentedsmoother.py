@@ -0,0 +1,35 @@
+import unittest
+
+import numpy as np
+import pykalman
+
+from processing.unscentedsmoother import additive_unscented_smoother
+
+
+class TestUnscentedSmoother(unittest.TestCase):
+
+    @staticmethod
+    def _transition_function(state):
+        # a simple non-linear model, indexes the states on the first axis such that it works both for pykalman and for batches of points
+        new_state = state.copy()
+        new_state[0] += np.cos(state[2]) * state[1] * 0.1
+        new_state[2] += 0.01 * np.sin(state[0])
+        return new_state
+
+    def test_equal_to_pykalman(self):
+        random_generator = np.random.default_rng(0)
+        observed_states = np.array([True, False, True])
+        track_lengths = np.array([30, 12, 25])
+
+        observations = random_generator.normal(0., 1., (3, 30, 2)) + np.linspace(0., 3., 30)[np.newaxis, :, np.newaxis]
+        initial_state_means = random_generator.normal(0., 1., (3, 3))
+
+        smoothed_states = additive_unscented_smoother(observations, track_lengths,
+                                                      lambda points: np.moveaxis(self._transition_function(np.moveaxis(points, -1, 0)), 0, -1),
+                                                      observed_states, initial_state_means, np.eye(3) * 0.01)
+
+        for index, track_length in enumerate(track_lengths):
+            ukf = pykalman.AdditiveUnscentedKalmanFilter(self._transition_function, lambda state: state[observed_states], n_dim_state=3, n_dim_obs=2,
+                                                         transition_covariance=np.eye(3) * 0.01, initial_state_mean=initial_state_means[index])
+            expected_states = ukf.smooth(observations[index, :track_length])[0]
+            np.testing.assert_allclose(smoothed_states[index, :track_length], expected_states, rtol=1e-8, atol=1e-8)
@@ -0,0 +1,74 @@
+import os
+import unittest
+
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from dataobjects.enums import VehicleType
+from gui.vehiclebatch import VehicleBatchItem
+
+
+class BatchVehicle:
+    def __init__(self, vehicle_id, position, heading, length=4., width=2.):
+        self.id = vehicle_id
+        self.current_position = np.array(position, dtype=float)
+        self.current_heading = heading
+        self.length = length
+        self.width = width
+        self.vehicle_type = VehicleType.CAR
+
+
+class TestVehicleBatchItem(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        cls.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    def setUp(self):
+        self.batch = VehicleBatchItem(main_gui=None)
+        self.vehicles = [BatchVehicle(1, [10., 5.], 0.), BatchVehicle(2, [20., 20.], np.pi / 2), BatchVehicle(3, [0., 0.], 0.)]
+        for vehicle in self.vehicles:
+            self.batch.add_vehicle(vehicle, str(vehicle.id))
+        self.batch.update_positions()
+
+    def test_corners_match_graphics_object_rotation(self):
+        # the graphics objects are rotated by -degrees(heading), this transform is the reference
+        for index, vehicle in enumerate(self.vehicles):
+            transform = QtGui.QTransform()
+            transform.translate(*vehicle.current_position)
+            transform.rotate(-np.degrees(vehicle.current_heading))
+            polygon = transform.map(QtGui.QPolygonF(QtCore.QRectF(-vehicle.length, -vehicle.width / 2, vehicle.length, vehicle.width)))
+
+            expected_corners = [[polygon.at(corner).x(), polygon.at(corner).y()] for corner in range(4)]
+            np.testing.assert_allclose(self.batch.corners[index], expected_corners, atol=1e-9)
+
+    def test_vehicle_at(self):
+        self.assertIs(self.batch.vehicle_at(QtCore.QPointF(8., 5.5)), self.vehicles[0])
+        self.assertIs(self.batch.vehicle_at(QtCore.QPointF(20.5, 22.)), self.vehicles[1])
+        self.assertIsNone(self.batch.vehicle_at(QtCore.QPointF(11., 5.)))
+
+        # the vehicle without a position is not drawn and can not be selected
+        self.assertIsNone(self.batch.vehicle_at(QtCore.QPointF(-1., 0.)))
+
+    def test_number_of_moved_vehicles(self):
+        # the vehicle without a position is not drawn and does not count as moved
+        self.assertEqual(self.batch.update_positions(), 0)
+
+        self.vehicles[1].current_heading = 0.
+        self.vehicles[2].current_position = np.array([30., 2.])
+        self.assertEqual(self.batch.update_positions(), 2)
+
+        self.batch.remove_vehicle('1')
+        new_vehicle = BatchVehicle(4, [40., 5.], 0.)
+        self.batch.add_vehicle(new_vehicle, '4')
+        self.assertEqual(self.batch.update_positions(), 1)
+
+    def test_remove_vehicle(self):
+        self.batch.set_highlight('2', True)
+        self.batch.remove_vehicle('2')
+        self.batch.update_positions()
+
+        self.assertEqual(self.batch.frame_vehicle_ids, ['1', '3'])
+        self.assertEqual(self.batch.highlighted_vehicle_ids, set())
+        self.assertIsNone(self.batch.vehicle_at(QtCore.QPointF(20.5, 22.)))
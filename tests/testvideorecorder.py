@@ -0,0 +1,80 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import cv2
+import numpy as np
+from PyQt5 import QtGui
+
+from visualisation.videorecorder import VideoRecorder
+
+
+class BlockingVideoRecorder(VideoRecorder):
+    QUEUE_SIZE = 1
+
+    def __init__(self, *args, **kwargs):
+        self.can_write = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def _convert_image(self, image):
+        self.can_write.wait()
+        return super()._convert_image(image)
+
+
+class TestVideoRecorder(unittest.TestCase):
+
+    @staticmethod
+    def _create_image(gray_value):
+        image = QtGui.QImage(64, 48, QtGui.QImage.Format_ARGB32_Premultiplied)
+        image.fill(QtGui.QColor(gray_value, gray_value, gray_value))
+        return image
+
+    @staticmethod
+    def _read_gray_values(file_path):
+        capture = cv2.VideoCapture(file_path)
+        gray_values = []
+        success, frame = capture.read()
+        while success:
+            gray_values.append(int(np.round(frame.mean())))
+            success, frame = capture.read()
+        capture.release()
+        return gray_values
+
+    def test_all_frames_are_written(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, 'video.avi')
+            recorder = VideoRecorder(file_path, 25, (64, 48))
+            for gray_value in range(0, 250, 25):
+                recorder.add_frame(self._create_image(gray_value))
+            recorder.stop()
+
+            self.assertEqual(recorder.number_of_frames_written, 10)
+            self.assertEqual(recorder.number_of_dropped_frames, 0)
+            gray_values = self._read_gray_values(file_path)
+
+        self.assertEqual(len(gray_values), 10)
+        np.testing.assert_allclose(gray_values, np.arange(0, 250, 25), atol=3)
+
+    def test_dropped_frames_are_repeated(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, 'video.avi')
+            recorder = BlockingVideoRecorder(file_path, 25, (64, 48), maximum_wait=0.)
+            for gray_value in range(0, 250, 25):
+                recorder.add_frame(self._create_image(gray_value))
+            recorder.can_write.set()
+            recorder.stop()
+
+            self.assertGreater(recorder.number_of_dropped_frames, 0)
+            self.assertEqual(recorder.number_of_frames_written, 10)
+            gray_values = self._read_gray_values(file_path)
+
+        self.assertEqual(len(gray_values), 10)
+        self.assertEqual(gray_values[0], 0)
+        self.assertTrue(np.all(np.diff(gray_values) >= 0))
+
+    def test_wrong_frame_size(self):
+        with tempfile.TemporaryDirectory() as folder:
+            recorder = VideoRecorder(os.path.join(folder, 'video.avi'), 25, (32, 32))
+            recorder.add_frame(self._create_image(0))
+            self.assertRaises(ValueError, recorder.stop)
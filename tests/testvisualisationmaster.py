@@ -0,0 +1,73 @@
+import datetime
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from dataobjects import HighDDataset
+from dataobjects.enums import HighDDatasetID
+from visualisation import HighDVisualisationMaster
+
+
+class VehicleRecordingGui:
+    def __init__(self):
+        self.vehicles = {}
+
+    def add_vehicle(self, vehicle, vehicle_id):
+        self.vehicles[vehicle_id] = vehicle
+
+    def remove_vehicle(self, vehicle, vehicle_id):
+        del self.vehicles[vehicle_id]
+
+    def update_time_in_gui(self, time, frame_number):
+        pass
+
+    def update_all_graphics_positions(self):
+        pass
+
+    def update_buttons(self):
+        pass
+
+    def get_positions(self):
+        return {vehicle_id: vehicle.current_position.tolist() for vehicle_id, vehicle in self.vehicles.items()}
+
+
+class TestVisualisationMaster(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = HighDDataset(HighDDatasetID.DATASET_01)
+        self.dataset.frame_rate = 25
+        self.dataset.duration = 1.
+        self.dataset.start_time = datetime.datetime(2017, 1, 1, 8, 0)
+
+        frames = np.concatenate([np.arange(1, 16), np.arange(10, 26)])
+        self.dataset.track_data = pd.DataFrame({'frame': frames,
+                                                'id': np.repeat([1, 2], [15, 16]),
+                                                'x': frames * 1.5,
+                                                'y': np.repeat([10., 20.], [15, 16])})
+        for column in HighDVisualisationMaster.COLUMN_MAPPING.values():
+            if column not in self.dataset.track_data.columns:
+                self.dataset.track_data[column] = 0.
+
+        self.dataset.track_meta_data = pd.DataFrame({'id': [1, 2], 'width': [4., 12.], 'height': [2., 2.5], 'initialFrame': [1, 10], 'finalFrame': [15, 25],
+                                                     'numFrames': [15, 16], 'class': ['Car', 'Truck'], 'drivingDirection': [2, 2], 'traveledDistance': 0.,
+                                                     'minXVelocity': 0., 'maxXVelocity': 0., 'meanXVelocity': 0., 'numLaneChanges': 0}).set_index('id')
+
+        self.gui = VehicleRecordingGui()
+        dt = datetime.timedelta(seconds=1 / self.dataset.frame_rate)
+        self.master = HighDVisualisationMaster(self.dataset, self.gui, self.dataset.start_time, self.dataset.start_time + dt * 25, 24, 1, dt)
+
+    def test_go_to_frame_matches_playback(self):
+        self.assertTupleEqual(self.master.frame_range, (1, 25))
+        self.assertEqual(self.master.playback_frame_rate, 25.)
+
+        played_frames = {self.master.frame_number: (self.master.t, self.gui.get_positions())}
+        while self.master.frame_number < 25:
+            self.master._do_time_step_wrapper()
+            played_frames[self.master.frame_number] = (self.master.t, self.gui.get_positions())
+
+        for frame_number in [20, 3, 12, 25, 1]:
+            self.master.go_to_frame(frame_number)
+            expected_time, expected_positions = played_frames[frame_number]
+            self.assertEqual(self.master.t, expected_time)
+            self.assertDictEqual(self.gui.get_positions(), expected_positions)
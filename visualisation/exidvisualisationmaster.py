@@ -19,51 +19,58 @@ along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 import numpy as np
 
 from dataobjects import ExiDDataset, Vehicle
+from .framestore import FrameStore
 from .visualisationmaster import VisualisationMaster
 
 
 class ExiDVisualisationMaster(VisualisationMaster):
     sim_data: ExiDDataset
 
+    COLUMN_MAPPING = {'vehicle_id': 'trackId',
+                      'x': 'xCenter',
+                      'y': 'yCenter',
+                      'heading': 'heading',
+                      'velocity_x': 'xVelocity',
+                      'velocity_y': 'yVelocity',
+                      'acceleration_x': 'xAcceleration',
+                      'acceleration_y': 'yAcceleration',
+                      'lon_velocity': 'lonVelocity',
+                      'lat_velocity': 'latVelocity',
+                      'lon_acceleration': 'lonAcceleration',
+                      'lat_acceleration': 'latAcceleration'}
+
     def __init__(self, sim_data, gui, start_time, end_time, number_of_frames, first_frame, dt, parent=None):
+        # the frame store has to exist before the first time step is executed in the constructor of the parent
+        self.frame_store = FrameStore(sim_data.track_data, sim_data.track_data['frame'].to_numpy(), self.COLUMN_MAPPING)
+
         super().__init__(sim_data, gui, start_time, end_time, number_of_frames, first_frame, dt, parent=parent)
 
     def do_time_step(self):
+        data_on_timestamp = self.frame_store.get_frame_as_lists(self.frame_number)
+        self.profiler.lap('data_fetch')
 
-        data_on_timestamp = self.sim_data.track_data.loc[self.sim_data.track_data.frame == self.frame_number, :]
-
-        for item in data_on_timestamp.index:
-            vehicle_id = data_on_timestamp.at[item, 'trackId']
-            global_x = data_on_timestamp.at[item, 'xCenter']
-            global_y = data_on_timestamp.at[item, 'yCenter']
-            heading = data_on_timestamp.at[item, 'heading']
-            velocity_x = data_on_timestamp.at[item, 'xVelocity']
-            velocity_y = data_on_timestamp.at[item, 'yVelocity']
-            acceleration_x = data_on_timestamp.at[item, 'xAcceleration']
-            acceleration_y = data_on_timestamp.at[item, 'yAcceleration']
-
-            lon_velocity = data_on_timestamp.at[item, 'lonVelocity']
-            lat_velocity = data_on_timestamp.at[item, 'latVelocity']
-            lon_acceleration = data_on_timestamp.at[item, 'lonAcceleration']
-            lat_acceleration = data_on_timestamp.at[item, 'latAcceleration']
-
+        for index, vehicle_id in enumerate(data_on_timestamp['vehicle_id']):
             if str(vehicle_id) not in self.vehicles.keys():
-                new_vehicle = Vehicle.from_exid_row(self.sim_data.track_meta_data.loc[self.sim_data.track_meta_data.index == vehicle_id, :])
+                new_vehicle = Vehicle.from_exid_row(self.sim_data.track_meta_data.loc[[vehicle_id], :])
                 self._add_vehicle(new_vehicle, str(vehicle_id))
 
-            self.vehicles[str(vehicle_id)].set_pos_from_center_position(np.array([global_x, global_y]), heading)
-            self.vehicles[str(vehicle_id)].current_heading = heading
-            self.vehicles[str(vehicle_id)].current_linear_velocities[0] = velocity_x
-            self.vehicles[str(vehicle_id)].current_linear_velocities[1] = velocity_y
-            self.vehicles[str(vehicle_id)].current_linear_accelerations[0] = acceleration_x
-            self.vehicles[str(vehicle_id)].current_linear_accelerations[1] = acceleration_y
+            heading = data_on_timestamp['heading'][index]
+
+            vehicle = self.vehicles[str(vehicle_id)]
+            vehicle.set_pos_from_center_position(np.array([data_on_timestamp['x'][index], data_on_timestamp['y'][index]]), heading)
+            vehicle.current_heading = heading
+            vehicle.current_linear_velocities[0] = data_on_timestamp['velocity_x'][index]
+            vehicle.current_linear_velocities[1] = data_on_timestamp['velocity_y'][index]
+            vehicle.current_linear_accelerations[0] = data_on_timestamp['acceleration_x'][index]
+            vehicle.current_linear_accelerations[1] = data_on_timestamp['acceleration_y'][index]
 
-            self.vehicles[str(vehicle_id)].current_lon_acceleration = lon_acceleration
-            self.vehicles[str(vehicle_id)].current_lat_acceleration = lat_acceleration
-            self.vehicles[str(vehicle_id)].current_lon_velocity = lon_velocity
-            self.vehicles[str(vehicle_id)].current_lat_velocity = lat_velocity
+            vehicle.current_lon_acceleration = data_on_timestamp['lon_acceleration'][index]
+            vehicle.current_lat_acceleration = data_on_timestamp['lat_acceleration'][index]
+            vehicle.current_lon_velocity = data_on_timestamp['lon_velocity'][index]
+            vehicle.current_lat_velocity = data_on_timestamp['lat_velocity'][index]
 
         self._remove_vehicles_that_are_out_of_frame()
+        self.profiler.lap('vehicle_update')
         self.gui.update_time_in_gui(self.t, self.frame_number)
         self.gui.update_all_graphics_positions()
 
@@ -0,0 +1,79 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+from processing.columnarcache import is_memory_mapped
+from processing.frameindex import FrameIndex
+
+
+class FrameStore:
+    def __init__(self, track_data, frame_keys, column_mapping):
+        """
+        A columnar copy of the track data of a dataset that is indexed per frame. The columns that a visualisation master needs are stored as contiguous NumPy
+        arrays (a struct of arrays), sorted on frame. A time step can then retrieve the data of all vehicles in a frame as one batch of array slices, instead of
+        filtering the full pandas DataFrame and reading every value separately.
+
+        The column mapping translates the names used by the visualisation master to the column names of the dataset. Columns that are not present in the track
+        data are skipped, this is needed because not all files of a data source contain the same columns (e.g. some NGSim files have no Direction column). Use
+        the in operator to check if a column is available.
+
+        :param track_data: the track data as a pandas DataFrame
+        :param frame_keys: an integer key for every row in the track data that identifies the frame or time step the row belongs to
+        :param column_mapping: dict of {name used in the batches: column name in the track data}
+        """
+        self.frame_index = FrameIndex(frame_keys)
+        self.row_labels = self.frame_index.sorted_column(track_data.index.to_numpy())
+
+        self.columns = {}
+        self.memory_mapped_columns = {}
+        for name, column_name in column_mapping.items():
+            if column_name in track_data.columns:
+                values = track_data[column_name].to_numpy()
+                if is_memory_mapped(values):
+                    # Memory mapped columns are not copied, the rows of a frame are gathered when the frame is requested. This way only the parts of the file
+                    # that hold the visualised frames are read from disk.
+                    self.memory_mapped_columns[name] = values
+                else:
+                    self.columns[name] = self.frame_index.sorted_column(values)
+
+    def __contains__(self, name):
+        return name in self.columns or name in self.memory_mapped_columns
+
+    def get_frame(self, frame_key):
+        """
+        Returns the data of all rows in a frame as a dict of {name: array}. The arrays can be views on the stored columns and should not be altered.
+        """
+        rows = self.frame_index.slice_of(frame_key)
+        batch = {name: column[rows] for name, column in self.columns.items()}
+
+        if self.memory_mapped_columns:
+            row_numbers = self.frame_index.row_order[rows]
+            batch.update({name: column[row_numbers] for name, column in self.memory_mapped_columns.items()})
+        return batch
+
+    def get_frame_as_lists(self, frame_key):
+        """
+        Returns the same batch as get_frame, but with all arrays converted to lists of python scalars. This is faster when the values are used one by one, for
+        example when they are copied to Vehicle objects.
+        """
+        return {name: values.tolist() for name, values in self.get_frame(frame_key).items()}
+
+    def get_row_labels(self, frame_key):
+        """
+        Returns the index labels of the rows in a frame, in the same order as the batches. These can be used to look up a full row in the original DataFrame.
+        """
+        return self.row_labels[self.frame_index.slice_of(frame_key)]
@@ -19,73 +19,79 @@ along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 import numpy as np
 
 from dataobjects import HighDDataset, Vehicle
+from .framestore import FrameStore
 from .visualisationmaster import VisualisationMaster
 
 
 class HighDVisualisationMaster(VisualisationMaster):
     sim_data: HighDDataset
 
+    COLUMN_MAPPING = {'vehicle_id': 'id',
+                      'x': 'x',
+                      'y': 'y',
+                      'velocity_x': 'xVelocity',
+                      'velocity_y': 'yVelocity',
+                      'acceleration_x': 'xAcceleration',
+                      'acceleration_y': 'yAcceleration',
+                      'front_sight_distance': 'frontSightDistance',
+                      'back_sight_distance': 'backSightDistance',
+                      'dhw': 'dhw',
+                      'thw': 'thw',
+                      'ttc': 'ttc',
+                      'preceding_x_velocity': 'precedingXVelocity',
+                      'preceding_id': 'precedingId',
+                      'following_id': 'followingId',
+                      'left_preceding_id': 'leftPrecedingId',
+                      'left_alongside_id': 'leftAlongsideId',
+                      'left_following_id': 'leftFollowingId',
+                      'right_preceding_id': 'rightPrecedingId',
+                      'right_alongside_id': 'rightAlongsideId',
+                      'right_following_id': 'rightFollowingId',
+                      'lane_id': 'laneId'}
+
     def __init__(self, sim_data, gui, start_time, end_time, number_of_frames, first_frame, dt, parent=None):
+        # the frame store has to exist before the first time step is executed in the constructor of the parent
+        self.frame_store = FrameStore(sim_data.track_data, sim_data.track_data['frame'].to_numpy(), self.COLUMN_MAPPING)
+
         super().__init__(sim_data, gui, start_time, end_time, number_of_frames, first_frame, dt, parent=parent)
 
     def do_time_step(self):
+        data_on_timestamp = self.frame_store.get_frame_as_lists(self.frame_number)
+        self.profiler.lap('data_fetch')
 
-        data_on_timestamp = self.sim_data.track_data.loc[self.sim_data.track_data.frame == self.frame_number, :]
-
-        for item in data_on_timestamp.index:
-            vehicle_id = int(data_on_timestamp.at[item, 'id'])
-            global_x = data_on_timestamp.at[item, 'x']
-            global_y = data_on_timestamp.at[item, 'y']
-            velocity_x = data_on_timestamp.at[item, 'xVelocity']
-            velocity_y = data_on_timestamp.at[item, 'yVelocity']
-            acceleration_x = data_on_timestamp.at[item, 'xAcceleration']
-            acceleration_y = data_on_timestamp.at[item, 'yAcceleration']
-            front_sight = data_on_timestamp.at[item, 'frontSightDistance']
-            back_sight = data_on_timestamp.at[item, 'backSightDistance']
-            dhw = data_on_timestamp.at[item, 'dhw']
-            thw = data_on_timestamp.at[item, 'thw']
-            ttc = data_on_timestamp.at[item, 'ttc']
-            preceding_x_velocity = data_on_timestamp.at[item, 'precedingXVelocity']
-            preceding_id = data_on_timestamp.at[item, 'precedingId']
-            following_id = data_on_timestamp.at[item, 'followingId']
-            left_preceding_id = data_on_timestamp.at[item, 'leftPrecedingId']
-            left_alongside_id = data_on_timestamp.at[item, 'leftAlongsideId']
-            left_following_id = data_on_timestamp.at[item, 'leftFollowingId']
-            right_preceding_id = data_on_timestamp.at[item, 'rightPrecedingId']
-            right_alongside_id = data_on_timestamp.at[item, 'rightAlongsideId']
-            right_following_id = data_on_timestamp.at[item, 'rightFollowingId']
-            lane_id = data_on_timestamp.at[item, 'laneId']
-
+        for index, vehicle_id in enumerate(data_on_timestamp['vehicle_id']):
             if str(vehicle_id) not in self.vehicles.keys():
-                new_vehicle = Vehicle.from_highd_row(self.sim_data.track_meta_data.loc[self.sim_data.track_meta_data.index == vehicle_id, :])
+                new_vehicle = Vehicle.from_highd_row(self.sim_data.track_meta_data.loc[[vehicle_id], :])
                 if new_vehicle.driving_direction == 1:  # driving on the top lanes to the left
                     new_vehicle.current_heading = -np.pi
                 self._add_vehicle(new_vehicle, str(vehicle_id))
 
-            self.vehicles[str(vehicle_id)].set_pos_from_top_left_corner(np.array([global_x, global_y]))
-
-            self.vehicles[str(vehicle_id)].current_linear_velocities[0] = velocity_x
-            self.vehicles[str(vehicle_id)].current_linear_velocities[1] = velocity_y
-            self.vehicles[str(vehicle_id)].current_linear_accelerations[0] = acceleration_x
-            self.vehicles[str(vehicle_id)].current_linear_accelerations[1] = acceleration_y
-
-            self.vehicles[str(vehicle_id)].front_sight_distance = front_sight
-            self.vehicles[str(vehicle_id)].back_sight_distance = back_sight
-            self.vehicles[str(vehicle_id)].dhw = dhw
-            self.vehicles[str(vehicle_id)].thw = thw
-            self.vehicles[str(vehicle_id)].ttc = ttc
-            self.vehicles[str(vehicle_id)].preceding_x_velocity = preceding_x_velocity
-            self.vehicles[str(vehicle_id)].preceding_id = preceding_id
-            self.vehicles[str(vehicle_id)].following_id = following_id
-            self.vehicles[str(vehicle_id)].left_preceding_id = left_preceding_id
-            self.vehicles[str(vehicle_id)].left_alongside_id = left_alongside_id
-            self.vehicles[str(vehicle_id)].left_following_id = left_following_id
-            self.vehicles[str(vehicle_id)].right_preceding_id = right_preceding_id
-            self.vehicles[str(vehicle_id)].right_alongside_id = right_alongside_id
-            self.vehicles[str(vehicle_id)].right_following_id = right_following_id
-            self.vehicles[str(vehicle_id)].current_lane = lane_id
+            vehicle = self.vehicles[str(vehicle_id)]
+            vehicle.set_pos_from_top_left_corner(np.array([data_on_timestamp['x'][index], data_on_timestamp['y'][index]]))
+
+            vehicle.current_linear_velocities[0] = data_on_timestamp['velocity_x'][index]
+            vehicle.current_linear_velocities[1] = data_on_timestamp['velocity_y'][index]
+            vehicle.current_linear_accelerations[0] = data_on_timestamp['acceleration_x'][index]
+            vehicle.current_linear_accelerations[1] = data_on_timestamp['acceleration_y'][index]
+
+            vehicle.front_sight_distance = data_on_timestamp['front_sight_distance'][index]
+            vehicle.back_sight_distance = data_on_timestamp['back_sight_distance'][index]
+            vehicle.dhw = data_on_timestamp['dhw'][index]
+            vehicle.thw = data_on_timestamp['thw'][index]
+            vehicle.ttc = data_on_timestamp['ttc'][index]
+            vehicle.preceding_x_velocity = data_on_timestamp['preceding_x_velocity'][index]
+            vehicle.preceding_id = data_on_timestamp['preceding_id'][index]
+            vehicle.following_id = data_on_timestamp['following_id'][index]
+            vehicle.left_preceding_id = data_on_timestamp['left_preceding_id'][index]
+            vehicle.left_alongside_id = data_on_timestamp['left_alongside_id'][index]
+            vehicle.left_following_id = data_on_timestamp['left_following_id'][index]
+            vehicle.right_preceding_id = data_on_timestamp['right_preceding_id'][index]
+            vehicle.right_alongside_id = data_on_timestamp['right_alongside_id'][index]
+            vehicle.right_following_id = data_on_timestamp['right_following_id'][index]
+            vehicle.current_lane = data_on_timestamp['lane_id'][index]
 
         self._remove_vehicles_that_are_out_of_frame()
+        self.profiler.lap('vehicle_update')
         self.gui.update_time_in_gui(self.t, self.frame_number)
         self.gui.update_all_graphics_positions()
 
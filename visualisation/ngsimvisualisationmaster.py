@@ -19,76 +19,95 @@ along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 import datetime
 
 from dataobjects import NGSimDataset, Vehicle
+from .framestore import FrameStore
 from .visualisationmaster import VisualisationMaster
 
 
 class NGSimVisualisationMaster(VisualisationMaster):
     sim_data: NGSimDataset
 
+    COLUMN_MAPPING = {'vehicle_id': 'Vehicle_ID',
+                      'global_x': 'Global_X',
+                      'global_y': 'Global_Y',
+                      'velocity': 'v_Vel',
+                      'smoothed_global_x': 'Smoothed_Global_X',
+                      'smoothed_global_y': 'Smoothed_Global_Y',
+                      'smoothed_velocity': 'Smoothed_Vel',
+                      'smoothed_heading': 'Smoothed_Heading',
+                      'acceleration': 'v_Acc',
+                      'global_time': 'Global_Time',
+                      'dhw': 'Space_Headway',
+                      'thw': 'Time_Headway',
+                      'direction': 'Direction',
+                      'lane_id': 'Lane_ID',
+                      'preceding_id': 'Preceding',
+                      'following_id': 'Following',
+                      'movement': 'Movement',
+                      'intersection': 'Int_ID',
+                      'section': 'Section_ID',
+                      'origin_zone': 'O_Zone',
+                      'destination_zone': 'D_Zone'}
+
     def __init__(self, sim_data, gui, start_time, end_time, number_of_frames, first_frame, parent=None):
+        # the frame store and vehicle summaries have to exist before the first time step is executed in the constructor of the parent
+        track_data = sim_data.track_data
+        self.frame_store = FrameStore(track_data, track_data['Global_Time'].to_numpy(), self.COLUMN_MAPPING)
+
+        self.first_frames = track_data['Frame_ID'].groupby(track_data['Vehicle_ID']).min()
+        self.last_frames = track_data['Frame_ID'].groupby(track_data['Vehicle_ID']).max()
+        self.smoothing_succeeded = track_data['Smoothed_Global_X'].notnull().groupby(track_data['Vehicle_ID']).any()
+
         super().__init__(sim_data, gui, start_time, end_time, number_of_frames, first_frame, dt=datetime.timedelta(milliseconds=100), parent=parent)
 
     def do_time_step(self):
+        global_time = round(self.t.timestamp() * 1000)
+        data_on_timestamp = self.frame_store.get_frame_as_lists(global_time)
+        self.profiler.lap('data_fetch')
+        row_labels = None
 
-        data_on_timestamp = self.sim_data.track_data.loc[self.sim_data.track_data['Global_Time'] == self.t.timestamp() * 1000, :]
-
-        for index in data_on_timestamp.index:
-            vehicle_id = data_on_timestamp.at[index, 'Vehicle_ID']
+        for index, vehicle_id in enumerate(data_on_timestamp['vehicle_id']):
             if str(vehicle_id) not in self.vehicles.keys():
-                first_frame = self.sim_data.track_data.loc[self.sim_data.track_data['Vehicle_ID'] == vehicle_id, 'Frame_ID'].min()
-                last_frame = self.sim_data.track_data.loc[self.sim_data.track_data['Vehicle_ID'] == vehicle_id, 'Frame_ID'].max()
-                smoothing_succeeded = not self.sim_data.track_data.loc[self.sim_data.track_data['Vehicle_ID'] == vehicle_id, 'Smoothed_Global_X'].isnull().all()
-                vehicle = Vehicle.from_ngsim_row(data_on_timestamp.loc[index, :], first_frame, last_frame, smoothing_succeeded)
+                if row_labels is None:
+                    row_labels = self.frame_store.get_row_labels(global_time)
+                first_row = self.sim_data.track_data.loc[row_labels[index], :]
+                vehicle = Vehicle.from_ngsim_row(first_row, self.first_frames[vehicle_id], self.last_frames[vehicle_id], self.smoothing_succeeded[vehicle_id])
                 self._add_vehicle(vehicle, str(vehicle.id))
 
-            if not self.vehicles[str(vehicle_id)].smoothing_succeeded:
-                self.vehicles[str(vehicle_id)].current_position[0] = data_on_timestamp.at[index, 'Global_X']
-                self.vehicles[str(vehicle_id)].current_position[1] = - data_on_timestamp.at[index, 'Global_Y']
-                self.vehicles[str(vehicle_id)].current_forward_velocity = data_on_timestamp.at[index, 'v_Vel']
+            vehicle = self.vehicles[str(vehicle_id)]
+            if not vehicle.smoothing_succeeded:
+                vehicle.current_position[0] = data_on_timestamp['global_x'][index]
+                vehicle.current_position[1] = - data_on_timestamp['global_y'][index]
+                vehicle.current_forward_velocity = data_on_timestamp['velocity'][index]
             else:
-                self.vehicles[str(vehicle_id)].current_position[0] = data_on_timestamp.at[index, 'Smoothed_Global_X']
-                self.vehicles[str(vehicle_id)].current_position[1] = - data_on_timestamp.at[index, 'Smoothed_Global_Y']
-                self.vehicles[str(vehicle_id)].current_forward_velocity = data_on_timestamp.at[index, 'Smoothed_Vel']
-                self.vehicles[str(vehicle_id)].current_heading = data_on_timestamp.at[index, 'Smoothed_Heading']
-
-            self.vehicles[str(vehicle_id)].current_forwards_acceleration = data_on_timestamp.at[index, 'v_Acc']
-            self.vehicles[str(vehicle_id)].last_time_stamp = data_on_timestamp.at[index, 'Global_Time']
-            self.vehicles[str(vehicle_id)].dhw = data_on_timestamp.at[index, 'Space_Headway']
-            self.vehicles[str(vehicle_id)].thw = data_on_timestamp.at[index, 'Time_Headway']
-            try:
-                self.vehicles[str(vehicle_id)].driving_direction = data_on_timestamp.at[index, 'Direction']
-            except KeyError:
-                pass
-
-            self.vehicles[str(vehicle_id)].current_lane = data_on_timestamp.at[index, 'Lane_ID']
-            self.vehicles[str(vehicle_id)].preceding_id = data_on_timestamp.at[index, 'Preceding']
-            self.vehicles[str(vehicle_id)].following_id = data_on_timestamp.at[index, 'Following']
-            try:
-                self.vehicles[str(vehicle_id)].movement = data_on_timestamp.at[index, 'Movement']
-            except KeyError:
-                pass
-
-            try:
-                self.vehicles[str(vehicle_id)].intersection = data_on_timestamp.at[index, 'Int_ID']
-            except KeyError:
-                pass
-
-            try:
-                self.vehicles[str(vehicle_id)].section = data_on_timestamp.at[index, 'Section_ID']
-            except KeyError:
-                pass
-
-            try:
-                self.vehicles[str(vehicle_id)].origin_zone = data_on_timestamp.at[index, 'O_Zone']
-            except KeyError:
-                pass
-
-            try:
-                self.vehicles[str(vehicle_id)].destination_zone = data_on_timestamp.at[index, 'D_Zone']
-            except KeyError:
-                pass
+                vehicle.current_position[0] = data_on_timestamp['smoothed_global_x'][index]
+                vehicle.current_position[1] = - data_on_timestamp['smoothed_global_y'][index]
+                vehicle.current_forward_velocity = data_on_timestamp['smoothed_velocity'][index]
+                vehicle.current_heading = data_on_timestamp['smoothed_heading'][index]
+
+            vehicle.current_forwards_acceleration = data_on_timestamp['acceleration'][index]
+            vehicle.last_time_stamp = data_on_timestamp['global_time'][index]
+            vehicle.dhw = data_on_timestamp['dhw'][index]
+            vehicle.thw = data_on_timestamp['thw'][index]
+            vehicle.current_lane = data_on_timestamp['lane_id'][index]
+            vehicle.preceding_id = data_on_timestamp['preceding_id'][index]
+            vehicle.following_id = data_on_timestamp['following_id'][index]
+
+            # not all NGSim files contain these columns
+            if 'direction' in data_on_timestamp:
+                vehicle.driving_direction = data_on_timestamp['direction'][index]
+            if 'movement' in data_on_timestamp:
+                vehicle.movement = data_on_timestamp['movement'][index]
+            if 'intersection' in data_on_timestamp:
+                vehicle.intersection = data_on_timestamp['intersection'][index]
+            if 'section' in data_on_timestamp:
+                vehicle.section = data_on_timestamp['section'][index]
+            if 'origin_zone' in data_on_timestamp:
+                vehicle.origin_zone = data_on_timestamp['origin_zone'][index]
+            if 'destination_zone' in data_on_timestamp:
+                vehicle.destination_zone = data_on_timestamp['destination_zone'][index]
 
         self._remove_vehicles_that_are_out_of_frame()
+        self.profiler.lap('vehicle_update')
         self.gui.update_all_graphics_positions()
         self.gui.update_time_in_gui(self.t, self.frame_number)
 
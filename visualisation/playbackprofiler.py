@@ -0,0 +1,166 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import csv
+import json
+import time
+
+import numpy as np
+
+"""
+Measures where the time of playback goes. For every time step, the durations of the stages of the hot path are stored in a ring buffer, such that the profile
+of the most recent time steps is always available without growing memory. The stages are:
+
+    data_fetch      looking up the data of the frame in the frame store
+    vehicle_update  updating the vehicle objects, adding and removing vehicles
+    gui_update      positioning the graphics items and updating the widgets of the GUI
+    render          painting the view, this happens after the time step when Qt handles the paint event. Only the first paint after a time step is stored,
+                    later paints (e.g. the HUD text, hovering or resizing while paused) do not show a new frame
+    record_render   rendering the frame of a video recording
+    encode          handing the frame to the video recorder, this is the time the GUI thread waits for the writer thread
+
+The visualisation master marks the end of every stage with lap, a stage that is not passed in a time step is stored as NaN. When the main timer can not
+keep up, timer ticks are missed. These are counted by comparing the time between two ticks with the interval of the timer.
+"""
+
+STAGES = ['data_fetch', 'vehicle_update', 'gui_update', 'render', 'record_render', 'encode']
+STAGE_INDICES = {stage: index for index, stage in enumerate(STAGES)}
+
+
+class PlaybackProfiler:
+    def __init__(self, capacity=1500):
+        """
+        :param capacity: the number of time steps that are kept, older time steps are overwritten
+        """
+        self.capacity = capacity
+        self.frame_numbers = np.zeros(capacity, dtype=np.int64)
+        self.timestamps = np.full(capacity, np.nan)
+        self.durations = np.full((capacity, len(STAGES)), np.nan)
+
+        self.number_of_time_steps = 0
+        self.number_of_missed_ticks = 0
+
+        self._row = 0
+        self._last_lap = time.perf_counter()
+        self._last_tick = None
+        self._is_rendered = False
+
+    def start_time_step(self, frame_number, timer_interval=None):
+        """
+        Starts a new row in the ring buffer. The timer interval in seconds is used to count missed timer ticks, it should be None if the time step is not
+        triggered by the timer (e.g. when stepping a single frame).
+        """
+        now = time.perf_counter()
+
+        if timer_interval and self._last_tick is not None:
+            self.number_of_missed_ticks += max(0, round((now - self._last_tick) / timer_interval) - 1)
+        self._last_tick = now if timer_interval else None
+
+        self._row = self.number_of_time_steps % self.capacity
+        self.number_of_time_steps += 1
+        self.frame_numbers[self._row] = frame_number
+        self.timestamps[self._row] = now
+        self.durations[self._row, :] = np.nan
+        self._last_lap = now
+        self._is_rendered = False
+
+    def lap(self, stage):
+        """
+        Stores the time since the start of the time step or the previous lap as the duration of a stage.
+        """
+        now = time.perf_counter()
+        self.add_duration(stage, now - self._last_lap)
+        self._last_lap = now
+
+    def add_duration(self, stage, duration):
+        """
+        Adds a duration to a stage of the current time step, this is used for stages that are measured outside of the time step (e.g. painting).
+        """
+        if not self.number_of_time_steps:
+            return
+
+        index = STAGE_INDICES[stage]
+        previous_duration = self.durations[self._row, index]
+        self.durations[self._row, index] = duration if np.isnan(previous_duration) else previous_duration + duration
+
+    def add_render_duration(self, duration):
+        """
+        Stores the duration of the first paint after the start of the time step, which is the paint that shows the new frame. Later paints are ignored.
+        """
+        if self._is_rendered or not self.number_of_time_steps:
+            return
+
+        self.add_duration('render', duration)
+        self._is_rendered = True
+
+    def _get_ordered_rows(self):
+        if self.number_of_time_steps <= self.capacity:
+            return np.arange(self.number_of_time_steps)
+        return np.roll(np.arange(self.capacity), -(self._row + 1))
+
+    def get_effective_frame_rate(self, window=1.):
+        """
+        Returns the number of time steps per second over the last window seconds.
+        """
+        rows = self._get_ordered_rows()
+        timestamps = self.timestamps[rows]
+        timestamps = timestamps[timestamps >= time.perf_counter() - window]
+        if timestamps.size < 2:
+            return 0.
+        return (timestamps.size - 1) / (timestamps[-1] - timestamps[0])
+
+    def get_summary(self, number_of_time_steps=None):
+        """
+        Returns the mean, median and 95th percentile duration in ms of every stage over the most recent time steps, by default over the full ring buffer.
+        """
+        rows = self._get_ordered_rows()
+        if number_of_time_steps is not None:
+            rows = rows[-number_of_time_steps:]
+
+        summary = {}
+        for stage, durations in zip(STAGES, self.durations[rows].T):
+            durations = durations[~np.isnan(durations)] * 1e3
+            if durations.size:
+                summary[stage] = {'mean_ms': float(durations.mean()),
+                                  'median_ms': float(np.median(durations)),
+                                  'p95_ms': float(np.percentile(durations, 95)),
+                                  'number_of_time_steps': int(durations.size)}
+        return summary
+
+    def save(self, file_path):
+        """
+        Saves the time steps in the ring buffer to a csv file (one row per time step), or to a json file with a summary when the path ends with .json.
+        """
+        rows = self._get_ordered_rows()
+        start_time = self.timestamps[rows[0]] if rows.size else 0.
+        time_steps = [{'frame_number': int(self.frame_numbers[row]),
+                       'time_s': round(float(self.timestamps[row] - start_time), 6),
+                       **{stage + '_ms': None if np.isnan(duration) else round(float(duration) * 1e3, 4) for stage, duration in
+                          zip(STAGES, self.durations[row])}} for row in rows]
+
+        if file_path.lower().endswith('.json'):
+            with open(file_path, 'w') as profile_file:
+                json.dump({'number_of_time_steps': self.number_of_time_steps,
+                           'number_of_missed_ticks': self.number_of_missed_ticks,
+                           'summary': self.get_summary(),
+                           'time_steps': time_steps}, profile_file, indent=4)
+        else:
+            with open(file_path, 'w', newline='') as profile_file:
+                writer = csv.DictWriter(profile_file, fieldnames=['frame_number', 'time_s'] + [stage + '_ms' for stage in STAGES])
+                writer.writeheader()
+                writer.writerows(time_steps)
@@ -17,48 +17,69 @@ You should have received a copy of the GNU General Public License
 along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
 from dataobjects import PNeumaDataset, Vehicle
+from processing.frameindex import frame_keys_from_time
+from .framestore import FrameStore
 from .visualisationmaster import VisualisationMaster
 
 
 class PNeumaVisualisationMaster(VisualisationMaster):
     sim_data: PNeumaDataset
 
+    COLUMN_MAPPING = {'vehicle_id': 'vehicle_id',
+                      'global_x': 'global_x',
+                      'global_y': 'global_y',
+                      'speed': 'speed',
+                      'smoothed_global_x': 'smoothed_global_x',
+                      'smoothed_global_y': 'smoothed_global_y',
+                      'smoothed_speed': 'smoothed_speed',
+                      'smoothed_heading': 'smoothed_heading',
+                      'lon_acceleration': 'lon_acc',
+                      'lat_acceleration': 'lat_acc',
+                      'time': 'time'}
+
     def __init__(self, sim_data, gui, start_time, end_time, number_of_frames, first_frame, dt, default_frame_step, parent=None):
+        # the frame store and vehicle summaries have to exist before the first time step is executed in the constructor of the parent
+        track_data = sim_data.track_data
+        frame_keys = frame_keys_from_time(track_data['time'].to_numpy(), sim_data.frame_rate)
+        self.frame_store = FrameStore(track_data, frame_keys, self.COLUMN_MAPPING)
+
+        self.first_time_stamps = track_data['time'].groupby(track_data['vehicle_id']).min()
+        self.last_time_stamps = track_data['time'].groupby(track_data['vehicle_id']).max()
+        self.smoothing_succeeded = track_data['smoothed_global_x'].notnull().groupby(track_data['vehicle_id']).any()
+
         super().__init__(sim_data, gui, start_time, end_time, number_of_frames, first_frame, dt, default_frame_step, parent=parent)
 
     def do_time_step(self):
 
         sim_time = (self.t - self.sim_data.start_time).total_seconds()
-        data_on_timestamp = self.sim_data.track_data.loc[self.sim_data.track_data.time == sim_time, :]
-
-        for item in data_on_timestamp.index:
-            vehicle_id = int(data_on_timestamp.at[item, 'vehicle_id'])
+        data_on_timestamp = self.frame_store.get_frame_as_lists(round(sim_time * self.sim_data.frame_rate))
+        self.profiler.lap('data_fetch')
 
+        for index, vehicle_id in enumerate(data_on_timestamp['vehicle_id']):
             if str(vehicle_id) not in self.vehicles.keys():
-                time_stamps = self.sim_data.track_data.loc[self.sim_data.track_data['vehicle_id'] == vehicle_id, 'time']
-
-                first_frame = int(time_stamps.min() * self.sim_data.frame_rate)
-                last_frame = int(time_stamps.max() * self.sim_data.frame_rate)
-                smoothing_succeeded = not self.sim_data.track_data.loc[self.sim_data.track_data['vehicle_id'] == vehicle_id, 'smoothed_global_x'].isnull().all()
+                first_frame = int(self.first_time_stamps[vehicle_id] * self.sim_data.frame_rate)
+                last_frame = int(self.last_time_stamps[vehicle_id] * self.sim_data.frame_rate)
                 data_row = self.sim_data.vehicles.loc[self.sim_data.vehicles['track_id'] == vehicle_id, :]
-                new_vehicle = Vehicle.from_pneuma_row(data_row, first_frame, last_frame, smoothing_succeeded)
+                new_vehicle = Vehicle.from_pneuma_row(data_row, first_frame, last_frame, self.smoothing_succeeded[vehicle_id])
                 self._add_vehicle(new_vehicle, str(vehicle_id))
 
-            if self.vehicles[str(vehicle_id)].smoothing_succeeded:
-                self.vehicles[str(vehicle_id)].current_position[0] = data_on_timestamp.at[item, 'smoothed_global_x']
-                self.vehicles[str(vehicle_id)].current_position[1] = - data_on_timestamp.at[item, 'smoothed_global_y']
-                self.vehicles[str(vehicle_id)].current_forward_velocity = data_on_timestamp.at[item, 'smoothed_speed']
-                self.vehicles[str(vehicle_id)].current_heading = data_on_timestamp.at[item, 'smoothed_heading']
+            vehicle = self.vehicles[str(vehicle_id)]
+            if vehicle.smoothing_succeeded:
+                vehicle.current_position[0] = data_on_timestamp['smoothed_global_x'][index]
+                vehicle.current_position[1] = - data_on_timestamp['smoothed_global_y'][index]
+                vehicle.current_forward_velocity = data_on_timestamp['smoothed_speed'][index]
+                vehicle.current_heading = data_on_timestamp['smoothed_heading'][index]
             else:
-                self.vehicles[str(vehicle_id)].current_position[0] = data_on_timestamp.at[item, 'global_x']
-                self.vehicles[str(vehicle_id)].current_position[1] = - data_on_timestamp.at[item, 'global_y']
-                self.vehicles[str(vehicle_id)].current_forward_velocity = data_on_timestamp.at[item, 'speed']
+                vehicle.current_position[0] = data_on_timestamp['global_x'][index]
+                vehicle.current_position[1] = - data_on_timestamp['global_y'][index]
+                vehicle.current_forward_velocity = data_on_timestamp['speed'][index]
 
-            self.vehicles[str(vehicle_id)].current_lon_acceleration = data_on_timestamp.at[item, 'lon_acc']
-            self.vehicles[str(vehicle_id)].current_lat_acceleration = data_on_timestamp.at[item, 'lat_acc']
-            self.vehicles[str(vehicle_id)].last_time_stamp = data_on_timestamp.at[item, 'time']
+            vehicle.current_lon_acceleration = data_on_timestamp['lon_acceleration'][index]
+            vehicle.current_lat_acceleration = data_on_timestamp['lat_acceleration'][index]
+            vehicle.last_time_stamp = data_on_timestamp['time'][index]
 
         self._remove_vehicles_that_are_out_of_frame()
+        self.profiler.lap('vehicle_update')
         self.gui.update_all_graphics_positions()
         self.gui.update_time_in_gui(self.t, self.frame_number)
 
@@ -0,0 +1,131 @@
+"""
+Copyright 2020, Olger Siebinga (o.siebinga@tudelft.nl)
+
+This file is part of Travia.
+
+Travia is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Travia is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Travia.  If not, see <https://www.gnu.org/licenses/>.
+"""
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+"""
+Records QImages to a video file without blocking the GUI. Rendered frames are put in a bounded queue, a writer thread takes them from the queue, converts
+them to the BGR format OpenCV expects and encodes them. Rendering the next frame on the GUI thread and encoding the previous one can then happen at the same
+time.
+
+When the writer can not keep up, the queue fills up and add_frame waits for a free place (back-pressure) at most maximum_wait seconds. If the queue is still
+full after that, the frame is dropped. A dropped frame is replaced by a repetition of the previous frame in the video, so every recorded time step still takes
+exactly one frame of the video. This keeps the video in sync with the dataset frame rate, the number of repeated frames is reported after stopping.
+"""
+
+
+class VideoRecorder:
+    QUEUE_SIZE = 16
+
+    def __init__(self, file_path, frame_rate, frame_size, maximum_wait=None, fourcc='MJPG', drop_frames=True):
+        """
+        :param file_path: the path to the video file
+        :param frame_rate: the frame rate of the video in frames per second, use the frame rate of the dataset to get a video at real speed
+        :param frame_size: the (width, height) of the frames in pixels, all frames should have this size
+        :param maximum_wait: the maximum time in seconds that add_frame waits for a free place in the queue, defaults to the duration of one frame
+        :param fourcc: the four character code of the video codec
+        :param drop_frames: if False, add_frame waits until there is a free place in the queue. Use this when frames are not rendered in real time.
+        """
+        self.file_path = file_path
+        self.frame_size = tuple(frame_size)
+        self.maximum_wait = 1. / frame_rate if maximum_wait is None else maximum_wait
+        self.drop_frames = drop_frames
+
+        self.number_of_frames_added = 0
+        self.number_of_frames_written = 0
+        self.number_of_dropped_frames = 0
+
+        self._video_writer = cv2.VideoWriter(file_path, cv2.VideoWriter.fourcc(*fourcc), frame_rate, self.frame_size)
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._frames_to_repeat = 0
+        self._error = None
+
+        self._writer_thread = threading.Thread(target=self._write_frames, name='VideoRecorder', daemon=True)
+        self._writer_thread.start()
+
+    def add_frame(self, image):
+        """
+        Adds a QImage in the 32 bit (A)RGB format to the video. The image is not copied, it is shared with the writer thread. QImages are copied on write, so
+        the caller can modify or reuse the image afterwards.
+        """
+        self.number_of_frames_added += 1
+        item = (type(image)(image), self._frames_to_repeat)
+
+        try:
+            self._queue.put(item, timeout=self.maximum_wait if self.drop_frames else None)
+            self._frames_to_repeat = 0
+        except queue.Full:
+            self.number_of_dropped_frames += 1
+            self._frames_to_repeat += 1
+
+    def stop(self):
+        """
+        Waits until all queued frames are written and closes the video file. Raises the exception that stopped the writer thread, if any.
+        """
+        self._queue.put((None, self._frames_to_repeat))
+        self._frames_to_repeat = 0
+        self._writer_thread.join()
+        self._video_writer.release()
+
+        if self._error is not None:
+            raise self._error
+
+    @property
+    def queue_length(self):
+        return self._queue.qsize()
+
+    def _write_frames(self):
+        previous_frame = None
+
+        while True:
+            image, frames_to_repeat = self._queue.get()
+
+            if self._error is None:
+                try:
+                    if previous_frame is not None:
+                        for _ in range(frames_to_repeat):
+                            self._video_writer.write(previous_frame)
+                            self.number_of_frames_written += 1
+
+                    if image is not None:
+                        previous_frame = self._convert_image(image)
+                        self._video_writer.write(previous_frame)
+                        self.number_of_frames_written += 1
+                except Exception as e:
+                    # keep emptying the queue so add_frame does not block, the error is raised when the recording is stopped
+                    self._error = e
+
+            if image is None:
+                return
+
+    def _convert_image(self, image):
+        width, height = self.frame_size
+        if (image.width(), image.height()) != (width, height):
+            raise ValueError('All frames should have a size of %d x %d pixels, got a frame of %d x %d.' % (width, height, image.width(), image.height()))
+
+        # constBits does not detach the image from the copy that the GUI thread may still hold
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        pixels = np.frombuffer(bits, np.uint8).reshape((height, image.bytesPerLine()))[:, :width * 4].reshape((height, width, 4))
+
+        # 32 bit QImages are stored as B, G, R, A bytes on little endian machines, which is the order OpenCV uses
+        return cv2.cvtColor(pixels, cv2.COLOR_BGRA2BGR)
@@ -18,18 +18,17 @@ along with Travia.  If not, see <https://www.gnu.org/licenses/>.
 """
 import datetime
 import os
-import cv2
-
-import numpy as np
 
 from PyQt5 import QtCore, QtWidgets, QtGui
 
 from dataobjects import Vehicle
+from .playbackprofiler import PlaybackProfiler
+from .videorecorder import VideoRecorder
 
 
 class VisualisationMaster(QtCore.QObject):
     FAST_FORWARD_FACTOR = 4
-    video_writer: cv2.VideoWriter
+    video_recorder: VideoRecorder
 
     def __init__(self, sim_data, gui, start_time, end_time, number_of_frames, first_frame, dt, default_frame_step=1, parent=None):
         super().__init__(parent)
@@ -40,9 +39,12 @@ class VisualisationMaster(QtCore.QObject):
         self.is_running_reverse = False
         self.is_recording = False
 
-        self.video_writer = None
+        self.video_recorder = None
         self.path_to_video_file = ''
 
+        # the durations of the stages of every time step, see playbackprofiler.py
+        self.profiler = PlaybackProfiler()
+
         self.main_timer = QtCore.QTimer()
         self.main_timer.setInterval(int(self.dt.total_seconds() * 1e3))
         self.main_timer.setTimerType(QtCore.Qt.PreciseTimer)
@@ -75,6 +77,17 @@ class VisualisationMaster(QtCore.QObject):
         self.t = self.start_time + datetime.timedelta(microseconds=((self.frame_number - self.first_frame) / self.sim_data.frame_rate) * 1e6)
         self._do_time_step_wrapper()
 
+    def go_to_frame(self, frame_number):
+        """
+        Shows a frame without starting the timer or recording it, the frame number should be one that is visited during playback. This is used to render
+        frames offscreen, as fast as possible.
+        """
+        self.frame_number = frame_number
+        self.t = self.start_time + (frame_number - self.first_frame - self.default_frame_step) * self.dt / self.default_frame_step
+        self.profiler.start_time_step(frame_number)
+        self.do_time_step()
+        self.profiler.lap('gui_update')
+
     def toggle_running(self, record=False):
         if self.main_timer.isActive():
             self.main_timer.stop()
@@ -100,27 +113,33 @@ class VisualisationMaster(QtCore.QObject):
         file_name = file_name.replace(':', '-').replace('/', '-').replace('\\', '-')
 
         self.path_to_video_file = os.path.join(user_video_folder, file_name)
-        fps = self.sim_data.frame_rate
+        fps = self.playback_frame_rate
 
-        frame_size = self.gui.get_image_of_current_view().size()
-        self.video_writer = cv2.VideoWriter(self.path_to_video_file, cv2.VideoWriter.fourcc('M', 'J', 'P', 'G'), fps, (frame_size.width(), frame_size.height()))
+        frame_size = self.gui.start_recording_frames()
+        self.video_recorder = VideoRecorder(self.path_to_video_file, fps, frame_size)
         self.is_recording = True
 
     def stop_recording(self):
-        self.video_writer.release()
-        QtWidgets.QMessageBox.information(self.gui, 'Video Saved', 'A video capture of the visualisation was saved to ' + self.path_to_video_file)
         self.is_recording = False
+        self.gui.stop_recording_frames()
+        try:
+            self.video_recorder.stop()
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self.gui, 'Video Not Saved', 'Writing the video capture to ' + self.path_to_video_file + ' failed: ' + str(e))
+            return
+
+        message = 'A video capture of the visualisation was saved to ' + self.path_to_video_file
+        if self.video_recorder.number_of_dropped_frames:
+            message += '\n\n%d of the %d frames could not be encoded in time and were replaced by the previous frame.' % \
+                       (self.video_recorder.number_of_dropped_frames, self.video_recorder.number_of_frames_added)
+        QtWidgets.QMessageBox.information(self.gui, 'Video Saved', message)
 
     def _record_frame(self):
         if self.is_recording:
-            image = self.gui.get_image_of_current_view()
-            frame_size = image.size()
-            bits = image.bits()
-
-            bits.setsize(frame_size.height() * frame_size.width() * 4)
-            image_array = np.frombuffer(bits, np.uint8).reshape((frame_size.height(), frame_size.width(), 4))
-            color_convert_image = cv2.cvtColor(image_array, cv2.COLOR_RGBA2RGB)
-            self.video_writer.write(color_convert_image)
+            image = self.gui.render_recording_frame()
+            self.profiler.lap('record_render')
+            self.video_recorder.add_frame(image)
+            self.profiler.lap('encode')
 
     def fast_forward(self):
         return self._fast_run(forward=True)
@@ -178,8 +197,13 @@ class VisualisationMaster(QtCore.QObject):
             self.gui.update_buttons()
 
     def _do_time_step_wrapper(self):
+        timer_interval = self.main_timer.interval() / 1e3 if self.main_timer.isActive() else None
+        self.profiler.start_time_step(self.frame_number, timer_interval)
+
+        # do_time_step marks the end of the data_fetch and vehicle_update stages, the rest of it is spent on updating the gui
         self._increment_time()
         self.do_time_step()
+        self.profiler.lap('gui_update')
         self._record_frame()
 
     def do_time_step(self):
@@ -191,6 +215,20 @@ class VisualisationMaster(QtCore.QObject):
     def get_all_vehicle_ids(self):
         pass
 
+    @property
+    def frame_range(self):
+        """
+        The first and last frame number of the dataset, as shown during playback.
+        """
+        return self.first_frame + self.default_frame_step, self.first_frame + 1 + self.total_number_of_frames
+
+    @property
+    def playback_frame_rate(self):
+        """
+        The number of time steps per second at normal speed. This differs from the frame rate of the dataset if the default frame step is not 1.
+        """
+        return 1. / self.dt.total_seconds()
+
     @property
     def is_running(self):
         return self.main_timer.isActive()
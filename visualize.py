@@ -24,13 +24,25 @@ import warnings
 from PyQt5 import QtWidgets
 
 from dataobjects import PNeumaDataset, NGSimDataset, HighDDataset, ExiDDataset
-from dataobjects.enums import DataSource, HighDDatasetID, NGSimDatasetID, PNeumaDatasetID, ExiDDatasetID
-from gui import TrafficVisualizerGui, DatasetSelectionDialog
+from dataobjects.dataset import Dataset
+from dataobjects.enums import DataSource, HighDDatasetID, NGSimDatasetID, PNeumaDatasetID, ExiDDatasetID, CacheFormat, ViewportType
+from gui import TrafficVisualizerGui, DatasetSelectionDialog, ProgressDialogReporter, WorldView
+from gui.worldview import enable_software_opengl
 from visualisation import NGSimVisualisationMaster, HighDVisualisationMaster, PNeumaVisualisationMaster, ExiDVisualisationMaster
 
 
-def visualize_traffic_data(data, dataset_id, app):
-    gui = TrafficVisualizerGui(data)
+# The dataset id enum of every data source, by the name of the source used in command line arguments
+DATASET_ID_TYPES = {'highd': HighDDatasetID,
+                    'ngsim': NGSimDatasetID,
+                    'pneuma': PNeumaDatasetID,
+                    'exid': ExiDDatasetID}
+
+
+def create_visualisation_master(data, gui):
+    """
+    Creates the visualisation master for the data source of a dataset. The gui can be a TrafficVisualizerGui or an OffscreenRenderer.
+    """
+    dataset_id = data.dataset_id
 
     if dataset_id.data_source == DataSource.NGSIM:
         start_time = datetime.datetime.fromtimestamp(int(data.track_data.loc[:, 'Global_Time'].min() / 1000))
@@ -53,10 +65,32 @@ def visualize_traffic_data(data, dataset_id, app):
     else:
         raise ValueError('No alternative is implemented for this data source. Is it a new data source?')
 
+    return visualisation_master
+
+
+def load_dataset(dataset_id, progress_reporter=None):
+    if dataset_id.data_source == DataSource.HIGHD:
+        return HighDDataset.load(dataset_id)
+    elif dataset_id.data_source == DataSource.NGSIM:
+        return NGSimDataset.load(dataset_id, progress_reporter)
+    elif dataset_id.data_source == DataSource.PNEUMA:
+        return PNeumaDataset.load(dataset_id, progress_reporter)
+    elif dataset_id.data_source == DataSource.EXID:
+        return ExiDDataset.load(dataset_id)
+    else:
+        raise ValueError('No alternative is implemented for this data source. Is it a new data source?')
+
+
+def visualize_traffic_data(data, dataset_id, app, profile_path=None):
+    gui = TrafficVisualizerGui(data)
+    visualisation_master = create_visualisation_master(data, gui)
     gui.register_visualisation_master(visualisation_master)
 
     exit_code = app.exec_()
     data.save()
+    if profile_path:
+        visualisation_master.profiler.save(profile_path)
+        print('Saved the playback profile to %s' % profile_path)
     sys.exit(exit_code)
 
 
@@ -77,8 +111,66 @@ def get_dataset_id_from_arguments():
         help="The dataset id",
         required=False,
     )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        type=str,
+        choices=["pickle", "columnar"],
+        help="The format used to cache converted data, one of pickle, columnar",
+        required=False,
+    )
+    parser.add_argument(
+        "-m",
+        "--memory-map",
+        action="store_true",
+        help="Memory map the track data when it is loaded from an unencrypted columnar cache",
+        required=False,
+    )
+    parser.add_argument(
+        "--opengl",
+        action="store_true",
+        help="Render the view with OpenGL instead of the raster engine",
+        required=False,
+    )
+    parser.add_argument(
+        "--software-opengl",
+        action="store_true",
+        help="Render the view with a software OpenGL implementation (e.g. Mesa llvmpipe), this works without a GPU",
+        required=False,
+    )
+    parser.add_argument(
+        "--recording-size",
+        type=int,
+        nargs=2,
+        metavar=("WIDTH", "HEIGHT"),
+        help="The size of recorded videos in pixels, by default the size of the map or, when recording the current view only, of the view",
+        required=False,
+    )
+    parser.add_argument(
+        "-p",
+        "--profile",
+        type=str,
+        help="Path to a csv or json file to save the durations of the stages of the most recent time steps to on exit",
+        required=False,
+    )
     known_args, other_args = parser.parse_known_args()
 
+    if known_args.cache == 'columnar':
+        Dataset.cache_format = CacheFormat.COLUMNAR
+    elif known_args.cache == 'pickle':
+        Dataset.cache_format = CacheFormat.PICKLE
+
+    if known_args.memory_map:
+        Dataset.memory_map_cache = True
+
+    if known_args.opengl or known_args.software_opengl:
+        WorldView.viewport_type = ViewportType.OPENGL
+    if known_args.software_opengl:
+        enable_software_opengl()
+
+    if known_args.recording_size:
+        TrafficVisualizerGui.recording_frame_size = tuple(known_args.recording_size)
+
     try:
         if known_args.source == 'highd':
             dataset_id = HighDDatasetID[known_args.dataset]
@@ -92,7 +184,7 @@ def get_dataset_id_from_arguments():
         warnings.warn('Invalid dataset source and ID combination provided')
         dataset_id = None
 
-    return dataset_id, other_args
+    return dataset_id, known_args.profile, other_args
 
 
 def get_dataset_id_from_dialog(qt_args):
@@ -119,7 +211,7 @@ if __name__ == '__main__':
     # dataset_id = ExiDDatasetID.DATASET_26
 
     # check if a dataset id was provided in arguments, if so: overrule the id above
-    id_from_arguments, other_args = get_dataset_id_from_arguments()
+    id_from_arguments, profile_path, other_args = get_dataset_id_from_arguments()
 
     if id_from_arguments is not None:
         dataset_id = id_from_arguments
@@ -135,16 +227,5 @@ if __name__ == '__main__':
 
     # load data and start
     main_app = QtWidgets.QApplication(other_args)
-
-    if dataset_id.data_source == DataSource.HIGHD:
-        data = HighDDataset.load(dataset_id)
-    elif dataset_id.data_source == DataSource.NGSIM:
-        data = NGSimDataset.load(dataset_id)
-    elif dataset_id.data_source == DataSource.PNEUMA:
-        data = PNeumaDataset.load(dataset_id)
-    elif dataset_id.data_source == DataSource.EXID:
-        data = ExiDDataset.load(dataset_id)
-    else:
-        raise ValueError('No alternative is implemented for this data source. Is it a new data source?')
-
-    visualize_traffic_data(data, dataset_id, main_app)
+    data = load_dataset(dataset_id, ProgressDialogReporter())
+    visualize_traffic_data(data, dataset_id, main_app, profile_path)